@@ -0,0 +1,152 @@
+"""Rough timings and memory use for the transpiler stages.
+
+    python bench.py some.js [more.js ...] [--parser fast] [--repeat 3]
+    python bench.py --nesting [--repeat 3]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from esprima.objects import Object
+
+from compact import CompactNode, compact
+from frontend import BACKENDS, DEFAULT_BACKEND, parse
+from main import JsVisitor
+
+
+OPTIONS = {"comment": True, "tolerant": True}
+
+# Inputs nested ``n`` levels deep that esprima still parses without
+# recursing: a left-leaning chain of binary expressions and a chain of
+# method calls, each node holding the text of the whole chain below it.
+NESTED = {
+    "binary": lambda n: "x = " + " + ".join(f"a{i}" for i in range(n)) + ";",
+    "calls": lambda n: "x = a" + "".join(f".m{i}({i})" for i in range(n)) + ";",
+}
+NESTING_DEPTHS = (10000, 20000, 40000, 80000)
+
+
+def best_of(repeat, func, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def traced_size(func, *args):
+    """Bytes still allocated by ``func(*args)`` once it returns, and its result."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func(*args)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return after - before, result
+
+
+def count_nodes(tree):
+    """Number of syntax nodes in ``tree``, esprima or compact."""
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, Object):
+            count += 1
+            stack.extend(vars(node).values())
+        elif isinstance(node, CompactNode):
+            count += 1
+            stack.extend(value for _, value in node.items())
+    return count
+
+
+def transpile(tree):
+    return "\n".join(JsVisitor().visit(tree))
+
+
+def bench_file(path, backend=None, repeat=3):
+    with open(path) as f:
+        code = f.read()
+
+    parse_time, tree = best_of(repeat, parse, code, OPTIONS, None, backend, False)
+    compact_time, _ = best_of(repeat, compact, tree)
+    tree_bytes, tree = traced_size(parse, code, OPTIONS, None, backend, False)
+    compact_bytes, _ = traced_size(lambda: compact(parse(code, OPTIONS, None, backend, False)))
+
+    # JsVisitor rewrites some nodes in place, so give every run a fresh tree.
+    visit_time = min(best_of(1, transpile, parse(code, OPTIONS, None, backend, False))[0] for _ in range(repeat))
+    compact_visit_time = min(best_of(1, transpile, compact(tree))[0] for _ in range(repeat))
+    nodes = count_nodes(tree)
+
+    return {
+        "file": path,
+        "bytes": len(code),
+        "parse": parse_time,
+        "compact": compact_time,
+        "tree_mem": tree_bytes,
+        "compact_mem": compact_bytes,
+        "visit": visit_time,
+        "compact_visit": compact_visit_time,
+        "nodes": nodes,
+    }
+
+
+def bench_nesting(kind, depths=NESTING_DEPTHS, repeat=3):
+    """``(depth, seconds)`` to visit ``NESTED[kind]`` at each depth."""
+    results = []
+    for depth in depths:
+        code = NESTED[kind](depth)
+        visit_time = min(best_of(1, transpile, parse(code, None, None, None, False))[0] for _ in range(repeat))
+        results.append((depth, visit_time))
+    return results
+
+
+def report_nesting(kind, results):
+    # Linear scaling shows up as a flat time per level and a 2x step for
+    # each doubling of the depth.
+    print(f"{kind} nesting")
+    previous = None
+    for depth, seconds in results:
+        step = f"  x{seconds / previous:.2f}" if previous else ""
+        print(f"  {depth:7d} levels {seconds * 1000:9.1f} ms {seconds / depth * 1e6:7.2f} us/level{step}")
+        previous = seconds
+
+
+def report(result):
+    print(f"{result['file']} ({result['bytes']} bytes)")
+    print(f"  parse           {result['parse'] * 1000:9.1f} ms")
+    print(f"  compact         {result['compact'] * 1000:9.1f} ms")
+    print(f"  visit (esprima) {result['visit'] * 1000:9.1f} ms")
+    print(f"  visit (compact) {result['compact_visit'] * 1000:9.1f} ms")
+    print(f"  visit rate      {result['nodes'] / result['visit'] / 1000:9.1f} k nodes/s"
+          f" ({result['nodes']} nodes)")
+    print(f"  tree memory     {result['tree_mem'] / 1024:9.1f} KiB (esprima)"
+          f" -> {result['compact_mem'] / 1024:.1f} KiB (compact,"
+          f" {result['compact_mem'] / max(result['tree_mem'], 1):.0%})")
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Benchmark the es62py pipeline.")
+    argparser.add_argument("files", nargs="*")
+    argparser.add_argument("--parser", choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    argparser.add_argument("--repeat", type=int, default=3)
+    argparser.add_argument("--nesting", action="store_true",
+                           help="time the visitor on ever deeper synthetic nesting")
+    args = argparser.parse_args()
+    if not args.files and not args.nesting:
+        argparser.error("give some files or --nesting")
+
+    if args.nesting:
+        for kind in NESTED:
+            report_nesting(kind, bench_nesting(kind, repeat=args.repeat))
+
+    for path in args.files:
+        report(bench_file(path, args.parser, args.repeat))
@@ -0,0 +1,209 @@
+"""On-disk cache of parsed trees.
+
+Entries live in a flat directory, one file per tree, named after a hash of
+the source text, the parser options, the backend, the esprima version and
+a digest of the backend's own source (``frontend.backend_digest``).  Trees
+are stored as pickles, so only point it at directories you trust.
+
+Several processes may share a directory: entries are written to a temporary
+file and renamed into place, so readers only ever see complete files, and
+eviction runs under an advisory lock where ``fcntl`` is available.
+"""
+import hashlib
+import io
+import json
+import os
+import pickle
+import tempfile
+
+import esprima
+from esprima.objects import Object
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+FORMAT = 1
+MAGIC = b"es62py-ast\x00" + bytes([FORMAT])
+SUFFIX = ".ast"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+CACHE_DIR_ENV = "ES62PY_CACHE_DIR"
+
+
+def _node(cls, state):
+    node = cls.__new__(cls)
+    node.__dict__ = state
+    return node
+
+
+class _TreePickler(pickle.Pickler):
+    # esprima's Object answers None for any missing attribute, __setstate__
+    # included, which breaks the default protocol; rebuild nodes by hand.
+    def reducer_override(self, obj):
+        if isinstance(obj, Object):
+            return _node, (type(obj), obj.__dict__)
+        return NotImplemented
+
+
+def dumps(tree):
+    f = io.BytesIO()
+    f.write(MAGIC)
+    _TreePickler(f, pickle.HIGHEST_PROTOCOL).dump(tree)
+    return f.getvalue()
+
+
+def loads(data):
+    if not data.startswith(MAGIC):
+        raise ValueError("not an es62py tree cache entry")
+    return pickle.loads(memoryview(data)[len(MAGIC):])
+
+
+class ASTCache:
+    """A size-bounded directory of cached trees, safe to share between processes."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, code, options=None, backend=None, version=None):
+        meta = json.dumps(
+            [FORMAT, version, esprima.version, backend, options or {}],
+            sort_keys=True,
+            default=repr,
+        )
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(meta.encode())
+        digest.update(b"\x00")
+        digest.update(code.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            tree = loads(data)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, EOFError, TypeError, AttributeError, ImportError, pickle.UnpicklingError):
+            # Corrupt or written by an incompatible version; drop it.
+            self._unlink(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return tree
+
+    def put(self, key, tree):
+        try:
+            data = dumps(tree)
+        except (RecursionError, pickle.PicklingError):
+            # Too deeply nested to pickle; just don't cache it.
+            return False
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            self._unlink(tmp)
+            raise
+        self.evict()
+        return True
+
+    def entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(SUFFIX) or entry.name.startswith(".tmp-"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        """Delete least recently used entries until the cache fits in ``max_bytes``."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock() as locked:
+            if not locked:
+                # Another process is already evicting.
+                return
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            if total <= max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                self._unlink(path)
+                total -= size
+                if total <= max_bytes:
+                    break
+
+    def clear(self):
+        self.evict(0)
+
+    def _lock(self):
+        return _DirectoryLock(os.path.join(self.directory, ".lock"))
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+class _DirectoryLock:
+    """Non-blocking advisory lock; evaluates to False if someone else holds it."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return True
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(self.fd)
+            self.fd = None
+            return False
+        return True
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+
+_default_caches = {}
+
+
+def default_cache():
+    """The cache named by ``$ES62PY_CACHE_DIR``, or None when it is unset."""
+    directory = os.environ.get(CACHE_DIR_ENV)
+    if not directory:
+        return None
+    if directory not in _default_caches:
+        _default_caches[directory] = ASTCache(directory)
+    return _default_caches[directory]
@@ -0,0 +1,186 @@
+"""Thin client for the transpile daemon.
+
+It imports nothing of the transpiler, so asking a running ``daemon`` to
+transpile a file costs little more than starting the interpreter.  With
+``--start`` it starts a daemon in the background when none is listening.
+
+Requests and responses are frames: a 4-byte big-endian length, then that
+many bytes of a UTF-8 JSON object.  A request has an ``op`` (``ping``,
+``transpile``, ``stats`` or ``shutdown``) and, for ``transpile``, the
+``source`` and the settings the CLI takes (``level``, ``extra``,
+``options``, ``backend``).  A response has ``ok`` and either the result
+(``python`` for ``transpile``) or an ``error``.
+"""
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+
+HEADER = struct.Struct(">I")
+MAX_FRAME = 256 * 1024 * 1024
+SOCKET_ENV = "ES62PY_SOCKET"
+DEFAULT_TIMEOUT = 60.0
+START_TIMEOUT = 30.0
+
+
+class DaemonError(Exception):
+    """The daemon answered a request with an error."""
+
+
+def default_socket():
+    """``$ES62PY_SOCKET``, or a socket per user in the runtime directory."""
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    directory = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    return os.path.join(directory, f"es62py-{os.getuid()}.sock")
+
+
+def encode(message):
+    data = json.dumps(message, ensure_ascii=False).encode("utf-8", "surrogatepass")
+    if len(data) > MAX_FRAME:
+        raise ValueError(f"message of {len(data)} bytes is larger than {MAX_FRAME}")
+    return HEADER.pack(len(data)) + data
+
+
+def decode(data):
+    return json.loads(data.decode("utf-8", "surrogatepass"))
+
+
+class Client(object):
+    """One connection to the daemon at ``path``; requests are answered in order."""
+
+    def __init__(self, path=None, timeout=DEFAULT_TIMEOUT):
+        self.path = path or default_socket()
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        try:
+            self.socket.connect(self.path)
+        except BaseException:
+            self.socket.close()
+            raise
+
+    def _receive(self, size):
+        chunks = []
+        while size:
+            chunk = self.socket.recv(min(size, 1024 * 1024))
+            if not chunk:
+                raise ConnectionError("the daemon closed the connection")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def request(self, message):
+        """The daemon's response to ``message``; raises ``DaemonError`` if it is an error."""
+        self.socket.sendall(encode(message))
+        size, = HEADER.unpack(self._receive(HEADER.size))
+        if size > MAX_FRAME:
+            raise ConnectionError(f"response of {size} bytes is larger than {MAX_FRAME}")
+        response = decode(self._receive(size))
+        if not response.get("ok"):
+            raise DaemonError(response.get("error", "unknown error"))
+        return response
+
+    def transpile(self, source, level=0, extra=(), options=None, backend=None):
+        return self.request({"op": "transpile", "source": source, "level": level, "extra": list(extra),
+                             "options": options, "backend": backend})["python"]
+
+    def close(self):
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def start_daemon(path, arguments=(), timeout=START_TIMEOUT):
+    """Start a daemon listening at ``path`` in the background and connect to it."""
+    daemon = os.path.join(os.path.dirname(os.path.abspath(__file__)), "daemon.py")
+    subprocess.Popen([sys.executable, daemon, "--socket", path, *arguments], start_new_session=True,
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return Client(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def connect(path=None, start=False):
+    path = path or default_socket()
+    try:
+        return Client(path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if not start:
+            raise
+    return start_daemon(path)
+
+
+def write_atomic(path, text):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp, "w", encoding="utf-8", errors="surrogatepass") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argparser = argparse.ArgumentParser(description="Transpile ES6 JavaScript to Python on a running daemon.")
+    argparser.add_argument("file", nargs="?", help="a .js file, or - for stdin")
+    argparser.add_argument("-o", "--output", help="write the Python to this file instead of stdout")
+    argparser.add_argument("--socket", help=f"the daemon's socket (default: ${SOCKET_ENV} or one per user)")
+    argparser.add_argument("--start", action="store_true", help="start a daemon if none is running")
+    argparser.add_argument("--stop", action="store_true", help="shut the daemon down")
+    argparser.add_argument("--stats", action="store_true", help="print the daemon's counters")
+    argparser.add_argument("--parser", help="parser backend (default: the daemon's)")
+    argparser.add_argument("-O", dest="level", type=int, default=0, help="optimization level, as for main.py")
+    argparser.add_argument("--peephole", action="store_true", help="as for main.py")
+    argparser.add_argument("--split", type=int, metavar="STATEMENTS", help="as for main.py")
+    args = argparser.parse_args()
+    if not (args.file or args.stop or args.stats):
+        argparser.error("nothing to do: give a file, --stats or --stop")
+
+    try:
+        client = connect(args.socket, args.start and not args.stop)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        sys.exit(f"no daemon at {args.socket or default_socket()} ({e.strerror}); start one with daemon.py or --start")
+    with client:
+        try:
+            if args.stats:
+                response = client.request({"op": "stats"})
+                for name, value in sorted(response.items()):
+                    if name != "ok":
+                        print(f"{name}: {value}")
+            if args.file:
+                if args.file == "-":
+                    source = sys.stdin.read()
+                else:
+                    with open(args.file, encoding="utf-8", errors="surrogateescape") as f:
+                        source = f.read()
+                extra = [name for name, on in (("peephole", args.peephole), ("split", args.split)) if on]
+                python = client.transpile(source, args.level, extra, {"split": {"max_statements": args.split}},
+                                          args.parser)
+                if args.output:
+                    write_atomic(args.output, python + "\n")
+                else:
+                    print(python)
+            if args.stop:
+                client.request({"op": "shutdown"})
+        except DaemonError as e:
+            sys.exit(str(e))
@@ -0,0 +1,113 @@
+"""Python source built from fragments and joined once.
+
+``JsVisitor`` handlers used to return finished strings that their parent
+pasted into its own with ``+`` and f-strings, so the text of a node deep in
+the tree was copied again at every level above it: quadratic in the depth
+of nesting.  Handlers now write their pieces (strings, indentation and
+their children's results) into a ``CodeWriter`` and only the outermost
+result is turned into a string, in a single pass over the fragment tree.
+
+Most nodes are small though (``a.b``, ``f(x)``), and a writer costs more to
+build and to collect than a short string does to copy, so ``value()`` joins
+a writer on the spot while it holds nothing but strings adding up to at
+most ``INLINE_LIMIT`` characters.  A character is then copied a bounded
+number of times however deep it sits, which keeps the whole thing linear.
+
+``digest`` hashes a fragment's rendered text, so the same text gets the
+same digest however it was split into fragments.  A writer keeps its
+digest, since it is only asked for once it is finished.
+"""
+import hashlib
+
+
+INLINE_LIMIT = 256
+
+
+class CodeWriter(object):
+    """A sequence of fragments: strings and other writers.
+
+    Anything else written is converted with ``str`` when rendered, as an
+    f-string would.
+    """
+
+    __slots__ = ("parts", "_digest")
+
+    def __init__(self, *parts):
+        self.parts = list(parts)
+        self._digest = None
+
+    def write(self, *parts):
+        self.parts.extend(parts)
+        return self
+
+    def join(self, separator, items):
+        """Write ``items`` with ``separator`` between them."""
+        parts = self.parts
+        first = True
+        for item in items:
+            if not first:
+                parts.append(separator)
+            parts.append(item)
+            first = False
+        return self
+
+    def value(self):
+        """A handler's result: the text itself if it is short, else the writer."""
+        try:
+            text = "".join(self.parts)
+        except TypeError:
+            return self
+        if len(text) <= INLINE_LIMIT:
+            return text
+        self.parts = [text]
+        return self
+
+    def getvalue(self):
+        out = []
+        stack = [iter(self.parts)]
+        while stack:
+            for part in stack[-1]:
+                if type(part) is str:
+                    out.append(part)
+                elif type(part) is CodeWriter:
+                    stack.append(iter(part.parts))
+                    break
+                else:
+                    out.append(str(part))
+            else:
+                stack.pop()
+        return "".join(out)
+
+    __str__ = getvalue
+
+    def digest(self):
+        """Hex digest of the text, as ``digest`` gives for it; the writer must be finished."""
+        if self._digest is None:
+            self._digest = _hash(self.getvalue())
+        return self._digest
+
+    def __format__(self, spec):
+        return format(self.getvalue(), spec)
+
+    def __repr__(self):
+        return f"CodeWriter({self.getvalue()!r})"
+
+
+def _hash(text):
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def digest(fragment):
+    """Hex digest of a handler's result, a string or a ``CodeWriter``."""
+    if type(fragment) is CodeWriter:
+        return fragment.digest()
+    return _hash(str(fragment))
+
+
+def render(result):
+    """``result`` with every writer in it (or in it, if a list) rendered to text."""
+    if type(result) is CodeWriter:
+        return result.getvalue()
+    if type(result) is list:
+        return [render(item) for item in result]
+    return result
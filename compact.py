@@ -0,0 +1,152 @@
+"""Slotted copies of esprima trees.
+
+esprima builds every node as a plain ``__dict__``-backed object.  ``compact``
+copies a parsed tree into classes with ``__slots__`` and the same names, so
+``JsVisitor`` dispatches on them unchanged while each node takes a fraction
+of the memory and attribute reads skip the instance dict.
+
+The slotted classes mirror esprima's ``Object`` semantics: reading a field
+that was never set gives ``None``.  Each esprima class gets a lean variant
+sized for its constructor's fields and a roomier one, used for nodes that
+carry ``range``/``loc``/comments or other extra fields.
+"""
+import inspect
+
+from esprima import jsx_nodes, nodes, scanner
+from esprima.objects import Object
+
+
+# Set on many nodes after construction, depending on the parse options.
+EXTRA_SLOTS = ("range", "loc", "leadingComments", "trailingComments", "innerComments")
+
+# Fields set after construction that are known up front: the parser adds the
+# first three to the root, JsVisitor gives default parameters an operator,
+# and naming keeps functions' digests.
+KNOWN_FIELDS = {
+    "Script": ("comments", "errors", "tokens"),
+    "Module": ("comments", "errors", "tokens"),
+    "FunctionDeclaration": ("_digest",),
+    "FunctionExpression": ("_digest",),
+    "ArrowFunctionExpression": ("_digest",),
+    "AsyncFunctionDeclaration": ("_digest",),
+    "AsyncFunctionExpression": ("_digest",),
+    "AsyncArrowFunctionExpression": ("_digest",),
+    "AssignmentPattern": ("operator",),
+}
+
+_ATOMS = (str, int, float, bool, type(None))
+
+
+class CompactNode(object):
+    __slots__ = ()
+    __fields__ = ()
+
+    def __getattr__(self, name):
+        return None
+
+    def __dir__(self):
+        return list(self.keys())
+
+    def keys(self):
+        for name in self.__fields__:
+            try:
+                object.__getattribute__(self, name)
+            except AttributeError:
+                continue
+            yield name
+        yield from getattr(self, "__dict__", None) or ()
+
+    def items(self):
+        return ((name, getattr(self, name)) for name in self.keys())
+
+    def __repr__(self):
+        from esprima.visitor import ReprVisitor
+        return ReprVisitor().visit(dict(self.items()))
+
+
+def _constructor_fields(cls):
+    """The attributes ``cls.__init__`` sets, found by calling it with Nones."""
+    params = inspect.signature(cls.__init__).parameters
+    probe = cls.__new__(cls)
+    cls.__init__(probe, *[None] * (len(params) - 1))
+    return tuple(vars(probe))
+
+
+def _make_class(cls, extra=False):
+    try:
+        fields = _constructor_fields(cls)
+    except Exception:
+        fields = ()
+    fields += tuple(name for name in KNOWN_FIELDS.get(cls.__name__, ()) if name not in fields)
+    if extra:
+        fields += tuple(name for name in EXTRA_SLOTS if name not in fields)
+    return type(cls.__name__, (CompactNode,), {
+        "__slots__": fields + (("__dict__",) if extra else ()),
+        "__fields__": fields,
+        "__fields_set__": frozenset(fields),
+        "__module__": __name__,
+        "__qualname__": cls.__name__,
+    })
+
+
+# esprima class -> (lean class, roomy class).  The lean one only has room for
+# the fields the node is built with; the roomy one also has EXTRA_SLOTS and
+# a __dict__ for anything else.
+CLASSES = {}
+
+
+def compact_class(cls):
+    """The slotted counterparts of the esprima class ``cls``."""
+    try:
+        return CLASSES[cls]
+    except KeyError:
+        CLASSES[cls] = (_make_class(cls), _make_class(cls, extra=True))
+        return CLASSES[cls]
+
+
+for _module in (nodes, jsx_nodes, scanner):
+    for _cls in vars(_module).values():
+        if isinstance(_cls, type) and issubclass(_cls, Object) and _cls.__module__ == _module.__name__:
+            compact_class(_cls)
+
+
+def compact(tree):
+    """Return a slotted copy of ``tree``, leaving the original untouched.
+
+    The copy is built with an explicit stack, so arbitrarily deep trees are
+    fine.
+    """
+    root = [None]
+    stack = [(tree, root, 0)]
+    pop = stack.pop
+    push = stack.append
+    classes = CLASSES
+    while stack:
+        value, target, key = pop()
+        cls = value.__class__
+        if cls in _ATOMS:
+            new = value
+        elif isinstance(value, list):
+            new = [None] * len(value)
+            for index, item in enumerate(value):
+                if item.__class__ in _ATOMS:
+                    new[index] = item
+                else:
+                    push((item, new, index))
+        elif isinstance(value, Object):
+            fields = value.__dict__
+            lean, roomy = classes.get(cls) or compact_class(cls)
+            new_cls = lean if fields.keys() <= lean.__fields_set__ else roomy
+            new = new_cls.__new__(new_cls)
+            for name, item in fields.items():
+                if item.__class__ in _ATOMS:
+                    setattr(new, name, item)
+                else:
+                    push((item, new, name))
+        else:
+            new = value
+        if target.__class__ is list:
+            target[key] = new
+        else:
+            setattr(target, key, new)
+    return root[0]
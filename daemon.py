@@ -0,0 +1,230 @@
+"""A transpiler that stays running, served over a Unix socket.
+
+Every ``main.py`` run starts an interpreter and imports esprima before it
+reads a byte of JavaScript, which is most of the time a small file takes.
+The daemon pays that once: it imports the transpiler, forks a
+``ProcessPoolExecutor`` whose workers inherit it, warms each worker with a
+small transpile and only then starts listening.  Requests come in over an
+asyncio Unix socket server in the frames ``client`` describes; the event
+loop only decodes them and answers, the parsing and visiting runs on the
+pool, so a large file does not hold up the other clients.
+
+Each worker keeps an ``OutputMemo`` per combination of settings, so
+functions seen in earlier requests are not visited again, and the daemon
+keeps the last ``max_results`` outputs by a digest of the source and the
+settings, so an unchanged file is answered without reaching a worker at
+all.  A worker that dies (out of memory, say) fails its requests and the
+pool is replaced.  The socket is only accessible to its owner.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from cache import ASTCache
+from client import HEADER, MAX_FRAME, decode, default_socket, encode
+from frontend import __version__, parse
+from main import JsVisitor
+from memo import OutputMemo
+from passes import PassManager
+
+
+OPTIONS = {"comment": True, "tolerant": True}
+DEFAULT_MAX_RESULTS = 256
+WARM_SOURCE = "class A extends B { m(x = 1) { return [...x].map(y => `${y}`); } }\nvar a = !0 + 'a' + 'b';\n"
+
+_memos = {}
+_caches = {}
+
+
+def transpile_source(source, level=0, extra=(), options=None, backend=None, cache_dir=None):
+    """Worker: the Python for ``source`` and the seconds each pass took."""
+    settings = json.dumps([level, sorted(extra), options, backend], sort_keys=True)
+    memo = _memos.get(settings)
+    if memo is None:
+        memo = _memos[settings] = OutputMemo()
+    cache = False
+    if cache_dir:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = _caches[cache_dir] = ASTCache(cache_dir)
+    passes = PassManager(level, extra, options)
+    tree = passes.run_js(parse(source, OPTIONS, backend=backend, cache=cache))
+    python = passes.run_source("\n".join(JsVisitor(memo).visit(tree)))
+    return python, [(timing.name, timing.seconds) for timing in passes.timings if timing.seconds is not None]
+
+
+def _warm():
+    # Ctrl-C in the daemon's terminal is for the daemon to handle.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Whatever the first request would import or fill lazily.
+    transpile_source(WARM_SOURCE, 2, ("peephole", "split"), {"split": {"max_statements": 1}})
+    _memos.clear()
+
+
+class Daemon(object):
+    """Serves transpile requests at ``path`` on ``workers`` processes."""
+
+    def __init__(self, path=None, workers=None, cache_dir=None, max_results=DEFAULT_MAX_RESULTS):
+        self.path = path or default_socket()
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.max_results = max_results
+        self.results = {}
+        self.executor = None
+        self.server = None
+        self.stopped = None
+        self.connections = {}
+        self.started = time.monotonic()
+        self.counts = {"requests": 0, "transpiled": 0, "cached": 0, "failed": 0, "connections": 0}
+
+    def start_pool(self):
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_warm)
+        # Forks every worker, each of which warms up before taking this.
+        self.executor.submit(int).result()
+
+    def claim_socket(self):
+        """Remove a stale socket at ``path``; fail if a daemon is listening there."""
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            pass
+        else:
+            raise OSError(f"a daemon is already listening at {self.path}")
+        finally:
+            probe.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    async def serve(self):
+        self.stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stopped.set)
+        old_umask = os.umask(0o177)
+        try:
+            self.server = await asyncio.start_unix_server(self.connection, self.path)
+        finally:
+            os.umask(old_umask)
+        try:
+            await self.stopped.wait()
+        finally:
+            self.server.close()
+            await self.server.wait_closed()
+            # Let open connections finish the request they are on.
+            for writer in self.connections.values():
+                writer.close()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def run(self):
+        self.claim_socket()
+        self.start_pool()
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def connection(self, reader, writer):
+        self.counts["connections"] += 1
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            while True:
+                try:
+                    size, = HEADER.unpack(await reader.readexactly(HEADER.size))
+                    if size > MAX_FRAME:
+                        writer.write(encode({"ok": False, "error": f"request of {size} bytes is too large"}))
+                        break
+                    data = await reader.readexactly(size)
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    request = decode(data)
+                    response = await self.handle(request)
+                except Exception as e:
+                    self.counts["failed"] += 1
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                writer.write(encode(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.connections[task]
+            writer.close()
+
+    async def handle(self, request):
+        self.counts["requests"] += 1
+        op = request.get("op")
+        if op == "transpile":
+            return await self.transpile(request)
+        if op == "ping":
+            return {"ok": True, "version": __version__, "pid": os.getpid()}
+        if op == "stats":
+            return dict(self.counts, ok=True, workers=self.workers, results=len(self.results),
+                        uptime=round(time.monotonic() - self.started, 3))
+        if op == "shutdown":
+            self.stopped.set()
+            return {"ok": True}
+        raise ValueError(f"unknown op {op!r}")
+
+    async def transpile(self, request):
+        source = request["source"]
+        arguments = (request.get("level") or 0, tuple(request.get("extra") or ()), request.get("options"),
+                     request.get("backend"))
+        key = hashlib.blake2b(json.dumps([source, arguments], sort_keys=True).encode("utf-8", "surrogatepass"),
+                              digest_size=16).hexdigest()
+        python = self.results.pop(key, None)
+        if python is not None:
+            self.counts["cached"] += 1
+            self.results[key] = python
+            return {"ok": True, "python": python, "cached": True}
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            python, timings = await loop.run_in_executor(executor, transpile_source, source, *arguments,
+                                                         self.cache_dir)
+        except BrokenProcessPool:
+            if self.executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.start_pool()
+            raise RuntimeError("the worker died (out of memory?)") from None
+        self.counts["transpiled"] += 1
+        if len(self.results) >= self.max_results:
+            del self.results[next(iter(self.results))]
+        self.results[key] = python
+        return {"ok": True, "python": python, "cached": False, "seconds": time.perf_counter() - start,
+                "passes": dict(timings)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argparser = argparse.ArgumentParser(description="Serve transpile requests on a Unix socket (see client.py).")
+    argparser.add_argument("--socket", help="where to listen (default: $ES62PY_SOCKET or one per user)")
+    argparser.add_argument("-j", "--jobs", type=int, help="worker processes (default: one per core)")
+    argparser.add_argument("--cache-dir", default=os.environ.get("ES62PY_CACHE_DIR"),
+                           help="directory to cache parsed trees in (default: $ES62PY_CACHE_DIR)")
+    argparser.add_argument("--max-results", type=int, default=DEFAULT_MAX_RESULTS,
+                           help="outputs to keep for sources that are sent again unchanged")
+    args = argparser.parse_args()
+    daemon = Daemon(args.socket, args.jobs, args.cache_dir, args.max_results)
+    try:
+        daemon.claim_socket()
+    except OSError as e:
+        sys.exit(str(e))
+    print(f"starting on {daemon.path} with {daemon.workers} workers", file=sys.stderr)
+    daemon.run()
@@ -0,0 +1,184 @@
+"""The import/export graph of a project, kept between builds.
+
+For every source the graph records what identifies its content (size and
+modification time, and a digest for when those change without the
+content), where its output went, the names it exports and what it imports
+from where.  ``project.build`` loads it from the output directory to skip
+sources that did not change, and to find the unchanged ones it has to
+rebuild anyway: those importing a name whose presence changed in a module
+they import from, those importing everything from one whose exports
+changed at all, and those whose imports now resolve differently because
+sources were added or removed.
+
+Specifiers resolve like ``visit_ImportDeclaration`` maps them: only
+relative ones (``./``, ``../``) name sources of the project, as the path
+itself, with ``.js`` added, or its ``index.js``.  A module's exports are
+its own names (``default`` for a default export) and, through ``export *
+from``, those of the modules it re-exports.
+
+The graph also records the JSON files copied into the output for the
+sources that import them, so that unchanged ones are not copied again.
+"""
+import hashlib
+import json
+import posixpath
+
+
+FORMAT = 1
+STATE_NAME = ".es62py-graph.json"
+
+ALL = "*"
+
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _pattern_names(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        kind = node.type
+        if kind == "Identifier":
+            yield node.name
+        elif kind == "ObjectPattern":
+            stack.extend(p.value if p.type == "Property" else p for p in node.properties)
+        elif kind == "ArrayPattern":
+            stack.extend(e for e in node.elements if e is not None)
+        elif kind == "RestElement":
+            stack.append(node.argument)
+        elif kind == "AssignmentPattern":
+            stack.append(node.left)
+
+
+def interface(tree):
+    """``(imports, exports)`` of a parsed module.
+
+    ``imports`` pairs each specifier with the names taken from it
+    (``ALL`` for a namespace import or ``export *``); ``exports`` are the
+    module's own exported names.
+    """
+    imports, exports = [], set()
+    for statement in tree.body:
+        kind = statement.type
+        if kind == "ImportDeclaration":
+            names = []
+            for specifier in statement.specifiers:
+                if specifier.type == "ImportDefaultSpecifier":
+                    names.append("default")
+                elif specifier.type == "ImportSpecifier":
+                    names.append(specifier.imported.name)
+                else:
+                    names.append(ALL)
+            imports.append((statement.source.value, names))
+        elif kind == "ExportNamedDeclaration":
+            declaration = statement.declaration
+            if declaration is not None:
+                if declaration.type == "VariableDeclaration":
+                    for declarator in declaration.declarations:
+                        exports.update(_pattern_names(declarator.id))
+                elif declaration.id is not None:
+                    exports.add(declaration.id.name)
+            for specifier in statement.specifiers:
+                exports.add(specifier.exported.name)
+            if statement.source is not None:
+                imports.append((statement.source.value, [s.local.name for s in statement.specifiers]))
+        elif kind == "ExportDefaultDeclaration":
+            exports.add("default")
+        elif kind == "ExportAllDeclaration":
+            imports.append((statement.source.value, [ALL]))
+            exported = getattr(statement, "exported", None)
+            if exported is not None:
+                exports.add(exported.name)
+            else:
+                exports.add(ALL + statement.source.value)
+    return imports, sorted(exports)
+
+
+def resolve(importer, specifier, sources):
+    """The source (relative path, ``/``-separated) ``importer`` imports as ``specifier``, if any."""
+    if not specifier.startswith(("./", "../")):
+        return None
+    path = posixpath.normpath(posixpath.join(posixpath.dirname(importer), specifier))
+    for candidate in (path, path + ".js", posixpath.join(path, "index.js")):
+        if candidate in sources:
+            return candidate
+    return None
+
+
+class Graph(object):
+    """Records by source path relative to the project root, with ``/`` separators.
+
+    A record is a dict with ``size``, ``mtime``, ``digest``, ``target``,
+    ``exports`` and ``imports`` (``[specifier, resolved or None, names]``).
+    ``data`` has the copied JSON files by output path, each with the
+    ``source`` it was copied from and that file's ``size``, ``mtime`` and
+    ``digest``.
+    """
+
+    def __init__(self, key=None, files=None, data=None):
+        self.key = key
+        self.files = files if files is not None else {}
+        self.data = data if data is not None else {}
+
+    @classmethod
+    def load(cls, path, key):
+        """The graph saved at ``path`` if it was built with ``key``, else an empty one."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("format") == FORMAT and state.get("key") == key:
+                return cls(key, state["files"], state.get("data", {}))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+        return cls(key)
+
+    def dumps(self):
+        return json.dumps({"format": FORMAT, "key": self.key, "files": self.files, "data": self.data}, sort_keys=True)
+
+    def exports(self, source, _seen=None):
+        """Everything ``source`` exports, its own names and re-exported ones."""
+        record = self.files.get(source)
+        if record is None:
+            return frozenset()
+        names = set(name for name in record["exports"] if not name.startswith(ALL))
+        stars = [resolved for specifier, resolved, imported in record["imports"]
+                 if imported == [ALL] and ALL + specifier in record["exports"]]
+        if stars:
+            seen = _seen if _seen is not None else set()
+            seen.add(source)
+            for star in stars:
+                if star is not None and star not in seen:
+                    names |= self.exports(star, seen) - {"default"}
+        return frozenset(names)
+
+    def stale_dependents(self, old, changed, sources):
+        """Recorded sources not in ``changed`` that have to be rebuilt after it was.
+
+        ``old`` is the graph before the build, ``changed`` the sources
+        rebuilt, added or removed since, and ``sources`` all there are now.
+        """
+        # Modules re-exporting others can change what they export without
+        # changing themselves.
+        candidates = set(changed)
+        candidates.update(source for source, record in self.files.items()
+                          if any(name.startswith(ALL) for name in record["exports"]))
+        affected = {}
+        for source in candidates:
+            before, after = old.exports(source), self.exports(source)
+            if before != after or (source in old.files) != (source in self.files):
+                affected[source] = before ^ after
+        moved = set(old.files) != set(sources)
+        stale = set()
+        for source, record in self.files.items():
+            if source in changed:
+                continue
+            for entry in record["imports"]:
+                specifier, resolved, names = entry
+                now = resolve(source, specifier, sources) if moved else resolved
+                if now != resolved:
+                    entry[1] = now
+                    stale.add(source)
+                elif resolved in affected and (ALL in names or affected[resolved].intersection(names)):
+                    stale.add(source)
+        return stale
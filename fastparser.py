@@ -0,0 +1,517 @@
+"""Regex-driven drop-in replacement for ``esprima.parse``.
+
+esprima's scanner walks the source one character at a time through a
+method call per character, which is where most of the parse time goes on
+large bundles.  ``FastScanner`` recognises whole tokens, comments and
+whitespace runs with precompiled regular expressions and only falls back to
+the reference scanner for rare constructs (escaped identifiers, legacy
+octals, malformed literals), so error behaviour stays identical.
+
+The grammar itself is esprima's: ``FastParser`` subclasses its ``Parser`` and
+only replaces the per-token and per-node hot paths, which keeps the produced
+trees node-for-node identical to the reference backend.
+"""
+import re
+
+from esprima.comment_handler import CommentHandler
+from esprima.nodes import BlockComment, LineComment
+from esprima.parser import Parser
+from esprima.scanner import Comment, Position, Scanner, SourceLocation
+from esprima.token import Token
+
+
+_LINE_TERMINATORS = "\n\r\u2028\u2029"
+_WHITESPACE = (
+    "\t\x0b\x0c \xa0\u1680\u180e\u2000-\u200a\u202f\u205f\u3000\ufeff"
+)
+
+_TRIVIA = re.compile("[%s%s]+" % (_WHITESPACE, _LINE_TERMINATORS))
+_TRIVIA_START = frozenset(
+    "\t\x0b\x0c \xa0\u1680\u180e\u202f\u205f\u3000\ufeff"
+    + "".join(map(chr, range(0x2000, 0x200b)))
+    + _LINE_TERMINATORS
+    + "/-<"
+)
+_NEWLINE = re.compile(r"\r\n|[\n\r\u2028\u2029]")
+_LINE_COMMENT = re.compile("[^%s]*" % _LINE_TERMINATORS)
+
+_IDENTIFIER = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*")
+_DECIMAL = re.compile(r"(?:[1-9][0-9]*|0)?(?:\.[0-9]*)?(?:[eE][+-]?[0-9]+)?")
+_RADIX = re.compile(r"0(?:[xX][0-9a-fA-F]+|[bB][01]+|[oO][0-7]+)")
+_RADIX_BASE = {"x": 16, "X": 16, "b": 2, "B": 2, "o": 8, "O": 8}
+_PUNCTUATOR = re.compile(
+    r">>>=|\.\.\.|===|!==|>>>|<<=|>>=|\*\*="
+    r"|&&|\|\||==|!=|\+=|-=|\*=|/=|\+\+|--|<<|>>|&=|\|=|\^=|%=|<=|>=|=>|\*\*"
+    r"|[<>=!+\-*%&|^/.)\];,\[:?~(]"
+)
+_STRING = {
+    '"': re.compile(r'"([^"\\\n\r\u2028\u2029]*)"'),
+    "'": re.compile(r"'([^'\\\n\r\u2028\u2029]*)'"),
+}
+_ESCAPED_STRING = {
+    '"': re.compile(r'"((?:[^"\\\n\r\u2028\u2029]|\\[^\n\r\u2028\u2029])*)"'),
+    "'": re.compile(r"'((?:[^'\\\n\r\u2028\u2029]|\\[^\n\r\u2028\u2029])*)'"),
+}
+_TEMPLATE = re.compile(r"(?:[^`\\$]|\$(?!\{))*(`|\$\{)")
+_REGEX_BODY = re.compile(
+    r"/((?:[^\\/\[\n\r\u2028\u2029]|\\[^\n\r\u2028\u2029]"
+    r"|\[(?:[^\]\\\n\r\u2028\u2029]|\\[^\n\r\u2028\u2029])*\])*)/"
+)
+_REGEX_FLAGS = re.compile(r"[A-Za-z0-9_$]*")
+
+# Escapes the fast path decodes itself; anything else (octal, \8, \9,
+# malformed \x/\u) goes through the reference scanner.
+_ESCAPE = re.compile(
+    r"\\(?:u\{([0-9a-fA-F]+)\}|u([0-9a-fA-F]{4})|x([0-9a-fA-F]{2})|([^0-9xu]))"
+)
+_SIMPLE_ESCAPES = {
+    "n": "\n", "r": "\r", "t": "\t", "b": "\b", "f": "\f", "v": "\x0b",
+}
+_UNSUPPORTED_ESCAPE = re.compile(r"\\(?:[0-9]|x(?![0-9a-fA-F]{2})|u(?![0-9a-fA-F]{4}|\{[0-9a-fA-F]+\}))")
+
+
+def _unescape(match):
+    brace, four, two, simple = match.groups()
+    if simple is not None:
+        return _SIMPLE_ESCAPES.get(simple, simple)
+    code = int(brace or four or two, 16)
+    if code > 0x10FFFF:
+        raise ValueError(code)
+    return chr(code)
+
+
+class FastToken(object):
+    """Lightweight stand-in for esprima's ``RawToken``.
+
+    Only the fields every token carries are set per instance; the rest fall
+    back to the class-level ``None`` defaults, just like ``RawToken``'s.
+    """
+    type = value = pattern = flags = regex = octal = None
+    cooked = head = tail = lineNumber = lineStart = start = end = None
+
+    def __init__(self, type, value, lineNumber, lineStart, start, end):
+        self.type = type
+        self.value = value
+        self.lineNumber = lineNumber
+        self.lineStart = lineStart
+        self.start = start
+        self.end = end
+
+
+class FastScanner(Scanner):
+    def scanComments(self):
+        source = self.source
+        length = self.length
+        comments = []
+
+        start = self.index == 0
+        while True:
+            index = self.index
+            match = _TRIVIA.match(source, index, length)
+            if match:
+                end = match.end()
+                lines = None
+                for lines in _NEWLINE.finditer(source, index, end):
+                    self.lineNumber += 1
+                if lines is not None:
+                    self.lineStart = lines.end()
+                    start = True
+                self.index = index = end
+
+            ch = source[index]
+            if ch == "/":
+                ch = source[index + 1]
+                if ch == "/":
+                    comments += self.skipLineComment(2)
+                    start = True
+                elif ch == "*":
+                    comments += self.skipBlockComment()
+                else:
+                    break
+            elif ch == "-" and start and source.startswith("-->", index):
+                comments += self.skipLineComment(3)
+                start = True
+            elif ch == "<" and not self.isModule and source.startswith("<!--", index):
+                comments += self.skipLineComment(4)
+                # esprima takes the line break as part of this comment, so
+                # unlike a // comment it does not let a --> comment follow.
+                newline = _NEWLINE.match(source, self.index, length)
+                if newline:
+                    self.lineNumber += 1
+                    self.lineStart = self.index = newline.end()
+            else:
+                break
+
+        return comments
+
+    def skipLineComment(self, offset):
+        start = self.index
+        end = _LINE_COMMENT.match(self.source, start + offset, self.length).end()
+        self.index = end
+        if not self.trackComment:
+            return ()
+        column = start - self.lineStart
+        return [Comment(
+            multiLine=False,
+            slice=[start + offset, end],
+            range=[start, end],
+            loc=SourceLocation(
+                start=Position(line=self.lineNumber, column=column),
+                end=Position(line=self.lineNumber, column=column + end - start),
+            ),
+        )]
+
+    def skipBlockComment(self):
+        source = self.source
+        start = self.index
+        startLine = self.lineNumber
+        startColumn = start - self.lineStart
+
+        close = source.find("*/", start + 2, self.length)
+        terminated = close != -1
+        end = close + 2 if terminated else self.length
+
+        lines = None
+        for lines in _NEWLINE.finditer(source, start + 2, end):
+            self.lineNumber += 1
+        if lines is not None:
+            self.lineStart = lines.end()
+        self.index = end
+
+        comments = ()
+        if self.trackComment:
+            comments = [Comment(
+                multiLine=True,
+                slice=[start + 2, close if terminated else end],
+                range=[start, end],
+                loc=SourceLocation(
+                    start=Position(line=startLine, column=startColumn),
+                    end=Position(line=self.lineNumber, column=end - self.lineStart),
+                ),
+            )]
+        if not terminated:
+            self.tolerateUnexpectedToken()
+        return comments
+
+    def token(self, type, value, start, end):
+        return FastToken(type, value, self.lineNumber, self.lineStart, start, end)
+
+    def scanIdentifier(self):
+        start = self.index
+        match = _IDENTIFIER.match(self.source, start, self.length)
+        if match is None:
+            return Scanner.scanIdentifier(self)
+        end = match.end()
+        following = self.source[end]
+        if following == "\\" or following > "\x7f":
+            return Scanner.scanIdentifier(self)
+
+        id = match.group()
+        if len(id) == 1:
+            type = Token.Identifier
+        elif id in Scanner.isKeyword.set:
+            type = Token.Keyword
+        elif id == "null":
+            type = Token.NullLiteral
+        elif id == "true" or id == "false":
+            type = Token.BooleanLiteral
+        else:
+            type = Token.Identifier
+
+        self.index = end
+        return self.token(type, id, start, end)
+
+    def scanPunctuator(self):
+        start = self.index
+        source = self.source
+        ch = source[start]
+        if ch == "{":
+            self.curlyStack.append("{")
+            self.index = start + 1
+            return self.token(Token.Punctuator, ch, start, start + 1)
+        if ch == "}":
+            if self.curlyStack:
+                self.curlyStack.pop()
+            self.index = start + 1
+            return self.token(Token.Punctuator, ch, start, start + 1)
+
+        match = _PUNCTUATOR.match(source, start, self.length)
+        if match is None:
+            return Scanner.scanPunctuator(self)
+        self.index = end = match.end()
+        return self.token(Token.Punctuator, match.group(), start, end)
+
+    def scanNumericLiteral(self):
+        start = self.index
+        source = self.source
+        ch = source[start]
+
+        if ch == "0" and source[start + 1] in "xXbBoO":
+            match = _RADIX.match(source, start, self.length)
+            if match is None:
+                return Scanner.scanNumericLiteral(self)
+            end = match.end()
+            if source[end] > "\x7f" or source[end] in "0123456789" or _IDENTIFIER.match(source, end, end + 1):
+                return Scanner.scanNumericLiteral(self)
+            self.index = end
+            value = int(source[start + 2:end], _RADIX_BASE[source[start + 1]])
+            return self.token(Token.NumericLiteral, value, start, end)
+
+        match = _DECIMAL.match(source, start, self.length)
+        end = match.end()
+        following = source[end]
+        if (
+            end == start
+            or following in "0123456789"
+            or following > "\x7f"
+            or following == "\\"
+            or _IDENTIFIER.match(source, end, end + 1)
+        ):
+            # Legacy octals, dangling exponents and identifier parts glued to
+            # the number are left to the reference scanner.
+            return Scanner.scanNumericLiteral(self)
+
+        value = float(source[start:end])
+        self.index = end
+        return self.token(
+            Token.NumericLiteral,
+            int(value) if value.is_integer() else value,
+            start,
+            end,
+        )
+
+    def scanStringLiteral(self):
+        start = self.index
+        quote = self.source[start]
+
+        match = _STRING[quote].match(self.source, start, self.length)
+        if match is not None:
+            value = match.group(1)
+        else:
+            match = _ESCAPED_STRING[quote].match(self.source, start, self.length)
+            if match is None:
+                return Scanner.scanStringLiteral(self)
+            body = match.group(1)
+            if _UNSUPPORTED_ESCAPE.search(body):
+                return Scanner.scanStringLiteral(self)
+            try:
+                value = _ESCAPE.sub(_unescape, body)
+            except ValueError:
+                return Scanner.scanStringLiteral(self)
+
+        self.index = end = match.end()
+        token = self.token(Token.StringLiteral, value, start, end)
+        token.octal = False
+        return token
+
+    def scanTemplate(self):
+        start = self.index
+        source = self.source
+        match = _TEMPLATE.match(source, start + 1, self.length)
+        if match is None:
+            return Scanner.scanTemplate(self)
+
+        end = match.end()
+        tail = match.group(1) == "`"
+        head = source[start] == "`"
+        raw = source[start + 1:end - (1 if tail else 2)]
+
+        lines = None
+        for lines in _NEWLINE.finditer(source, start + 1, end):
+            self.lineNumber += 1
+        if lines is not None:
+            self.lineStart = lines.end()
+            cooked = _NEWLINE.sub("\n", raw)
+        else:
+            cooked = raw
+
+        if not tail:
+            self.curlyStack.append("${")
+        if not head and self.curlyStack:
+            self.curlyStack.pop()
+
+        self.index = end
+        token = self.token(Token.Template, raw, start, end)
+        token.cooked = cooked
+        token.head = head
+        token.tail = tail
+        return token
+
+    def scanRegExp(self):
+        start = self.index
+        source = self.source
+        match = _REGEX_BODY.match(source, start, self.length)
+        if match is None:
+            return Scanner.scanRegExp(self)
+        flags = _REGEX_FLAGS.match(source, match.end(), self.length)
+        end = flags.end()
+        if source[end] == "\\" or source[end] > "\x7f":
+            return Scanner.scanRegExp(self)
+
+        self.index = end
+        pattern = match.group(1)
+        flags = flags.group()
+        token = self.token(Token.RegularExpression, "", start, end)
+        token.pattern = pattern
+        token.flags = flags
+        token.regex = self.testRegExp(pattern, flags)
+        return token
+
+    def lex(self):
+        index = self.index
+        if index >= self.length:
+            return self.token(Token.EOF, "", index, index)
+
+        ch = self.source[index]
+        if ch in _IDENTIFIER_START or ch == "\\":
+            return self.scanIdentifier()
+        if ch > "\x7f":
+            # Unicode identifiers and whitespace take the reference path.
+            return Scanner.lex(self)
+        if ch in "0123456789":
+            return self.scanNumericLiteral()
+        if ch == '"' or ch == "'":
+            return self.scanStringLiteral()
+        if ch == ".":
+            if self.source[index + 1] in "0123456789":
+                return self.scanNumericLiteral()
+            return self.scanPunctuator()
+        if ch == "`" or (ch == "}" and self.curlyStack and self.curlyStack[-1] == "${"):
+            return self.scanTemplate()
+        return self.scanPunctuator()
+
+
+_IDENTIFIER_START = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_$")
+
+
+class FastParser(Parser):
+    def __init__(self, code, options={}, delegate=None, onComment=None):
+        # Build the reference scanner first so that Parser.__init__ can prime
+        # the lookahead, then swap in the fast one at the same position.
+        Parser.__init__(self, "", options=options, delegate=delegate)
+        self.onComment = onComment
+        scanner = FastScanner(code, self.errorHandler)
+        scanner.trackComment = self.config.comment
+        self.scanner = scanner
+        self.lookahead.lineNumber = scanner.lineNumber
+        self.startMarker.line = self.lastMarker.line = scanner.lineNumber
+        self.finalize = self.finalize if (
+            self.config.range or self.config.loc or self.delegate
+        ) else self.finalizeBare
+        self.nextToken()
+        self.lastMarker.index = scanner.index
+        self.lastMarker.line = scanner.lineNumber
+        self.lastMarker.column = scanner.index - scanner.lineStart
+
+    def finalizeBare(self, marker, node):
+        return node
+
+    def collectComments(self):
+        if not self.config.comment:
+            self.scanner.scanComments()
+            return
+        for e in self.scanner.scanComments():
+            source = self.scanner.source[e.slice[0]:e.slice[1]]
+            node = BlockComment(source) if e.multiLine else LineComment(source)
+            if self.config.range:
+                node.range = e.range
+            if self.config.loc:
+                node.loc = e.loc
+            sink = self.delegate or self.onComment
+            if sink:
+                metadata = SourceLocation(
+                    start=Position(line=e.loc.start.line, column=e.loc.start.column, offset=e.range[0]),
+                    end=Position(line=e.loc.end.line, column=e.loc.end.column, offset=e.range[1]),
+                )
+                sink(node, metadata)
+
+    def nextToken(self):
+        token = self.lookahead
+        scanner = self.scanner
+
+        lastMarker = self.lastMarker
+        lastMarker.index = scanner.index
+        lastMarker.line = scanner.lineNumber
+        lastMarker.column = scanner.index - scanner.lineStart
+
+        if scanner.source[scanner.index] in _TRIVIA_START:
+            self.collectComments()
+
+        startMarker = self.startMarker
+        if scanner.index != startMarker.index:
+            startMarker.index = scanner.index
+            startMarker.line = scanner.lineNumber
+            startMarker.column = scanner.index - scanner.lineStart
+
+        next = scanner.lex()
+        self.hasLineTerminator = token.lineNumber != next.lineNumber
+
+        if self.context.strict and next.type is Token.Identifier:
+            if scanner.isStrictModeReservedWord(next.value):
+                next.type = Token.Keyword
+        self.lookahead = next
+
+        if self.config.tokens and next.type is not Token.EOF:
+            self.tokens.append(self.convertToken(next))
+
+        return token
+
+    def match(self, *value):
+        lookahead = self.lookahead
+        return lookahead.type is Token.Punctuator and lookahead.value in value
+
+    def matchKeyword(self, *keyword):
+        lookahead = self.lookahead
+        return lookahead.type is Token.Keyword and lookahead.value in keyword
+
+
+def parse(code, options=None, delegate=None, **kwargs):
+    """Same contract as ``esprima.parse``, backed by ``FastParser``."""
+    options = {} if options is None else options.copy()
+    options.update(kwargs)
+
+    if options.get("esnext", False) or options.get("jsx", False):
+        # JSX scanning is not implemented here; the reference parser handles it.
+        import esprima
+        return esprima.parse(code, options, delegate)
+
+    commentHandler = None
+
+    def proxyDelegate(node, metadata):
+        if delegate:
+            new_node = delegate(node, metadata)
+            if new_node is not None:
+                node = new_node
+        if commentHandler:
+            commentHandler.visit(node, metadata)
+        return node
+
+    parserDelegate = None if delegate is None else proxyDelegate
+    onComment = None
+    collectComment = options.get("comment", False)
+    attachComment = options.get("attachComment", False)
+    if collectComment or attachComment:
+        commentHandler = CommentHandler()
+        commentHandler.attach = attachComment
+        options["comment"] = True
+        if attachComment or delegate:
+            parserDelegate = proxyDelegate
+        else:
+            # Collecting comments only needs the comment nodes, so ordinary
+            # nodes can skip the per-node delegate round trip entirely.
+            onComment = commentHandler.visit
+
+    parser = FastParser(code, options=options, delegate=parserDelegate, onComment=onComment)
+    isModule = options.get("sourceType", "script") == "module"
+    ast = parser.parseModule() if isModule else parser.parseScript()
+
+    if collectComment and commentHandler:
+        ast.comments = commentHandler.comments
+
+    if parser.config.tokens:
+        ast.tokens = parser.tokens
+
+    if parser.config.tolerant:
+        ast.errors = parser.errorHandler.errors
+
+    return ast
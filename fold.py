@@ -0,0 +1,77 @@
+"""Constant folding on the JavaScript tree, before it is emitted.
+
+Minifiers spell ``true`` and ``false`` as ``!0`` and ``!1``, and long
+strings are often written as ``"..." + "..."`` across lines.  Emitted
+as is, the first become ``not 0`` (evaluated on every use, and enough to
+keep a table off the visitor's literal fast path), the second a chain of
+additions.  ``fold`` replaces, bottom-up:
+
+* ``!`` applied to a literal (other than a regex) with the boolean;
+* ``+`` of two string literals with their concatenation.
+
+Both mean the same in JavaScript and in the Python they are emitted as.
+The tree is changed in place; new literals keep the position of what they
+replace.
+"""
+import json
+
+from esprima import nodes
+from esprima.objects import Object
+
+
+def _literal(node):
+    return type(node) is nodes.Literal and not node.regex
+
+
+def _folded(node):
+    kind = type(node)
+    if kind is nodes.UnaryExpression:
+        if node.operator == "!" and _literal(node.argument):
+            value = not node.argument.value
+            return nodes.Literal(value, "true" if value else "false")
+    elif kind is nodes.BinaryExpression:
+        if node.operator == "+" and _literal(node.left) and _literal(node.right) \
+                and type(node.left.value) is str and type(node.right.value) is str:
+            value = node.left.value + node.right.value
+            return nodes.Literal(value, json.dumps(value))
+    return None
+
+
+def _place(new, old):
+    for key in ("range", "loc"):
+        value = old.__dict__.get(key)
+        if value is not None:
+            new.__dict__[key] = value
+    return new
+
+
+def fold(tree):
+    """Fold the constants in ``tree`` in place; returns how many were folded."""
+    count = 0
+    stack = [(tree, False)]
+    while stack:
+        node, done = stack.pop()
+        fields = node.__dict__
+        if not done:
+            stack.append((node, True))
+            for value in fields.values():
+                if isinstance(value, Object):
+                    stack.append((value, False))
+                elif type(value) is list:
+                    stack.extend((item, False) for item in value if isinstance(item, Object))
+            continue
+        # Children are done, so what they fold into is final.
+        for key, value in fields.items():
+            if isinstance(value, Object):
+                new = _folded(value)
+                if new is not None:
+                    fields[key] = _place(new, value)
+                    count += 1
+            elif type(value) is list:
+                for index, item in enumerate(value):
+                    if isinstance(item, Object):
+                        new = _folded(item)
+                        if new is not None:
+                            value[index] = _place(new, item)
+                            count += 1
+    return count
@@ -0,0 +1,88 @@
+"""Parser backends in front of ``JsVisitor``.
+
+Every backend takes the same arguments as ``esprima.parse`` and returns an
+esprima-compatible tree, so the visitor does not care which one produced it.
+``esprima`` is kept as the reference implementation; ``fast``, the
+regex-driven scanner in ``fastparser``, is the default, and
+``tests/test_frontend.py`` checks that it builds the same trees (and
+fails on the same input) as esprima with every tree option.
+
+Parsed trees can be kept in an on-disk ``cache.ASTCache``; pass one as
+``cache=`` or point ``$ES62PY_CACHE_DIR`` at a directory.
+"""
+import hashlib
+import sys
+
+import esprima
+
+import fastparser
+from cache import default_cache
+
+
+__version__ = "0.1.0"
+
+BACKENDS = {}
+DEFAULT_BACKEND = "fast"
+
+
+def register_backend(name, parse):
+    BACKENDS[name] = parse
+    return parse
+
+
+register_backend("esprima", esprima.parse)
+register_backend("fast", fastparser.parse)
+
+
+def get_backend(name=None):
+    name = name or DEFAULT_BACKEND
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            f"unknown parser backend {name!r} (choose from {', '.join(sorted(BACKENDS))})"
+        ) from None
+
+
+_backend_digests = {}
+
+
+def backend_digest(name=None):
+    """A digest of the source of the module implementing backend ``name``.
+
+    Cached trees are keyed by it, so editing a parser invalidates them
+    without anyone bumping ``__version__``.
+    """
+    name = name or DEFAULT_BACKEND
+    digest = _backend_digests.get(name)
+    if digest is None:
+        module = sys.modules.get(getattr(get_backend(name), "__module__", None))
+        try:
+            with open(module.__file__, "rb") as f:
+                digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        except (AttributeError, TypeError, OSError):
+            digest = __version__
+        _backend_digests[name] = digest
+    return digest
+
+
+def parse(code, options=None, delegate=None, backend=None, cache=None):
+    """Parse ``code`` with the named backend, going through ``cache`` if any.
+
+    ``cache=None`` uses ``default_cache()``; ``cache=False`` disables caching.
+    Calls with a ``delegate`` are never cached since the delegate has to see
+    every node as it is built.
+    """
+    backend = backend or DEFAULT_BACKEND
+    parse = get_backend(backend)
+    if cache is None:
+        cache = default_cache()
+    if not cache or delegate is not None:
+        return parse(code, options, delegate)
+
+    key = cache.key(code, options, backend, backend_digest(backend))
+    tree = cache.get(key)
+    if tree is None:
+        tree = parse(code, options, delegate)
+        cache.put(key, tree)
+    return tree
@@ -0,0 +1,229 @@
+"""Incremental re-transpiling of a file that changes a little at a time.
+
+The previous run's source and, for every top-level statement, its span and
+its generated Python (the heads it hoisted plus its body) are kept in a
+state object that can be saved as JSON.  On the next run the old and new
+sources are diffed by common prefix and suffix; statements lying wholly in
+the unchanged parts are reused and only the span in between, widened by one
+statement on each side, is parsed and visited again.
+
+The widened span has to parse on its own and still begin and end with the
+same statements as before, otherwise the edit leaked across statement
+boundaries (an unclosed comment, string or brace) and everything is
+re-parsed.  Anonymous names depend only on the functions they name, so
+re-emitting a span never renames anything outside it.
+"""
+import json
+
+from frontend import __version__, parse
+from main import JsVisitor
+
+
+STATE_FORMAT = 2
+DEFAULT_OPTIONS = {"comment": True, "tolerant": True}
+
+_CHUNK = 1 << 16
+
+
+def common_prefix(a, b):
+    """Length of the longest common prefix of ``a`` and ``b``."""
+    limit = min(len(a), len(b))
+    start = 0
+    while start < limit and a[start:start + _CHUNK] == b[start:start + _CHUNK]:
+        start += _CHUNK
+    if start >= limit:
+        return limit
+    for index in range(start, min(start + _CHUNK, limit)):
+        if a[index] != b[index]:
+            return index
+    return min(start + _CHUNK, limit)
+
+
+def common_suffix(a, b, limit=None):
+    """Length of the longest common suffix of ``a`` and ``b``, at most ``limit``."""
+    limit = min(len(a), len(b)) if limit is None else limit
+    end = 0
+    while end < limit:
+        size = min(_CHUNK, limit - end)
+        if a[len(a) - end - size:len(a) - end] != b[len(b) - end - size:len(b) - end]:
+            break
+        end += size
+    else:
+        return limit
+    while end < limit and a[len(a) - end - 1] == b[len(b) - end - 1]:
+        end += 1
+    return end
+
+
+class _OuterSpans:
+    """Parser delegate that keeps the offsets of the outermost nodes seen so far.
+
+    Nodes are finalized children first, so each new node drops the ones it
+    encloses; once the program is parsed only its top-level statements are
+    left.  This avoids asking for ``range``, which would show up in the
+    output wherever ``JsVisitor`` falls back to printing a node.
+    """
+
+    def __init__(self):
+        self.spans = []
+
+    def __call__(self, node, metadata):
+        if node.type in ("Program", "BlockComment", "LineComment"):
+            return
+        start = metadata.start.offset
+        spans = self.spans
+        while spans and spans[-1][1] >= start:
+            spans.pop()
+        spans.append((node, start, metadata.end.offset))
+
+
+class IncrementalError(Exception):
+    """The changed span could not be re-parsed on its own."""
+
+
+class IncrementalTranspiler:
+    """Transpiles successive versions of one source, reusing unchanged statements."""
+
+    def __init__(self, options=None, backend=None, state=None):
+        self.options = dict(DEFAULT_OPTIONS if options is None else options)
+        self.backend = backend
+        self.source = None
+        self.statements = []
+        self.reparsed = 0
+        self.reused = 0
+        if state is not None:
+            self.load_state(state)
+
+    # State
+
+    def state(self):
+        return {
+            "format": STATE_FORMAT,
+            "version": __version__,
+            "backend": self.backend,
+            "options": self.options,
+            "source": self.source,
+            "statements": self.statements,
+        }
+
+    def load_state(self, state):
+        compatible = (
+            state.get("format") == STATE_FORMAT
+            and state.get("version") == __version__
+            and state.get("backend") == self.backend
+            and state.get("options") == self.options
+        )
+        if compatible:
+            self.source = state["source"]
+            self.statements = state["statements"]
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.state(), f)
+
+    def load(self, path):
+        with open(path) as f:
+            self.load_state(json.load(f))
+
+    # Transpiling
+
+    def transpile(self, code):
+        """Return the Python for ``code``, as ``"\\n".join(JsVisitor().visit(...))`` would."""
+        self.reparsed = self.reused = 0
+        statements = None
+        if self.source is not None and self.statements:
+            try:
+                statements = self._update(code)
+            except IncrementalError:
+                statements = None
+        if statements is None:
+            statements = self._emit(self._parse(code, self.options), 0)
+            self.reparsed = len(statements)
+        self.source = code
+        self.statements = statements
+        return self.output()
+
+    def output(self):
+        heads = [head for statement in self.statements for head in statement["heads"]]
+        bodies = [statement["body"] for statement in self.statements]
+        return "\n".join(heads + bodies)
+
+    def _parse(self, code, options):
+        """Parse ``code`` into a list of ``(statement, start, end)``."""
+        spans = _OuterSpans()
+        body = parse(code, options, spans, backend=self.backend, cache=False).body
+        offsets = {id(node): (start, end) for node, start, end in spans.spans}
+        return [(node,) + offsets[id(node)] for node in body]
+
+    def _update(self, code):
+        old, old_statements = self.source, self.statements
+        prefix = common_prefix(old, code)
+        suffix = common_suffix(old, code, min(len(old), len(code)) - prefix)
+        delta = len(code) - len(old)
+        count = len(old_statements)
+
+        # The statements the edit touches, plus one unchanged anchor each side.
+        lo = next((i for i, s in enumerate(old_statements) if s["end"] > prefix), count)
+        hi = next((i for i in range(count - 1, -1, -1) if old_statements[i]["start"] < len(old) - suffix), -1)
+        lo, hi = max(lo - 1, 0), min(hi + 1, count - 1)
+        if lo > hi:
+            lo, hi = hi, lo
+
+        start = old_statements[lo]["start"] if lo else 0
+        end = old_statements[hi]["end"] + delta if hi < count - 1 else len(code)
+        options = {key: value for key, value in self.options.items() if key != "tolerant"}
+        try:
+            body = self._parse(code[start:end], options)
+        except Exception:
+            raise IncrementalError(f"cannot re-parse {start}:{end}") from None
+        if lo and (not body or self._span(body[0], start) != self._span(old_statements[lo])):
+            raise IncrementalError("edit crosses the leading statement boundary")
+        if hi < count - 1 and (not body or self._span(body[-1], start) != self._span(old_statements[hi], delta)):
+            raise IncrementalError("edit crosses the trailing statement boundary")
+        middle = self._emit(body, start)
+
+        after = [
+            dict(s, start=s["start"] + delta, end=s["end"] + delta)
+            for s in old_statements[hi + 1:]
+        ]
+        self.reparsed = len(middle)
+        self.reused = lo + len(after)
+        return old_statements[:lo] + middle + after
+
+    @staticmethod
+    def _span(statement, offset=0):
+        if isinstance(statement, dict):
+            return (statement["start"] + offset, statement["end"] + offset)
+        return (statement[1] + offset, statement[2] + offset)
+
+    @staticmethod
+    def _emit(body, offset):
+        visitor = JsVisitor()
+        statements = []
+        for node, start, end in body:
+            # Dropped like visit_Script does.  Only a slice at the start of
+            # the file has the file's prologue; elsewhere the same string
+            # would just be re-parsed out of context.
+            if not offset and node.directive == "use strict":
+                continue
+            visitor.heads = []
+            text = visitor.visit(node)
+            statements.append({
+                "start": start + offset,
+                "end": end + offset,
+                "heads": visitor.heads,
+                "body": text,
+            })
+        return statements
+
+
+def transpile_incremental(code, state_path, options=None, backend=None):
+    """Transpile ``code`` reusing (and then updating) the state in ``state_path``."""
+    transpiler = IncrementalTranspiler(options, backend)
+    try:
+        transpiler.load(state_path)
+    except (OSError, ValueError):
+        pass
+    result = transpiler.transpile(code)
+    transpiler.save(state_path)
+    return result
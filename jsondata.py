@@ -0,0 +1,90 @@
+"""JSON files imported by transpiled modules, decoded on first use.
+
+``import data from './data.json'`` has no Python module to map to, and
+inlining the file as a literal would make the generated module carry,
+compile and build all of it on every import.  ``JsVisitor`` instead emits::
+
+    from jsondata import JsonModule as __json__
+    data = __json__(globals(), './data.json')
+
+``data`` is a stand-in that decodes the file with the stdlib's C decoder
+the first time it is used and from then on forwards to the decoded value.
+Paths are resolved against the directory of the importing module's
+``__file__`` (the current directory if it has none), and decoded files are
+cached per path, so every module importing a file shares one copy.  A
+named import (``import {a} from './data.json'``) picks a top-level key,
+which decodes the file right away.
+"""
+import json
+import os
+import threading
+
+
+_values = {}
+_values_lock = threading.Lock()
+_MISSING = object()
+
+
+def load(path):
+    """The decoded contents of the JSON file at ``path``, cached."""
+    path = os.path.abspath(path)
+    value = _values.get(path, _MISSING)
+    if value is _MISSING:
+        with open(path, "rb") as f:
+            value = json.loads(f.read())
+        with _values_lock:
+            value = _values.setdefault(path, value)
+    return value
+
+
+class JsonModule(object):
+    """Stand-in for the contents of a JSON file, decoded when first used."""
+
+    __slots__ = ("path", "_value")
+
+    def __init__(self, namespace, specifier):
+        importer = namespace.get("__file__")
+        base = os.path.dirname(os.path.abspath(importer)) if importer else os.getcwd()
+        self.path = os.path.join(base, specifier)
+        self._value = _MISSING
+
+    @property
+    def value(self):
+        if self._value is _MISSING:
+            self._value = load(self.path)
+        return self._value
+
+    def __getattr__(self, name):
+        # Member access on a JavaScript object reads a key, even one named
+        # like a dict method.
+        value = self.value
+        if type(value) is dict and name in value:
+            return value[name]
+        return getattr(value, name)
+
+    def __getitem__(self, key):
+        return self.value[key]
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __contains__(self, item):
+        return item in self.value
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __eq__(self, other):
+        if type(other) is JsonModule:
+            other = other.value
+        return self.value == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        if self._value is _MISSING:
+            return f"<JSON module {self.path} (not loaded)>"
+        return repr(self._value)
@@ -0,0 +1,209 @@
+"""Transpiling function bodies on first call.
+
+Most functions in a vendor bundle are never called, yet transpiling them
+and then compiling the generated module is where the time goes.  In lazy
+mode ``LazyParser`` only scans the bodies of function declarations that are
+not nested in another function, to find where they end, and keeps their
+source on the node as ``lazySource``.  ``JsVisitor`` then emits a one-line
+stub for them instead of a ``def``::
+
+    add = __lazy__(globals(), 'add', 'function add(a, b) { return a + b; }')
+
+The first call parses and transpiles that source, compiles it, runs the
+``def`` in the module's namespace (replacing the stub there) and calls the
+real function; later calls through references taken before that go
+straight to it.  Compiled code is cached per source, and parsed trees go
+through the frontend's AST cache when one is configured.
+
+Nested functions stay eager: they close over their enclosing function's
+locals, which a body compiled later at module level could not see.
+"""
+import threading
+
+from esprima import nodes as Node
+from esprima.token import Token
+from esprima.tokenizer import Reader
+
+from fastparser import FastParser
+from frontend import parse
+from main import JsVisitor
+
+
+PREAMBLE = "from lazy import LazyFunction as __lazy__"
+OPTIONS = {"tolerant": True}
+
+_codes = {}
+_codes_lock = threading.Lock()
+
+
+class LazyParser(FastParser):
+    """``FastParser`` that skips the bodies of outermost function declarations."""
+
+    def __init__(self, code, options={}, delegate=None, onComment=None):
+        super(LazyParser, self).__init__(code, options, delegate, onComment)
+        self.functionDepth = 0
+        self.paramDepth = 0
+        self.skipBody = False
+        self.skipped = 0
+
+    def parseFunctionDeclaration(self, identifierIsOptional=False):
+        if self.functionDepth or self.paramDepth:
+            return super(LazyParser, self).parseFunctionDeclaration(identifierIsOptional)
+        start = self.lookahead.start
+        self.skipBody = True
+        try:
+            node = super(LazyParser, self).parseFunctionDeclaration(identifierIsOptional)
+        finally:
+            self.skipBody = False
+        node.lazySource = self.scanner.source[start:self.lastMarker.index]
+        self.skipped += 1
+        return node
+
+    def parseFormalParameters(self, firstRestricted=None):
+        # Default values may hold functions of their own; those are parsed
+        # normally.
+        self.paramDepth += 1
+        try:
+            return super(LazyParser, self).parseFormalParameters(firstRestricted)
+        finally:
+            self.paramDepth -= 1
+
+    def parseFunctionSourceElements(self):
+        if self.skipBody and not self.paramDepth:
+            self.skipBody = False
+            return self.skipFunctionSourceElements()
+        self.functionDepth += 1
+        try:
+            return super(LazyParser, self).parseFunctionSourceElements()
+        finally:
+            self.functionDepth -= 1
+
+    def skipFunctionSourceElements(self):
+        """Consume a ``{ ... }`` body token by token and return an empty block.
+
+        Braces are counted on punctuators only: the scanner already turns the
+        ``}`` closing a template substitution into a template token.  Whether
+        a ``/`` starts a regular expression is guessed the way esprima's
+        tokenizer does.
+        """
+        node = self.createNode()
+        if not self.match('{'):
+            self.throwUnexpectedToken(self.lookahead)
+        scanner = self.scanner
+        reader = Reader()
+        reader.append(self.lookahead)
+        depth = 1
+        while depth:
+            scanner.scanComments()
+            if scanner.eof():
+                self.throwUnexpectedToken(scanner.lex())
+            if scanner.source[scanner.index] == '/' and reader.isRegexStart():
+                state = scanner.saveState()
+                try:
+                    token = scanner.scanRegExp()
+                except Exception:
+                    scanner.restoreState(state)
+                    token = scanner.lex()
+            else:
+                token = scanner.lex()
+            reader.append(token)
+            if token.type is Token.Punctuator:
+                if token.value == '{':
+                    depth += 1
+                elif token.value == '}':
+                    depth -= 1
+        self.nextToken()
+        return self.finalize(node, Node.BlockStatement([]))
+
+
+def _parse(code, options):
+    # JsVisitor never looks at comments, so don't collect them.
+    options = {key: value for key, value in (OPTIONS if options is None else options).items()
+               if key not in ("comment", "attachComment")}
+    parser = LazyParser(code, options=options)
+    isModule = options.get("sourceType", "script") == "module"
+    ast = parser.parseModule() if isModule else parser.parseScript()
+    if parser.config.tolerant:
+        ast.errors = parser.errorHandler.errors
+    return parser, ast
+
+
+def parse_lazy(code, options=None):
+    """Parse ``code`` with ``LazyParser``; like ``fastparser.parse`` without comments."""
+    return _parse(code, options)[1]
+
+
+def transpile_lazy(code, options=None):
+    """Python for ``code`` with outermost function declarations left as stubs."""
+    parser, tree = _parse(code, options)
+    lines = JsVisitor().visit(tree)
+    if parser.skipped:
+        lines = [PREAMBLE] + lines
+    return "\n".join(lines)
+
+
+def compile_function(name, source):
+    """Code object defining ``name`` from its JavaScript ``source``, cached."""
+    code = _codes.get(source)
+    if code is None:
+        # Helpers hoisted out of default parameters land in the module
+        # namespace; their names come from their content, so they cannot
+        # clobber different eager ones.
+        python = "\n".join(JsVisitor().visit(parse(source, {"tolerant": True})))
+        code = compile(python, f"<lazy {name}>", "exec")
+        with _codes_lock:
+            code = _codes.setdefault(source, code)
+    return code
+
+
+class LazyFunction(object):
+    """Stub for a function whose body is transpiled on first call.
+
+    Properties set on the stub (``f.tag = 'x'``) are kept in its
+    ``__dict__`` and copied onto the real function when it is compiled;
+    after that, reading and setting them goes to the real function.
+    """
+
+    __slots__ = ("namespace", "name", "source", "function", "__dict__")
+
+    def __init__(self, namespace, name, source):
+        self.namespace = namespace
+        self.name = name
+        self.source = source
+        self.function = None
+
+    def materialize(self):
+        if self.function is None:
+            namespace = self.namespace
+            exec(compile_function(self.name, self.source), namespace)
+            function = namespace[self.name]
+            function.__dict__.update(self.__dict__)
+            self.__dict__.clear()
+            self.function = function
+        return self.function
+
+    def __getattr__(self, name):
+        # Only reached for names that are neither slots nor in __dict__.
+        function = object.__getattribute__(self, "function")
+        if function is None:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        return getattr(function, name)
+
+    def __setattr__(self, name, value):
+        if name in LazyFunction.__slots__ or self.function is None:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.function, name, value)
+
+    def __delattr__(self, name):
+        if name in LazyFunction.__slots__ or self.function is None:
+            object.__delattr__(self, name)
+        else:
+            delattr(self.function, name)
+
+    def __call__(self, *args, **kwargs):
+        return (self.function or self.materialize())(*args, **kwargs)
+
+    def __repr__(self):
+        state = "compiled" if self.function is not None else "not compiled"
+        return f"<lazy function {self.name} ({state})>"
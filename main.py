@@ -1,14 +1,50 @@
+from types import GeneratorType
+
+from esprima.objects import Object
 from esprima.visitor import NodeVisitor, Visited
-from esprima import parse
-from random import randint
+from codewriter import CodeWriter, digest, render
+from naming import Names
+from frontend import BACKENDS, DEFAULT_BACKEND, __version__, parse
+from cache import ASTCache
+from compact import compact
 
 class JsVisitor(NodeVisitor):
-    indentLevel = 0
-    in_class = False
-    i = -1
-    oldHeads = []
-    heads = []
-    current_params = None
+    """Emits Python source for an esprima tree.
+
+    Handlers are generators driven by the ``run`` loop, which follows
+    esprima's ``Visitor.visit``: ``value = yield child`` visits a child node
+    and ``yield Visited(text)`` hands a handler's result back, so nesting
+    depth costs heap, not Python stack. Helpers that take extra arguments
+    are delegated to with ``yield self.visit_X(node, ...)``.
+
+    Rather than building ``"visit_" + name`` and calling ``getattr`` for
+    every node, ``run`` looks the node's class up in ``handlers``, filled
+    from the class's ``dispatchTable`` the first time each class is seen.
+
+    Compound handlers collect their pieces in a ``CodeWriter`` instead of
+    concatenating their children's results, and ``visit`` renders the
+    outermost result (and the hoisted ``heads``) once.
+
+    All state lives on the instance, so separate visitors can run at the
+    same time on separate trees; a single visitor is not thread-safe.
+
+    Given a ``memo.OutputMemo``, functions identical to one emitted before
+    (in the same context) reuse its text instead of being visited again;
+    pass the ``source`` the tree was parsed from, with ``range``, to make
+    telling them apart cheap.
+    """
+
+    def __init__(self, memo=None, source=None):
+        self.memo = memo
+        self.source = source
+        self.indentLevel = 0
+        self.in_class = False
+        self.names = Names()
+        self.heads = []
+        self.headsLevel = 0
+        self.headsStack = []
+        self.current_params = None
+        self.handlers = {}
 
     def indent(self):
         self.indentLevel += 1
@@ -19,28 +55,110 @@ class JsVisitor(NodeVisitor):
     def getIndent(self):
         return "    " * self.indentLevel
 
-    def setHeads(self, heads):
-        self.oldHeads = [x for x in self.heads]
-        self.heads = heads
-
-    def unSetHeads(self):
-        self.heads = self.oldHeads
-
-    def randnum(self):
-        self.i += 1
-        return self.i
+    # Hoisting scopes. Anonymous functions (and destructuring temporaries)
+    # are hoisted into ``heads``, the innermost open scope, and written out
+    # at the top of the block that opened it, at that block's indentation.
+
+    def pushHeads(self):
+        """Open a hoisting scope at the current indentation; returns its list."""
+        self.headsStack.append((self.heads, self.headsLevel))
+        self.heads = []
+        self.headsLevel = self.indentLevel
+        return self.heads
+
+    def popHeads(self):
+        heads = self.heads
+        self.heads, self.headsLevel = self.headsStack.pop()
+        return heads
+
+    def writeHeads(self, code, heads):
+        indent = self.getIndent()
+        for head in heads:
+            code.write(indent, head, "\n")
+
+    def anonymousName(self, text, prefix="_anonymous_func_"):
+        """A name to hoist something under, derived from its ``text`` (or writer)."""
+        return self.names.name(prefix, digest(text))
+
+    # Dispatch
+
+    @classmethod
+    def buildDispatch(cls):
+        """``{node class name: handler function}`` for this class.
+
+        Called once per class by ``dispatchTable``; subclasses can extend
+        the result to route more node types to a handler.
+        """
+        return {name[len("visit_"):]: getattr(cls, name) for name in dir(cls) if name.startswith("visit_")}
+
+    @classmethod
+    def dispatchTable(cls):
+        table = cls.__dict__.get("_dispatchTable")
+        if table is None:
+            table = cls._dispatchTable = cls.buildDispatch()
+        return table
+
+    def handlerFor(self, kind):
+        """``(bound handler, is an esprima Object)`` for nodes of class ``kind``."""
+        isObject = issubclass(kind, Object)
+        function = self.dispatchTable().get(kind.__name__)
+        if function is None:
+            function = self.dispatchTable()["Object" if isObject else "Generic"]
+        entry = self.handlers[kind] = (function.__get__(self, type(self)), isObject)
+        return entry
+
+    def run(self, node):
+        """Drive the handlers for ``node`` and return its (unrendered) result.
+
+        Same protocol as esprima's ``Visitor.visit``, including falling back
+        to ``visit_Object`` when a node is visited again from inside itself.
+        """
+        handlers = self.handlers
+        context = {}
+        stack = [(node, None)]
+        result = None
+        while stack:
+            item, visited = stack[-1]
+            kind = type(item)
+            try:
+                if kind is GeneratorType:
+                    stack.append((item.send(result), None))
+                    result = None
+                elif kind is Visited:
+                    stack.pop()
+                    result = item.result
+                else:
+                    handler, isObject = handlers.get(kind) or self.handlerFor(kind)
+                    if isObject:
+                        if item in context:
+                            handler = self.visit_RecursionError if context[item] == self.visit_Object else self.visit_Object
+                        context[item] = handler
+                        stack[-1] = (handler(item), item)
+                    else:
+                        stack[-1] = (handler(item), None)
+            except StopIteration:
+                stack.pop()
+                if visited is not None and visited in context:
+                    del context[visited]
+        return result
+
+    def visit(self, node):
+        result = render(self.run(node))
+        self.heads[:] = render(self.heads)
+        return result
 
     def visit_Object(self, node):
-        return Visited(node)
+        yield Visited(node)
 
     def visit_Script(self, node):
         ret = []
         for item in node.body:
-            ret.append(self.visit(item))
-        return self.heads + ret
+            if item.directive != "use strict":
+                ret.append((yield item))
+        yield Visited(self.heads + ret)
 
     def visit_Program(self, node):
-        return self.visit(node)
+        yield Visited((yield node))
 
     def visit_Identifier(self, node):
         name = node.name
@@ -48,43 +166,59 @@ class JsVisitor(NodeVisitor):
             name = "globals"
         if name == "Error":
             name = "Exception"
-        return name
+        yield Visited(name)
 
     # Functions
     def visit_FunctionDeclaration(self, node, param=None, direct=True):
-        name = self.visit(node.id) or "__anonymous_function__"
-        head = f"{self.getIndent()}{'async ' if node.isAsync else ''}def {name}"
-        params = f", ".join(self.visit(i) for i in ((param or []) + node.params))
+        name = (yield node.id) or "__anonymous_function__"
+        if node.lazySource is not None:
+            # Body left for lazy.LazyFunction to transpile on first call.
+            yield Visited(f"{name} = __lazy__(globals(), {name!r}, {node.lazySource!r})")
+            return
+        body = yield self.functionBody(node, param)
+        yield Visited(CodeWriter("async " if node.isAsync else "", "def ", name, body).value())
+
+    def functionBody(self, node, param=None):
+        """A ``def`` after its name: the parameters, then the hoisted heads and body."""
+        memo = self.memo
+        if memo is not None:
+            key = memo.key(node, self.source, self.indentLevel, self.in_class, tuple(param or ()))
+            text = memo.get(key)
+            if text is not None:
+                yield Visited(text)
+                return
+        params = []
+        for i in ((param or []) + node.params):
+            params.append((yield i))
+        params = CodeWriter().join(", ", params).value()
         self.current_params = params
-        head = head + f"({params}):\n"
-        
-        heads = []
-        old = self.heads
+        code = CodeWriter("(", params, "):\n")
 
         self.indent()
-        self.setHeads(heads)
-        body = (self.getIndent() if node.expression is True else "") + self.visit(node.body)
-        self.setHeads(old)
+        self.pushHeads()
+        prefix = self.getIndent() if node.expression is True else ""
+        body = yield node.body
+        self.writeHeads(code, self.popHeads())
         self.dedent()
 
-        return head + f"".join(f"{i}\n{self.getIndent()}" for i in heads) + body
+        text = code.write(prefix, body).value()
+        if memo is not None:
+            memo.put(key, text)
+        yield Visited(text)
 
-    def visit_FunctionExpression(self, node, name=None, heads=None, direct=True):
-        if name:
-            node.id = name
-            nm = name
-        else:
-            num = self.randnum()
-            nm = "_anonymous_func_" + f"{num}"
-            node.id = nm
-        
-
-        body = self.visit_FunctionDeclaration(node, param=["this", "arguments"], direct=direct)
-        heads = heads or self.heads
+    def visit_FunctionExpression(self, node, name=None, direct=True, prefix="_anonymous_func_"):
+        # Emit the definition at the indentation of the scope it goes to.
+        level = self.indentLevel
+        self.indentLevel = self.headsLevel
+        body = yield self.functionBody(node, param=["this", "arguments"])
+        self.indentLevel = level
 
-        heads.append(body)
+        if not name:
+            # Named after its own text, so that nothing else can rename it.
+            name = self.anonymousName(body, prefix)
+        self.heads.append(CodeWriter("async " if node.isAsync else "", "def ", name, body).value())
 
-        return nm
+        yield Visited(name)
 
     def visit_AsyncFunctionDeclaration(self, node, *a, **kw):
         return self.visit_FunctionDeclaration(node, *a, direct=False, **kw)
@@ -97,9 +231,14 @@ class JsVisitor(NodeVisitor):
         if node.argument and ("Expression" in type and type in ["UnaryExpression", "SequenceExpression", "UpdateExpression", "AssignmentExpression"]):
             if type == "SequenceExpression":
                 last = node.argument.expressions.pop()
-                return f"{self.visit(node.argument)}\n{self.getIndent()}{key} {self.visit(last)}"
-            return f"{self.visit(node.argument)}\n{self.getIndent()}{key} {self.visit(node.argument.argument)}"
-        return f"{key} {self.visit(node.argument)}"
+                argument = yield node.argument
+                value = yield last
+            else:
+                argument = yield node.argument
+                value = yield node.argument.argument
+            yield Visited(CodeWriter(argument, "\n", self.getIndent(), key, " ", value).value())
+        else:
+            yield Visited(CodeWriter(key, " ", (yield node.argument)).value())
 
     def visit_ReturnStatement(self, node):
         return self.BaseStatement(node, key="return")
@@ -113,158 +252,178 @@ class JsVisitor(NodeVisitor):
     # Block Statement
     def visit_BlockStatement(self, node):
         if node.body:
-            ret = "\n" + f"\n".join([f"{self.getIndent()}{self.visit(i)}" if i.directive != "use strict" else "" for i in node.body])
+            ret = CodeWriter()
+            for i in node.body:
+                ret.write("\n")
+                if i.directive != "use strict":
+                    ret.write(self.getIndent(), (yield i))
         else:
-            ret = f"{self.getIndent()}pass"
-        return ret
+            ret = CodeWriter(self.getIndent(), "pass")
+        yield Visited(ret.value())
 
     # Rest and Spread
     def visit_RestElement(self, node, isObject=False):
-        return ("**" if isObject else "*") + self.visit(node.argument)
+        yield Visited(CodeWriter("**" if isObject else "*", (yield node.argument)).value())
 
     def visit_SpreadElement(self, node, isObject=False):
-        return ("**" if isObject else "*") + self.visit(node.argument)
+        yield Visited(CodeWriter("**" if isObject else "*", (yield node.argument)).value())
 
     # If Statement
     def visit_IfStatement(self, node):
-        head = f"if {self.visit(node.test)}:\n"
-        heads = []
+        code = CodeWriter("if ", (yield node.test), ":\n")
 
         self.indent()
-        old = self.heads
-        self.setHeads(heads)
-        body = (self.getIndent() if node.consequent.type != "BlockStatement" else "") + self.visit(node.consequent)
-        self.setHeads(old)
+        self.pushHeads()
+        prefix = self.getIndent() if node.consequent.type != "BlockStatement" else ""
+        body = yield node.consequent
+        self.writeHeads(code, self.popHeads())
         self.dedent()
 
         alt = ""
         if node.alternate:
             if node.alternate.type == "IfStatement":
-                cond = f"\n{self.getIndent()}el"
+                cond = CodeWriter("\n", self.getIndent(), "el")
             else:
-                cond = f"\n{self.getIndent()}else:\n"
+                alt = CodeWriter("\n", self.getIndent(), "else:\n")
                 self.indent()
-                alt = cond + self.visit(node.alternate)
+                self.pushHeads()
+                orelse = yield node.alternate
+                self.writeHeads(alt, self.popHeads())
                 self.dedent()
+                alt.write(orelse)
 
-        return head + f"{self.getIndent()}".join(f"{i}\n" for i in heads) + body + alt
+        yield Visited(code.write(prefix, body, alt).value())
 
     # Literals
     def visit_Literal(self, node):
-        return repr(node.value)
-    
+        yield Visited(repr(node.value))
+
     def visit_TemplateElement(self, node):
-        return node.value.cooked
+        yield Visited(node.value.cooked)
 
     def visit_TemplateLiteral(self, node):
-        ret = f'f"""'
+        ret = CodeWriter('f"""')
         for i, word in enumerate(node.quasis):
-            try: ex = "{%s}"%self.visit(node.expressions[i])
-            except IndexError: ex = ""
-            ret = ret + f"{self.visit(word)}{ex}"
-        ret = ret + '"""'
-        return ret
+            try: expression = node.expressions[i]
+            except IndexError:
+                ret.write((yield word))
+            else:
+                ex = yield expression
+                ret.write((yield word), "{", ex, "}")
+        ret.write('"""')
+        yield Visited(ret.value())
 
     def visit_RegexLiteral(self, node):
-        return repr(node.value)
+        yield Visited(repr(node.value))
 
     # Switch Case
     def visit_SwitchStatement(self, node):
-        head = f"match {self.visit(node.discriminant)}:\n"
+        code = CodeWriter("match ", (yield node.discriminant), ":\n")
 
         self.indent()
         cases = []
         for cas in node.cases:
-            cases.append(self.visit(cas))
-        body = "\n".join(f"{self.getIndent()}{i}" for i in cases)
+            cases.append((yield cas))
+        indent = self.getIndent()
+        for n, i in enumerate(cases):
+            code.write("\n" if n else "", indent, i)
         self.dedent()
 
-        return head + body
+        yield Visited(code.value())
 
     def visit_SwitchCase(self, node):
         if node.test:
-            head = f"case {self.visit(node.test)}:\n"
+            code = CodeWriter("case ", (yield node.test), ":\n")
         else:
-            head = "default:\n"
+            code = CodeWriter("default:\n")
 
         self.indent()
         cases = []
         for cas in node.consequent:
-            cases.append(self.visit(cas))
-        body = "\n".join(f"{self.getIndent()}{i}" for i in cases)
+            cases.append((yield cas))
+        indent = self.getIndent()
+        for n, i in enumerate(cases):
+            code.write("\n" if n else "", indent, i)
         self.dedent()
 
-        return head + body
+        yield Visited(code.value())
 
     # Variables
     def visit_VariableDeclaration(self, node, default=True):
         decls = []
         for dec in node.declarations:
             if dec.type == "VariableDeclarator":
-                decls.append(self.visit_VariableDeclarator(dec, default=default, is_global=(node.kind == "var")))
+                decls.append((yield self.visit_VariableDeclarator(dec, default=default, is_global=(node.kind == "var"))))
             else:
-                decls.append(self.visit(dec))
-        return f"\n" + f"".join(f"\n{self.getIndent()}{i}" for i in decls)
+                decls.append((yield dec))
+        code = CodeWriter("\n")
+        indent = self.getIndent()
+        for i in decls:
+            code.write("\n", indent, i)
+        yield Visited(code.value())
 
     def visit_VariableDeclarator(self, node, default=True, is_global=False):
         # print("VarDec", node)
         # heads = []
-        tails = []
         # self.setHeads(heads)
         if node.init:
             if "Function" in node.init.type:
-                name = self.visit(node.id)
-                self.visit_FunctionExpression(node.init, name=name, direct=True)
+                name = yield node.id
+                yield self.visit_FunctionExpression(node.init, name=name, direct=True)
                 # body = self.getIndent() + f"{self.visit(node.id)} = {name}"
                 # return head + "\n" + body
                 val = name
             elif node.init.type in ["CallExpression", "NewExpression"]:
-                b = self.visit_CallExpression(node.init)
+                b = yield self.visit_CallExpression(node.init)
                 val = b
             else:
-                val = self.visit(node.init)
+                val = yield node.init
         else:
             val = "None"
 
         if node.id.type == "ObjectPattern":
-            num = self.randnum()
+            keys = []
+            for prop in node.id.properties:
+                keys.append((yield prop.key))
+            temp = self.anonymousName(CodeWriter(val, " ").join(", ", keys), "_temp_")
             key = None
-            tail = f"del _temp_{num}"
-
-            self.heads.append(f"_temp_{num} = {val}")
 
-            for prop in node.id.properties:
-                k = self.visit(prop.key)
-                self.heads.append(f"{k} = _temp_{num}.{k}")
+            self.heads.append(CodeWriter(temp, " = ", val).value())
 
-            tails.append(tail)
+            for k in keys:
+                self.heads.append(CodeWriter(k, " = ", temp, ".", k).value())
+            # Right after the reads: the same destructuring twice in a block
+            # hoists the same temporary twice.
+            self.heads.append(f"del {temp}")
         else:
-            key = self.visit(node.id)
+            key = yield node.id
 
         # self.unSetHeads()
 
-        if default:
-            main = f"{key} = {val}"
-        else:
-            main = f"{key}"
-
-        return ((main if key else "")
-            + ("".join(f"\n{self.getIndent()}{tails}") if tails else "")
-        )
+        code = CodeWriter()
+        if key:
+            if default:
+                code.write(key, " = ", val)
+            else:
+                code.write(key)
+        yield Visited(code.value())
 
     # Expressions
     def visit_SequenceExpression(self, node):
-        return "; ".join(self.visit(i) for i in node.expressions)
+        expressions = []
+        for i in node.expressions:
+            expressions.append((yield i))
+        yield Visited(CodeWriter().join("; ", expressions).value())
 
     def visit_UpdateExpression(self, node):
         if node.operator == "++":
             node.operator = "+=1"
         if node.operator == "--":
             node.operator = "-=1"
-        return f"{self.visit(node.argument)}{node.operator}"
+        yield Visited(CodeWriter((yield node.argument), node.operator).value())
 
     def visit_UnaryExpression(self, node):
-        a = self.visit(node.argument)
+        a = yield node.argument
         op = node.operator
 
         if op == "!":
@@ -274,30 +433,33 @@ class JsVisitor(NodeVisitor):
         elif op == "void":
             op = ""
         elif op == "typeof":
-            return f"type(globals().get('{a}'))"
+            yield Visited(CodeWriter("type(globals().get('", a, "'))").value())
+            return
 
         pre = op if node.prefix else a
         suf = a if node.prefix else op
 
-        return f"{pre} {suf}"
+        yield Visited(CodeWriter(pre, " ", suf).value())
 
     def visit_ExpressionStatement(self, node):
-        return self.visit(node.expression)
-    
+        yield Visited((yield node.expression))
+
+    visit_Directive = visit_ExpressionStatement
+
     def visit_EmptyStatement(self, node):
-        return f""
-    
+        yield Visited(f"")
+
     def visit_BreakStatement(self, node):
-        return f"break"
-    
+        yield Visited(f"break")
+
     def visit_ContinueStatement(self, node):
-        return f"continue"
+        yield Visited(f"continue")
 
     def visit_ConditionalExpression(self, node):
-        return f"{self.visit(node.consequent)} if {self.visit(node.test)} else {self.visit(node.alternate)}"
+        yield Visited(CodeWriter((yield node.consequent), " if ", (yield node.test), " else ", (yield node.alternate)).value())
 
     def visit_AssignmentExpression(self, node):
-        return f"{self.visit(node.left)} {node.operator} {self.visit(node.right)}"
+        yield Visited(CodeWriter((yield node.left), " ", node.operator, " ", (yield node.right)).value())
 
     def visit_AssignmentPattern(self, node):
         node.operator = "="
@@ -326,180 +488,233 @@ class JsVisitor(NodeVisitor):
         #         return self.getIndent() + head + body
 
         if "Function" in node.callee.type:
-            num = self.randnum()
-            name = "_anonymous_func_" + f"{num}"
-            self.visit_FunctionExpression(node.callee, name=name, direct=False)
-            callee = name
+            callee = yield self.visit_FunctionExpression(node.callee, direct=False)
         else:
-            callee = self.visit(node.callee)
+            callee = yield node.callee
 
         arg = []
         # self.setHeads(heads)
         for i in node.arguments:
             if "Function" in i.type:
-                num = self.randnum()
-                name = "_anonymous_func_" + f"{num}"
-                self.visit_FunctionExpression(i, name=name, direct=False)
-                arg.append(name)
+                arg.append((yield self.visit_FunctionExpression(i, direct=False)))
             else:
-                arg.append(self.visit(i))
-        args = ", ".join(arg)
+                arg.append((yield i))
         # self.unSetHeads()
 
-        return f"{prepend if prepend else ''}{callee}({args})"
+        yield Visited(CodeWriter(prepend if prepend else "", callee, "(").join(", ", arg).write(")").value())
 
     def visit_NewExpression(self, node):
         return self.visit_CallExpression(node)
 
     def visit_ArrayExpression(self, node):
-        body = self.visit_ArrayPattern(node)
-        return f"Js([{body}])"
+        text = self.literalText(node)
+        if text is None:
+            text = CodeWriter("Js([", (yield self.visit_ArrayPattern(node)), "])").value()
+        yield Visited(text)
 
     def visit_ArrayPattern(self, node):
-        return ", ".join([self.visit(i) if i else "" for i in node.elements])
+        elements = []
+        for i in node.elements:
+            elements.append((yield i) if i else "")
+        yield Visited(CodeWriter().join(", ", elements).value())
 
     def visit_ObjectExpression(self, node):
-        return self.visit_ObjectPattern(node)
+        text = self.literalText(node)
+        if text is None:
+            text = yield self.visit_ObjectPattern(node)
+        yield Visited(text)
+
+    @staticmethod
+    def literalText(node):
+        """Text for an array or object made of nothing but literals, else None.
+
+        Data tables in bundles run to thousands of elements; writing them
+        out in one go skips a handler per element.  The text is what the
+        handlers would have produced.
+        """
+        if node.elements is not None:
+            frames = [("Js([", "])", [], iter(node.elements))]
+        else:
+            frames = [("{", "}", [], iter(node.properties))]
+        while True:
+            opener, closer, parts, items = frames[-1]
+            for item in items:
+                if item is None:
+                    # Array hole.
+                    parts.append("")
+                    continue
+                kind = item.type
+                if kind == "Literal":
+                    parts.append(repr(item.value))
+                elif kind == "UnaryExpression":
+                    if item.operator not in ("-", "+") or item.argument.type != "Literal":
+                        return None
+                    parts.append(f"{item.operator} {item.argument.value!r}")
+                elif kind == "ArrayExpression":
+                    frames.append(("Js([", "])", [], iter(item.elements)))
+                    break
+                elif kind == "ObjectExpression":
+                    frames.append(("{", "}", [], iter(item.properties)))
+                    break
+                elif kind == "Property":
+                    if item.computed or item.kind != "init":
+                        return None
+                    key = item.key
+                    if key.type == "Literal":
+                        key = repr(key.value)
+                    elif key.type == "Identifier" and key.name not in ("global", "Error"):
+                        key = f"'{key.name}'"
+                    else:
+                        return None
+                    frames.append((key + ": ", "", [], iter((item.value,))))
+                    break
+                else:
+                    return None
+            else:
+                frames.pop()
+                text = "".join((opener, ", ".join(parts), closer))
+                if not frames:
+                    return text
+                frames[-1][2].append(text)
 
     def visit_ObjectPattern(self, node):
         # has_heads = self.heads is not None
         # heads = []
         # self.setHeads(heads)
 
-        body = (
-            "{"
-            + ", ".join(
-                [
-                    (
-                        self.visit_Property(i)
-                        if i.type != "RestElement"
-                        else self.visit_RestElement(i, isObject=True)
-                    )
-                    for i in node.properties
-                ]
-            )
-            + "}"
-        )
-
-        return body
+        properties = []
+        for i in node.properties:
+            properties.append((yield (
+                self.visit_Property(i)
+                if i.type != "RestElement"
+                else self.visit_RestElement(i, isObject=True)
+            )))
+        body = CodeWriter("{").join(", ", properties).write("}")
+
+        yield Visited(body.value())
 
     def visit_Property(self, node):
         if node.type == "SpreadElement":
-            return self.visit_SpreadElement(self, node, isObject=True)
+            yield Visited((yield self.visit_SpreadElement(self, node, isObject=True)))
+            return
 
-        key = self.visit(node.key)
+        key = yield node.key
 
         if node.key.type == "Identifier":
             key = f"'{key}'"
 
         if node.value.type == "FunctionExpression":
-            num = self.randnum()
-            name = "_anonymous_func_" + self.visit(node.key) + f"{num}"
-            self.visit_FunctionExpression(node.value, name=name)
-            return f"{key}: {name}"
+            prefix = f"_anonymous_func_{(yield node.key)}_"
+            name = yield self.visit_FunctionExpression(node.value, prefix=prefix)
+            yield Visited(CodeWriter(key, ": ", name).value())
         else:
-            return f"{key}: {self.visit(node.value)}"
+            yield Visited(CodeWriter(key, ": ", (yield node.value)).value())
 
     def visit_StaticMemberExpression(self, node):
-        return f"{self.visit(node.object)}.{self.visit(node.property)}"
+        yield Visited(CodeWriter((yield node.object), ".", (yield node.property)).value())
 
     def visit_ComputedMemberExpression(self, node):
-        return f"{self.visit(node.object)}[{self.visit(node.property)}]"
+        yield Visited(CodeWriter((yield node.object), "[", (yield node.property), "]").value())
 
     # Classes
     def visit_ClassDeclaration(self, node):
-        head = f"class {self.visit(node.id)}"
-        head = (
-            head
-            + f"({self.visit(node.superClass) if node.superClass else 'object'}):\n"
-        )
+        code = CodeWriter("class ", (yield node.id))
+        code.write("(", (yield node.superClass) if node.superClass else "object", "):\n")
 
         self.indent()
         self.in_class = True
-        body = self.visit(node.body)
+        body = yield node.body
         self.in_class = False
         self.dedent()
 
-        return head + body
+        yield Visited(code.write(body).value())
 
     def visit_ClassBody(self, node):
         if node.body:
-            return "\n".join(f"{self.getIndent()}{self.visit(i)}" for i in node.body)
+            code = CodeWriter()
+            for n, i in enumerate(node.body):
+                code.write("\n" if n else "", self.getIndent(), (yield i))
+            yield Visited(code.value())
         else:
-            return self.getIndent() + "pass"
+            yield Visited(CodeWriter(self.getIndent(), "pass").value())
 
     def visit_MethodDefinition(self, node):
-        head = f"@staticmethod\n{self.getIndent()}" if node.static else ""
+        code = CodeWriter("@staticmethod\n", self.getIndent()) if node.static else CodeWriter()
         node.value.params.insert(0, "self")
 
         node.value.id = node.key
-        body = self.visit_FunctionDeclaration(node.value)
-        return head + body
+        body = yield self.visit_FunctionDeclaration(node.value)
+        yield Visited(code.write(body).value())
 
     def visit_ThisExpression(self, node):
         if self.in_class:
-            return "self"
+            yield Visited("self")
         else:
-            return "this"
+            yield Visited("this")
 
     # For loop
     def visit_ForInStatement(self, node):
-        head = f"for {self.visit(node.left) if node.left.type != 'VariableDeclaration' else self.visit_VariableDeclaration(node.left, default=False)} in {self.visit(node.right)}:\n"
+        code = CodeWriter("for ", (yield node.left) if node.left.type != 'VariableDeclaration' else (yield self.visit_VariableDeclaration(node.left, default=False)), " in ", (yield node.right), ":\n")
 
         self.indent()
-        body = self.visit(node.body)
+        body = yield node.body
         self.dedent()
 
-        return head + body
+        yield Visited(code.write(body).value())
 
     def visit_ForOfStatement(self, node):
         return self.visit_ForInStatement(node)
 
     def visit_ForStatement(self, node):
-        head = f"{self.visit(node.init)}\n{self.getIndent()}"
-        head = head + f"while {self.visit(node.test)}:\n"
+        code = CodeWriter((yield node.init), "\n", self.getIndent())
+        code.write("while ", (yield node.test), ":\n")
 
         self.indent()
-        body = self.visit(node.body)
-        body = f"{self.getIndent()}" + body + f"\n{self.getIndent()}{self.visit(node.update)}"
+        body = yield node.body
+        code.write(self.getIndent(), body, "\n", self.getIndent(), (yield node.update))
         self.dedent()
 
-        return head + body
+        yield Visited(code.value())
 
     # While Loop
     def visit_WhileStatement(self, node):
-        head = f"while {self.visit(node.test)}:\n"
+        code = CodeWriter("while ", (yield node.test), ":\n")
 
         self.indent()
-        body = self.visit(node.body)
+        body = yield node.body
         self.dedent()
 
-        return head + body
+        yield Visited(code.write(body).value())
 
     # Do While loop
     def visit_DoWhileStatement(self, node):
         return self.visit_WhileStatement(node)
-    
+
     def visit_TryStatement(self, node):
-        head = f"try:\n"
+        code = CodeWriter("try:\n")
         self.indent()
-        body = self.visit(node.block)
+        code.write((yield node.block))
         self.dedent()
-        handler = (f"\n{self.getIndent()}" + self.visit(node.handler) if node.handler else "")
-        finalizer = (f"\n{self.getIndent()}" + self.visit(node.finalizer) if node.finalizer else "")
-        return head + body + handler + finalizer
-    
+        if node.handler:
+            code.write("\n", self.getIndent(), (yield node.handler))
+        if node.finalizer:
+            code.write("\n", self.getIndent(), (yield node.finalizer))
+        yield Visited(code.value())
+
     def visit_CatchClause(self, node):
-        head = f"except Exception as {self.visit(node.param)}:\n"
+        code = CodeWriter("except Exception as ", (yield node.param), ":\n")
         self.indent()
-        body = self.visit(node.body)
+        body = yield node.body
         self.dedent()
-        return head + body
+        yield Visited(code.write(body).value())
 
     # TODO refactor import and export
     def visit_ImportDeclaration(self, node):
         result = []
         assert node.source.type == "Literal"
+        if node.source.value.endswith(".json"):
+            yield Visited(self.jsonImport(node))
+            return
         for specifier in node.specifiers:
             if specifier.type == "ImportDefaultSpecifier" or specifier.type == "ImportSpecifier":
                 assert specifier.local.type == "Identifier"
@@ -525,12 +740,24 @@ class JsVisitor(NodeVisitor):
                     result += [f"import {src} as {dst}"]
                 #result += f"
             else:
-                return f"# FIXME: ImportDeclaration: node = " + str(node).replace("\n", "\n# ")
+                yield Visited(f"# FIXME: ImportDeclaration: node = " + str(node).replace("\n", "\n# "))
+                return
                 # import { encode } from '@jridgewell/sourcemap-codec';
                 #raise NotImplementedError("# FIXME:\n" + str(node))
             #s = ", ".join(node.specifiers)
             #return f"from {node.source.value} import {}"
         #print(node, file=sys.stderr)
+        yield Visited("\n".join(result))
+
+    def jsonImport(self, node):
+        """Bindings for an import from a JSON file: a ``jsondata.JsonModule``, or keys of it."""
+        source = node.source.value
+        result = ["from jsondata import JsonModule as __json__"]
+        for specifier in node.specifiers:
+            load = f"__json__(globals(), {source!r})"
+            if specifier.type == "ImportSpecifier":
+                load += f"[{specifier.imported.name!r}]"
+            result.append(f"{specifier.local.name} = {load}")
         return "\n".join(result)
 
     # TODO refactor import and export
@@ -543,17 +770,18 @@ class JsVisitor(NodeVisitor):
         # export default function () {};
         # export default class SomeClass {};
         if node.declaration.type != "Identifier":
-            body = self.visit(node.declaration) + "\n"
+            body = CodeWriter((yield node.declaration), "\n")
         src = ""
         if node.declaration.type == "FunctionDeclaration":
-            src = self.visit(node.declaration.id) or "__anonymous_function__"
+            src = (yield node.declaration.id) or "__anonymous_function__"
         elif node.declaration.type == "ClassDeclaration": # TODO verify
             assert node.declaration.id.type == "Identifier"
             src = node.declaration.id.name
         else:
-            return f"# FIXME: ExportDefaultDeclaration: node = " + str(node).replace("\n", "\n# ")
+            yield Visited(f"# FIXME: ExportDefaultDeclaration: node = " + str(node).replace("\n", "\n# "))
+            return
         foot = f"__default__ = {src}"
-        return body + foot
+        yield Visited(CodeWriter(body, foot).value())
 
     # TODO refactor import and export
     def visit_ExportNamedDeclaration(self, node):
@@ -580,7 +808,8 @@ class JsVisitor(NodeVisitor):
                     src += "." + specifier.local.name
                 dst = specifier.exported.name
                 result += [f"import {src} as {dst}"]
-            return "\n".join(result)
+            yield Visited("\n".join(result))
+            return
         else:
             # no source
             # js: export { a as b };
@@ -592,22 +821,196 @@ class JsVisitor(NodeVisitor):
                 src = specifier.local.name
                 dst = specifier.exported.name
                 result += [f"{dst} = {src}"]
-            return "\n".join(result)
-
-        return f"# FIXME: ExportNamedDeclaration: node = " + str(node).replace("\n", "\n# ")
-
-        #print(node, file=sys.stderr)
-        return f"# FIXME ExportNamedDeclaration {node}"
-        raise NotImplementedError
-        head = f"# FIXME ExportDefaultDeclaration\n"
-        body = self.visit(node.declaration)
-        return head + body
+            yield Visited("\n".join(result))
 
 
 if __name__ == "__main__":
+    import argparse
+    import glob
+    import os
     import sys
-    with open(sys.argv[1]) as f:
-        prog = f.read()
-        parsed = parse(prog, {"comment": True, "tolerant": True})
-        transformed = JsVisitor().visit(parsed)
-        print("\n".join(transformed))
+
+    from passes import MAX_LEVEL, PassManager
+
+    argparser = argparse.ArgumentParser(description="Transpile ES6 JavaScript to Python.")
+    argparser.add_argument("file", help="a .js file, or a directory or glob to build as a project into -o")
+    argparser.add_argument("--parser", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                           help="parser backend (esprima is the reference implementation)")
+    argparser.add_argument("--cache-dir", default=os.environ.get("ES62PY_CACHE_DIR"),
+                           help="directory to cache parsed trees in (default: $ES62PY_CACHE_DIR)")
+    argparser.add_argument("--compact", action="store_true",
+                           help="copy the tree into slotted nodes before visiting (less memory on big inputs);"
+                                " only in the default mode")
+    argparser.add_argument("--incremental", metavar="STATE",
+                           help="reuse the output of unchanged top-level statements recorded in STATE")
+    argparser.add_argument("--pipeline", action="store_true",
+                           help="emit each top-level statement, after its hoisted heads, while the rest is still parsing")
+    argparser.add_argument("--stream", action="store_true",
+                           help="write each top-level statement as soon as it is transpiled and drop its tree,"
+                                " so memory is bounded by the largest statement")
+    argparser.add_argument("-j", "--jobs", type=int,
+                           help="transpile chunks of the file on this many processes (files of a project:"
+                                " default one per core)")
+    argparser.add_argument("--max-tasks-per-child", type=int, default=None, metavar="FILES",
+                           help="in a project build, replace each worker process after this many files")
+    argparser.add_argument("--memory-limit", type=int, metavar="MB",
+                           help="in a project build, fail files whose worker needs more address space than this")
+    argparser.add_argument("--force", action="store_true",
+                           help="in a project build, transpile every file, not only those changed since the last build"
+                                " and their dependents")
+    argparser.add_argument("--watch", action="store_true",
+                           help="keep running and transpile again whenever the sources change (a project: only"
+                                " the changed files and their dependents)")
+    argparser.add_argument("--poll", action="store_true",
+                           help="with --watch, find changes by polling instead of with inotify")
+    argparser.add_argument("--lazy", action="store_true",
+                           help="emit stubs that transpile top-level function bodies on first call")
+    argparser.add_argument("--memo", action="store_true",
+                           help="reuse the output of functions identical to ones already transpiled"
+                                " and report hits and misses on stderr; only in the default mode")
+    argparser.add_argument("--ast", action="store_true",
+                           help="build a Python ast and print it with ast.unparse (always valid Python;"
+                                " constructs Python cannot express are reported instead)")
+    argparser.add_argument("-O", dest="level", type=int, choices=range(MAX_LEVEL + 1), default=0,
+                           help="optimization level: 1 folds constants and runs --peephole, 2 also --split;"
+                                " the time and node counts of each pass are reported on stderr."
+                                " only in the default and --ast modes and in project builds")
+    argparser.add_argument("--peephole", action="store_true",
+                           help="clean up the generated Python (when it parses) and report what was removed on stderr;"
+                                " not with --stream or --pipeline")
+    argparser.add_argument("--split", type=int, metavar="STATEMENTS",
+                           help="move the body of functions with more than this many statements into nested helpers"
+                                " (huge bundles compile faster); not with --stream or --pipeline")
+    argparser.add_argument("-o", "--output",
+                           help="write the Python to this file instead of stdout (a project: to this directory)")
+    argparser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    args = argparser.parse_args()
+    cache = ASTCache(args.cache_dir) if args.cache_dir else False
+    extra = [name for name, on in (("peephole", args.peephole), ("split", args.split)) if on]
+    pass_options = {"split": {"max_statements": args.split}}
+
+    if os.path.isdir(args.file) or glob.has_magic(args.file):
+        from project import DEFAULT_MAX_TASKS_PER_CHILD, build, find_sources
+        if not args.output:
+            argparser.error("a project build needs -o DIRECTORY")
+        for flag, on in (("--memo", args.memo), ("--compact", args.compact)):
+            if on:
+                argparser.error(f"{flag} does not apply to a project build")
+
+        def build_project(changed=None):
+            result = build(args.file, args.output, args.jobs, args.level, extra, pass_options, args.parser, cache,
+                           args.max_tasks_per_child or DEFAULT_MAX_TASKS_PER_CHILD,
+                           args.memory_limit and args.memory_limit * 1024 * 1024, not args.force or changed is not None)
+            for source, error in sorted(result.failed.items()):
+                print(f"{source}: {error}", file=sys.stderr)
+            for name, seconds in result.passes.items():
+                print(f"{name}: {seconds * 1000:.1f} ms", file=sys.stderr)
+            print(result, file=sys.stderr)
+            return result
+
+        result = build_project()
+        if not args.watch:
+            sys.exit(1 if result.failed else 0)
+        from watch import watch
+        try:
+            # The build finds what changed itself; the modules, the parser
+            # and small rebuilds stay in this process.
+            watch([find_sources(args.file)[0]], build_project, poll=args.poll)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    # Modes other than the default one, in the order transpile() picks them.
+    mode = next((flag for flag, on in (("--incremental", args.incremental), ("-j", (args.jobs or 1) > 1),
+                                       ("--lazy", args.lazy), ("--ast", args.ast), ("--stream", args.stream),
+                                       ("--pipeline", args.pipeline)) if on), None)
+    if mode is not None:
+        for flag, on in (("--memo", args.memo), ("--compact", args.compact)):
+            if on:
+                argparser.error(f"{flag} does not work with {mode}")
+        # Only the default and --ast modes have a tree to run the JavaScript
+        # passes on, and nothing can rewrite output that is already written.
+        if args.level and mode != "--ast":
+            argparser.error(f"-O{args.level} does not work with {mode}")
+        if extra and mode in ("--stream", "--pipeline"):
+            argparser.error(f"--peephole and --split do not work with {mode}")
+
+    memo = None
+    if args.memo or args.watch:
+        from memo import OutputMemo
+        memo = OutputMemo()
+
+    def transpile(out):
+        passes = PassManager(args.level, extra, pass_options)
+
+        def emit(python):
+            print(passes.run_source(python), file=out)
+
+        with open(args.file) as f:
+            prog = f.read()
+        if args.incremental:
+            from incremental import transpile_incremental
+            emit(transpile_incremental(prog, args.incremental, {"comment": True, "tolerant": True}, args.parser))
+        elif (args.jobs or 1) > 1:
+            from parallel import transpile_parallel
+            emit(transpile_parallel(prog, workers=args.jobs, backend=args.parser))
+        elif args.lazy:
+            from lazy import transpile_lazy
+            emit(transpile_lazy(prog, {"tolerant": True}))
+        elif args.ast:
+            import ast
+            from pyast import build_module
+            tree = passes.run_js(parse(prog, {"tolerant": True}, backend=args.parser, cache=cache))
+            print(ast.unparse(passes.run_python(build_module(tree))), file=out)
+        elif args.stream:
+            from pipeline import stream_transpile
+            stream_transpile(prog, out.write, {"tolerant": True}, args.parser)
+        elif args.pipeline:
+            from pipeline import transpile_pipelined
+            for chunk in transpile_pipelined(prog, {"tolerant": True}, args.parser):
+                print(chunk, file=out)
+        else:
+            # No ``range`` for the memo: it would show up wherever a node is
+            # printed as a FIXME, so functions are keyed by their structure.
+            parsed = passes.run_js(parse(prog, {"comment": True, "tolerant": True}, backend=args.parser, cache=cache))
+            if args.compact:
+                parsed = compact(parsed)
+            transformed = JsVisitor(memo).visit(parsed)
+            emit("\n".join(transformed))
+            if args.memo:
+                print("memo: {hits} hits, {misses} misses, {entries} entries".format(**memo.stats()), file=sys.stderr)
+
+        for line in passes.report():
+            print(line, file=sys.stderr)
+
+    if not args.watch:
+        out = open(args.output, "w") if args.output else sys.stdout
+        transpile(out)
+        if out is not sys.stdout:
+            out.close()
+        sys.exit(0)
+
+    import io
+    from project import write_atomic
+    from watch import watch
+
+    def transpile_again(changed=None):
+        if not args.output:
+            transpile(sys.stdout)
+            sys.stdout.flush()
+            return
+        # Written whole and renamed into place, so whatever picks the
+        # output up never reads half of it.
+        out = io.StringIO()
+        transpile(out)
+        write_atomic(os.path.abspath(args.output), out.getvalue())
+        print(f"wrote {args.output}", file=sys.stderr)
+
+    try:
+        try:
+            transpile_again()
+        except Exception as e:
+            print(f"{type(e).__name__}: {e}", file=sys.stderr)
+        watch([args.file], transpile_again, poll=args.poll)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,57 @@
+"""Reusing the output of functions that were transpiled before.
+
+Bundles repeat helper functions byte for byte: every module carries its own
+polyfills, ``__extends`` or ``_classCallCheck``.  A ``JsVisitor`` given an
+``OutputMemo`` looks each function up by a digest of its structure and of
+what else its text depends on (the indentation it is written at, whether
+it is a method, the parameters the visitor adds), and reuses the text of
+an identical function instead of visiting it again.
+
+When the visitor has the source and the tree was parsed with ``range``,
+the digest is that of the function's source text, which is cheap to
+compute.  Otherwise it is ``naming.subtree_digest``, a pass over the tree
+about two thirds as long as visiting it, so a memo only pays off without
+ranges on input with a lot of repetition.  One memo can be shared by the
+visitors of several files.  ``hits`` and ``misses`` count lookups.
+"""
+import hashlib
+
+from naming import subtree_digest
+
+
+DEFAULT_MAX_ENTRIES = 4096
+
+
+class OutputMemo:
+    """Emitted function text by structure and context, oldest dropped first."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, node, source=None, *context):
+        """Lookup key for ``node`` (parsed from ``source``, if given) in ``context``."""
+        if source is not None and node.range is not None:
+            start, end = node.range
+            text = source[start:end].encode("utf-8", "surrogatepass")
+            return ("source", hashlib.blake2b(text, digest_size=16).hexdigest()) + context
+        return ("tree", subtree_digest(node)) + context
+
+    def get(self, key):
+        text = self.entries.get(key)
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return text
+
+    def put(self, key, text):
+        entries = self.entries
+        if len(entries) >= self.max_entries and key not in entries:
+            del entries[next(iter(entries))]
+        entries[key] = text
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
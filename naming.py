@@ -0,0 +1,117 @@
+"""Names for hoisted functions derived from what they contain.
+
+Anonymous functions (and destructuring temporaries) are hoisted under
+names the visitor makes up.  Numbering them from a counter meant that
+adding one function near the top of a file renamed every one below it, so
+an unchanged function rarely produced unchanged output: no use for caches,
+diffs, or stitching together separately transpiled pieces.
+
+``Names`` instead derives each name from a digest of what is hoisted, so
+a function keeps its name wherever it moves and whatever changes around
+it.  ``JsVisitor`` digests the text it emits (see ``CodeWriter.digest``),
+which already reflects the context it is emitted in; identical text gets
+the same name, which is harmless since it is the same ``def``.  A name is
+the first ``NAME_LENGTH`` hex digits of the digest; should two different
+digests share them, the later one gets a longer name.
+
+``AstVisitor`` has no text to digest, so it uses ``node_digest`` (as does
+``memo.OutputMemo`` when it has no source to go by): subtree digests built
+bottom-up, a nested function contributing only its own
+digest to its parent's, so each node is serialized once however deeply
+functions nest.  They are kept on the function nodes as ``_digest``, which
+esprima leaves out of their ``repr``.
+"""
+import hashlib
+
+from esprima.objects import Object
+
+from compact import CompactNode
+
+
+NAME_LENGTH = 12
+
+FUNCTIONS = frozenset((
+    "FunctionDeclaration", "FunctionExpression", "ArrowFunctionExpression",
+    "AsyncFunctionDeclaration", "AsyncFunctionExpression", "AsyncArrowFunctionExpression",
+))
+
+# Where a node is, rather than what it is.
+SKIP = frozenset(("range", "loc", "leadingComments", "trailingComments", "innerComments", "_digest"))
+
+
+_ATOMS = frozenset((str, int, float, bool, type(None)))
+
+
+def _digest(tokens):
+    return hashlib.blake2b("\0".join(tokens).encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def _hash(values):
+    return hashlib.blake2b(repr(values).encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def _values(node):
+    # Every node of a type has the same fields in the same order, so the
+    # values alone describe it.
+    items = node.__dict__.items() if isinstance(node, Object) else node.items()
+    return iter([value for key, value in items if key not in SKIP])
+
+
+def subtree_digest(root):
+    """Hex digest of the structure of ``root``, positions and comments aside.
+
+    Each node becomes a tuple of its type and field values, built
+    bottom-up with an explicit stack; a function becomes its digest.
+    """
+    if root._digest is not None:
+        return root._digest
+    atoms = _ATOMS
+    stack = [(root, [root.type], _values(root))]
+    push = stack.append
+    while True:
+        node, values, todo = stack[-1]
+        for value in todo:
+            kind = type(value)
+            if kind in atoms:
+                values.append(value)
+            elif kind is list:
+                push((None, ["["], iter(value)))
+                break
+            elif isinstance(value, (Object, CompactNode)):
+                if value.type in FUNCTIONS and value._digest is not None:
+                    values.append(value._digest)
+                    continue
+                push((value, [value.type], _values(value)))
+                break
+            else:
+                values.append(repr(value))
+        else:
+            stack.pop()
+            result = tuple(values)
+            if node is not None and node.type in FUNCTIONS:
+                result = node._digest = _hash(result)
+            if not stack:
+                return result if type(result) is str else _hash(result)
+            stack[-1][1].append(result)
+
+
+def node_digest(node, context=""):
+    """Hex digest of ``node``'s subtree as emitted in ``context``."""
+    return _digest((context, subtree_digest(node)))
+
+
+class Names(object):
+    """Hands out content-derived names, lengthening any that collide."""
+
+    def __init__(self):
+        self.owners = {}
+
+    def name(self, prefix, digest):
+        """``prefix`` followed by (enough of) the hex ``digest``."""
+        length = NAME_LENGTH
+        while True:
+            name = prefix + digest[:length]
+            owner = self.owners.setdefault(name, digest)
+            if owner == digest or length >= len(digest):
+                return name
+            length *= 2
@@ -0,0 +1,117 @@
+"""Transpiling one large file on several cores.
+
+The source is cut into chunks at likely top-level statement boundaries (a
+line ending in ``;`` or ``}`` followed by one starting at column 0 with an
+identifier), and every chunk is parsed and visited in a worker process.
+Parsing is most of the work, so it has to happen in the workers too rather
+than shipping subtrees of one big parse around.
+
+A chunk that does not parse on its own means a cut landed inside a
+statement, string, comment or template; the file is then transpiled
+serially instead.  Otherwise the result is identical to the serial path:
+hoisted heads of all chunks come first, then the bodies, in order.
+Anonymous names come from the functions' content, so a chunk names them
+just as the whole file would.
+
+Many separate sources are transpiled on a thread pool instead: every task
+gets its own parser and ``JsVisitor``, which share no mutable state, so
+this scales with cores on free-threaded CPython and at least overlaps the
+reading and writing of files elsewhere.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from frontend import parse
+from main import JsVisitor
+
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+OPTIONS = {"comment": True, "tolerant": True}
+
+_BOUNDARY = re.compile(r"[;}][ \t]*\r?\n(?=[A-Za-z_$])")
+_USE_STRICT = re.compile(r"""\A\s*(?:(?://[^\n]*\n|/\*.*?\*/)\s*)*(['"])use strict\1""", re.S)
+
+
+class ChunkError(Exception):
+    """A chunk did not parse as a sequence of whole statements."""
+
+
+def split_chunks(code, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return ``(start, end)`` spans of about ``chunk_size`` characters each."""
+    spans = []
+    start = 0
+    while len(code) - start > chunk_size:
+        match = _BOUNDARY.search(code, start + chunk_size)
+        if not match:
+            break
+        spans.append((start, match.end()))
+        start = match.end()
+    spans.append((start, len(code)))
+    return spans
+
+
+def transpile_chunk(code, strict=False, backend=None):
+    """Worker: return the heads and bodies for one chunk."""
+    if strict:
+        code = '"use strict";' + code
+    try:
+        body = parse(code, {"comment": True}, backend=backend, cache=False).body
+    except Exception as e:
+        raise ChunkError(str(e)) from None
+    if strict:
+        body = body[1:]
+    visitor = JsVisitor()
+    bodies = [visitor.visit(statement) for statement in body if statement.directive != "use strict"]
+    return visitor.heads, bodies
+
+
+def transpile_serial(code, backend=None, cache=None):
+    return "\n".join(JsVisitor().visit(parse(code, OPTIONS, backend=backend, cache=cache)))
+
+
+def transpile_parallel(code, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, backend=None, executor=None):
+    """Transpile ``code`` across a process pool; same output as the serial path."""
+    spans = split_chunks(code, chunk_size)
+    if len(spans) < 2:
+        return transpile_serial(code, backend)
+
+    strict = bool(_USE_STRICT.match(code))
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(min(workers or os.cpu_count() or 1, len(spans)))
+    try:
+        futures = [
+            executor.submit(transpile_chunk, code[start:end], strict and index > 0, backend)
+            for index, (start, end) in enumerate(spans)
+        ]
+        try:
+            results = [future.result() for future in futures]
+        except ChunkError:
+            for future in futures:
+                future.cancel()
+            return transpile_serial(code, backend)
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    heads, bodies = [], []
+    for chunk_heads, chunk_bodies in results:
+        heads.extend(chunk_heads)
+        bodies.extend(chunk_bodies)
+    return "\n".join(heads + bodies)
+
+
+def transpile_concurrently(sources, workers=None, backend=None, cache=False, executor=None):
+    """Transpile each of ``sources`` on a thread pool; returns the outputs in order.
+
+    A source that fails to parse or visit raises its exception here.
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(workers or os.cpu_count() or 1, thread_name_prefix="es62py")
+    try:
+        return list(executor.map(lambda code: transpile_serial(code, backend, cache), sources))
+    finally:
+        if own_executor:
+            executor.shutdown()
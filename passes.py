@@ -0,0 +1,155 @@
+"""Optimization passes, and the manager that runs them around emission.
+
+A pass rewrites one of the two trees a transpile goes through: the
+JavaScript tree before the visitor emits it (stage ``"js"``), or the
+Python ``ast`` after (stage ``"python"``; text output is parsed for it,
+and left alone if it does not parse).  Each pass has the lowest ``-O``
+level that turns it on, and they run in this order:
+
+=====  ======  ============  =========================================
+level  stage   pass          does
+=====  ======  ============  =========================================
+1      js      ``fold``      ``!0``, ``"a" + "b"`` (``fold.fold``)
+1      python  ``peephole``  temporaries, placeholders (``peephole``)
+2      python  ``split``     oversized functions (``split``)
+=====  ======  ============  =========================================
+
+``-O0`` runs none.  ``PassManager`` records, for every pass it runs, the
+wall time, the number of nodes in the tree before and after, and what
+the pass reports about itself; node counting is not part of the time.
+"""
+import ast
+import time
+
+from esprima.objects import Object
+
+
+JS = "js"
+PYTHON = "python"
+
+MAX_LEVEL = 2
+
+
+def _fold(tree):
+    from fold import fold
+    return f"{fold(tree)} folded"
+
+
+def _peephole(module):
+    from peephole import optimize
+    return str(optimize(module)[1])
+
+
+def _split(module, max_statements=None):
+    from split import DEFAULT_MAX_STATEMENTS, split
+    return str(split(module, max_statements or DEFAULT_MAX_STATEMENTS))
+
+
+class Pass(object):
+    """A named rewrite of the ``stage`` tree, on from ``-O{level}``."""
+
+    def __init__(self, name, stage, level, run):
+        self.name = name
+        self.stage = stage
+        self.level = level
+        self.run = run
+
+
+PASSES = [
+    Pass("fold", JS, 1, _fold),
+    Pass("peephole", PYTHON, 1, _peephole),
+    Pass("split", PYTHON, 2, _split),
+]
+
+
+def count_js(tree):
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        count += 1
+        for value in node.__dict__.values():
+            if isinstance(value, Object):
+                stack.append(value)
+            elif type(value) is list:
+                stack.extend(item for item in value if isinstance(item, Object))
+    return count
+
+
+def count_python(module):
+    return sum(1 for _ in ast.walk(module))
+
+
+class Timing(object):
+    """What running one pass took and did."""
+
+    def __init__(self, name, stage, seconds, nodes_before, nodes_after, detail=None):
+        self.name = name
+        self.stage = stage
+        self.seconds = seconds
+        self.nodes_before = nodes_before
+        self.nodes_after = nodes_after
+        self.detail = detail
+
+    def __str__(self):
+        if self.seconds is None:
+            return f"{self.name} ({self.stage}): skipped ({self.detail})"
+        line = (f"{self.name} ({self.stage}): {self.seconds * 1000:.1f} ms,"
+                f" {self.nodes_before} -> {self.nodes_after} nodes")
+        return f"{line}; {self.detail}" if self.detail else line
+
+
+class PassManager(object):
+    """Runs the passes of ``level``, and those named in ``extra``, in order.
+
+    ``options`` maps a pass name to keyword arguments for it, such as
+    ``{"split": {"max_statements": 500}}``.
+    """
+
+    def __init__(self, level=0, extra=(), options=None):
+        if not 0 <= level <= MAX_LEVEL:
+            raise ValueError(f"no optimization level {level} (choose from 0 to {MAX_LEVEL})")
+        self.passes = [p for p in PASSES if p.level <= level or p.name in extra]
+        self.options = options or {}
+        self.timings = []
+
+    def stage(self, stage):
+        return [p for p in self.passes if p.stage == stage]
+
+    def run(self, stage, tree, count):
+        """Run the passes of ``stage`` on ``tree`` in place; returns it."""
+        passes = self.stage(stage)
+        if not passes:
+            return tree
+        nodes = count(tree)
+        for p in passes:
+            start = time.perf_counter()
+            detail = p.run(tree, **self.options.get(p.name, {}))
+            seconds = time.perf_counter() - start
+            before, nodes = nodes, count(tree)
+            self.timings.append(Timing(p.name, stage, seconds, before, nodes, detail))
+        return tree
+
+    def run_js(self, tree):
+        return self.run(JS, tree, count_js)
+
+    def run_python(self, module):
+        self.run(PYTHON, module, count_python)
+        ast.fix_missing_locations(module)
+        return module
+
+    def run_source(self, source):
+        """``source`` after the Python passes, untouched if it does not parse."""
+        passes = self.stage(PYTHON)
+        if not passes:
+            return source
+        try:
+            module = ast.parse(source)
+        except SyntaxError as e:
+            reason = f"not valid Python: {e.msg}, line {e.lineno}"
+            self.timings.extend(Timing(p.name, PYTHON, None, None, None, reason) for p in passes)
+            return source
+        return ast.unparse(self.run_python(module))
+
+    def report(self):
+        return [str(timing) for timing in self.timings]
@@ -0,0 +1,184 @@
+"""Peephole clean-up of the generated Python.
+
+The visitors emit statements one construct at a time and leave behind work
+nobody asked for:
+
+* destructuring goes through a temporary, ``_temp_X = value``, then one
+  ``name = _temp_X.name`` per key and ``del _temp_X``.  With a single key
+  the value is read directly; when the value is a plain name, that name is
+  read instead of the temporary;
+* ``pass`` (and ``None``, which stands in for empty expressions) in blocks
+  that have other statements;
+* ``x = x``, which ``var x = x`` turns into.  In a function it would also
+  make ``x`` local and fail; class bodies keep theirs, where it copies a
+  global into the class.
+
+``optimize`` rewrites an ``ast.Module`` (from ``pyast``, or parsed) in
+place; ``optimize_source`` does it to text, which comes back unparsed and
+so without the visitors' blank lines.  Text that is not valid Python is
+returned untouched.  Both return a ``Report`` of what was removed.
+"""
+import ast
+
+
+TEMP_PREFIX = "_temp_"
+
+
+class Report(object):
+    """Statements removed by kind, and the size of the text before and after."""
+
+    def __init__(self):
+        self.removed = {}
+        self.statements_before = 0
+        self.statements_after = 0
+        self.bytes_before = None
+        self.bytes_after = None
+        self.skipped = None
+
+    def count(self, kind, statements=1):
+        self.removed[kind] = self.removed.get(kind, 0) + statements
+
+    def __str__(self):
+        if self.skipped:
+            return f"peephole: skipped ({self.skipped})"
+        removed = ", ".join(f"{count} {kind}" for kind, count in sorted(self.removed.items())) or "nothing"
+        line = (f"peephole: {self.statements_before - self.statements_after} of"
+                f" {self.statements_before} statements removed ({removed})")
+        if self.bytes_before is not None:
+            line += f", {self.bytes_before} -> {self.bytes_after} bytes"
+        return line
+
+
+def _statements(tree):
+    return sum(isinstance(node, ast.stmt) for node in ast.walk(tree))
+
+
+def _noop(statement):
+    return type(statement) is ast.Pass or (
+        type(statement) is ast.Expr
+        and type(statement.value) is ast.Constant
+        and statement.value.value is None
+    )
+
+
+def _name(node, id=None):
+    return type(node) is ast.Name and (id is None or node.id == id)
+
+
+class Peephole(ast.NodeTransformer):
+    """Applies the rewrites to every block of statements, innermost first."""
+
+    def __init__(self, report):
+        self.report = report
+        self.in_class = False
+
+    def visit_ClassDef(self, node):
+        in_class, self.in_class = self.in_class, True
+        self.generic_visit(node)
+        self.in_class = in_class
+        return node
+
+    def visit_FunctionDef(self, node):
+        in_class, self.in_class = self.in_class, False
+        self.generic_visit(node)
+        self.in_class = in_class
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def generic_visit(self, node):
+        super(Peephole, self).generic_visit(node)
+        for field, value in ast.iter_fields(node):
+            if type(value) is list and value and isinstance(value[0], ast.stmt):
+                setattr(node, field, self.block(value))
+        return node
+
+    def block(self, statements):
+        out = []
+        index = 0
+        while index < len(statements):
+            statement = statements[index]
+            taken = self.temporary(statements, index, out)
+            if taken:
+                index += taken
+                continue
+            if self.selfAssignment(statement):
+                self.report.count("self-assignments")
+            else:
+                out.append(statement)
+            index += 1
+
+        body = [statement for statement in out if not _noop(statement)]
+        if not body:
+            # Keep one, the block needs a statement.
+            body = out[:1] or [ast.Pass()]
+        if len(body) < len(out):
+            self.report.count("placeholders", len(out) - len(body))
+        return body
+
+    def selfAssignment(self, statement):
+        return (
+            not self.in_class
+            and type(statement) is ast.Assign
+            and len(statement.targets) == 1
+            and _name(statement.targets[0])
+            and _name(statement.value, statement.targets[0].id)
+        )
+
+    def temporary(self, statements, index, out):
+        """Rewrite a destructuring window starting at ``index`` into ``out``.
+
+        Returns how many statements it replaced, or 0 if there is none.
+        """
+        first = statements[index]
+        if not (type(first) is ast.Assign and len(first.targets) == 1 and _name(first.targets[0])
+                and first.targets[0].id.startswith(TEMP_PREFIX)):
+            return 0
+        temp = first.targets[0].id
+        reads = []
+        end = index + 1
+        while end < len(statements):
+            read = statements[end]
+            if not (type(read) is ast.Assign and len(read.targets) == 1 and _name(read.targets[0])
+                    and type(read.value) is ast.Attribute and _name(read.value.value, temp)):
+                break
+            reads.append(read)
+            end += 1
+        last = statements[end] if end < len(statements) else None
+        if not (reads and type(last) is ast.Delete and len(last.targets) == 1 and _name(last.targets[0], temp)):
+            return 0
+        value = first.value
+        targets = {read.targets[0].id for read in reads}
+        if len(reads) > 1 and not (_name(value) and value.id not in targets and value.id != temp):
+            return 0
+        for read in reads:
+            source = value if len(reads) == 1 else ast.Name(id=value.id, ctx=ast.Load())
+            read.value = ast.copy_location(ast.Attribute(value=source, attr=read.value.attr, ctx=ast.Load()), read.value)
+            out.append(read)
+        self.report.count("temporaries", 2)
+        return end - index + 1
+
+
+def optimize(module, report=None):
+    """Apply the rewrites to ``module`` in place; returns ``(module, report)``."""
+    report = Report() if report is None else report
+    report.statements_before = _statements(module)
+    Peephole(report).visit(module)
+    ast.fix_missing_locations(module)
+    report.statements_after = _statements(module)
+    return module, report
+
+
+def optimize_source(source):
+    """``(text, report)`` for the Python ``source``, rewritten if it parses."""
+    report = Report()
+    try:
+        module = ast.parse(source)
+    except SyntaxError as e:
+        report.skipped = f"not valid Python: {e.msg}, line {e.lineno}"
+        return source, report
+    optimize(module, report)
+    text = ast.unparse(module)
+    report.bytes_before = len(source.encode("utf-8", "surrogatepass"))
+    report.bytes_after = len(text.encode("utf-8", "surrogatepass"))
+    return text, report
@@ -0,0 +1,203 @@
+"""Overlapping parsing with code generation.
+
+``iter_statements`` runs the parser on a background thread and hands every
+top-level statement over a bounded queue the moment it has been parsed, so
+``JsVisitor`` can start emitting before the rest of the file is read and
+the first lines of output show up early.
+
+esprima's ``delegate`` callback fires for every node without saying how
+deep it is, so the hand-off hooks the parser's top-level statement loop
+instead, the same way ``fastparser`` hooks comments with ``onComment``.
+
+Each statement is emitted with the heads it hoists placed right before it,
+rather than all heads of the file first as ``visit_Script`` does.
+
+Neither path keeps the statements in the program's body, so once a
+statement has been written out its subtree is garbage and memory is
+bounded by the source plus the largest statement, not the whole tree.
+``stream_transpile`` does without the thread and the queue altogether and
+writes each statement from inside the parser's callback.
+"""
+import queue
+import threading
+
+from esprima import nodes as Node
+from esprima.parser import Parser
+from esprima.token import Token
+
+from fastparser import FastParser
+from frontend import DEFAULT_BACKEND
+from main import JsVisitor
+
+
+DEFAULT_QUEUE_SIZE = 64
+
+
+class TopLevelHook(object):
+    """Parser mixin that calls ``self.onStatement`` with each top-level statement.
+
+    With ``keepStatements`` false the statements are only handed over, and
+    the returned program has an empty body.
+    """
+
+    onStatement = None
+    keepStatements = True
+
+    def parseStatements(self):
+        body = self.parseDirectivePrologues()
+        if self.onStatement:
+            for statement in body:
+                self.onStatement(statement)
+        if not self.keepStatements:
+            body = []
+        while self.lookahead.type is not Token.EOF:
+            statement = self.parseStatementListItem()
+            if self.keepStatements:
+                body.append(statement)
+            if self.onStatement:
+                self.onStatement(statement)
+        return body
+
+    def parseModule(self):
+        self.context.strict = True
+        self.context.isModule = True
+        self.scanner.isModule = True
+        node = self.createNode()
+        return self.finalize(node, Node.Module(self.parseStatements()))
+
+    def parseScript(self):
+        node = self.createNode()
+        return self.finalize(node, Node.Script(self.parseStatements()))
+
+
+class HookedParser(TopLevelHook, Parser):
+    pass
+
+
+class FastHookedParser(TopLevelHook, FastParser):
+    pass
+
+
+PARSERS = {
+    "esprima": HookedParser,
+    "fast": FastHookedParser,
+}
+
+
+def make_parser(code, options=None, backend=None, onStatement=None, keepStatements=True):
+    backend = backend or DEFAULT_BACKEND
+    try:
+        cls = PARSERS[backend]
+    except KeyError:
+        raise ValueError(f"backend {backend!r} cannot stream statements") from None
+    # JsVisitor never looks at comments, so don't collect them.
+    options = {key: value for key, value in (options or {}).items() if key not in ("comment", "attachComment")}
+    parser = cls(code, options=options)
+    parser.onStatement = onStatement
+    parser.keepStatements = keepStatements
+    return parser
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _Failure(object):
+    def __init__(self, error):
+        self.error = error
+
+
+_DONE = object()
+
+
+def iter_statements(code, options=None, backend=None, maxsize=DEFAULT_QUEUE_SIZE):
+    """Yield the top-level statements of ``code`` while it is still being parsed.
+
+    At most ``maxsize`` parsed statements wait in the queue; a parse error is
+    raised here once the statements before it have been yielded.
+    """
+    statements = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                statements.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise _Cancelled
+
+    def produce():
+        try:
+            parser = make_parser(code, options, backend, onStatement=put, keepStatements=False)
+            isModule = (options or {}).get("sourceType", "script") == "module"
+            parser.parseModule() if isModule else parser.parseScript()
+        except _Cancelled:
+            return
+        except BaseException as e:
+            try:
+                put(_Failure(e))
+            except _Cancelled:
+                pass
+            return
+        try:
+            put(_DONE)
+        except _Cancelled:
+            pass
+
+    producer = threading.Thread(target=produce, name="es62py-parser", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = statements.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def transpile_pipelined(code, options=None, backend=None, maxsize=DEFAULT_QUEUE_SIZE):
+    """Yield chunks of Python for ``code``, each statement preceded by its heads."""
+    visitor = JsVisitor()
+    for statement in iter_statements(code, options, backend, maxsize):
+        # Dropped like visit_Script does.
+        if statement.directive == "use strict":
+            continue
+        visitor.heads = []
+        body = visitor.visit(statement)
+        yield from visitor.heads
+        yield body
+
+
+def stream_transpile(code, write, options=None, backend=None):
+    """Write the Python for ``code`` with ``write``, one statement at a time.
+
+    Output is the same as ``transpile_pipelined``'s, one line per chunk; a
+    parse error is raised after everything before it has been written.
+    Returns the number of top-level statements written.
+    """
+    visitor = JsVisitor()
+    count = 0
+
+    def emit(statement):
+        nonlocal count
+        if statement.directive == "use strict":
+            return
+        visitor.heads = []
+        body = visitor.visit(statement)
+        for head in visitor.heads:
+            write(head)
+            write("\n")
+        write(body)
+        write("\n")
+        count += 1
+
+    parser = make_parser(code, options, backend, onStatement=emit, keepStatements=False)
+    isModule = (options or {}).get("sourceType", "script") == "module"
+    parser.parseModule() if isModule else parser.parseScript()
+    return count
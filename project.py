@@ -0,0 +1,354 @@
+"""Transpiling every ``.js`` file of a project into a Python package.
+
+``build`` takes a directory (searched recursively, skipping hidden
+directories and ``node_modules``) or a glob, and writes one module per
+source under the output directory, laid out so that the imports
+``JsVisitor`` emits resolve: it maps ``import x from './lib/a-b.js'``
+to the module ``.lib.a_b``, so ``lib/a-b.js`` is written to
+``lib/a_b.py``.  Every path component is renamed the same way (``-`` to
+``_``, ``@`` to ``__at__``), and a ``.`` in a name makes a package
+level, as it does in the import.  Every directory gets an empty
+``__init__.py`` unless a source maps to it: ``a.js`` next to a directory
+``a`` is written to ``a/__init__.py``, the module that ``./a`` imports
+resolve to in both languages.
+
+Files are transpiled on a ``ProcessPoolExecutor``, largest first (a few
+are done in the building process, where a pool costs more than it
+saves).  Workers are replaced after about ``max_tasks_per_child`` files,
+so whatever a parser keeps alive does not accumulate, and with
+``memory_limit`` each one runs under that address space limit
+(``RLIMIT_AS``, where the platform has it), so a runaway file fails with
+``MemoryError`` instead of taking the machine down.  A file that fails
+is reported and the build goes on.  Every output is written to a
+temporary file and renamed into place, so an interrupted build never
+leaves a half-written module behind.
+
+JSON files that sources import (``import data from './data.json'``) are
+copied next to the importing module, where ``jsondata.JsonModule`` looks
+for them: the specifier is resolved against the directory the module was
+written to, as it is at run time.
+
+Builds are incremental: the output directory keeps the
+``depgraph.Graph`` of the last build, and only sources that changed, and
+those the graph says depend on what changed, are transpiled again.
+JSON files are copied again only when they changed.  Outputs of sources
+that are gone, and copies no source imports any more, are removed.
+"""
+import glob
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+from depgraph import STATE_NAME, Graph, digest, interface, resolve
+from frontend import __version__, parse
+from main import JsVisitor
+from passes import PassManager
+
+
+OPTIONS = {"comment": True, "tolerant": True}
+SKIP_DIRECTORIES = frozenset(("node_modules", "__pycache__"))
+DEFAULT_MAX_TASKS_PER_CHILD = 64
+# Up to this many files are transpiled in the building process itself.
+SERIAL_FILES = 4
+
+
+def find_sources(spec):
+    """``(root, sources)``: the ``.js`` files ``spec`` names and the directory they are relative to."""
+    if os.path.isdir(spec):
+        root = os.path.abspath(spec)
+        sources = []
+        for directory, directories, files in os.walk(root):
+            directories[:] = sorted(d for d in directories if not d.startswith(".") and d not in SKIP_DIRECTORIES)
+            sources.extend(os.path.join(directory, name) for name in sorted(files) if name.endswith(".js"))
+        return root, sources
+    parts = os.path.normpath(spec).split(os.sep)
+    fixed = []
+    for part in parts:
+        if glob.has_magic(part):
+            break
+        fixed.append(part)
+    root = os.path.abspath(os.sep.join(fixed) or os.curdir)
+    if len(fixed) == len(parts):
+        # A single file.
+        root = os.path.dirname(root)
+    sources = sorted(os.path.abspath(path) for path in glob.glob(spec, recursive=True)
+                     if path.endswith(".js") and os.path.isfile(path))
+    return root, sources
+
+
+def module_parts(relative):
+    """The package path of the module for the source at ``relative``, as ``JsVisitor`` imports it."""
+    path = relative.replace(os.sep, "/")
+    if path.endswith(".js"):
+        path = path[:-3]
+    path = path.replace("@", "__at__").replace("-", "_")
+    return [part for part in path.replace("/", ".").split(".") if part]
+
+
+def plan(root, sources, output):
+    """``({source: output path}, [package directories])`` for a build into ``output``."""
+    modules = {source: module_parts(os.path.relpath(source, root)) for source in sources}
+    packages = {()}
+    for parts in modules.values():
+        packages.update(tuple(parts[:end]) for end in range(1, len(parts)))
+    targets = {}
+    for source, parts in modules.items():
+        if tuple(parts) in packages:
+            targets[source] = os.path.join(output, *parts, "__init__.py")
+        else:
+            targets[source] = os.path.join(output, *parts[:-1], parts[-1] + ".py")
+    return targets, sorted(os.path.join(output, *parts) for parts in packages)
+
+
+def data_files(root, output, graph):
+    """``{output path: source path}`` of the JSON files the sources in ``graph`` import."""
+    copies = {}
+    for name, record in graph.files.items():
+        directory = os.path.dirname(os.path.join(output, *record["target"].split("/")))
+        for specifier, _, _ in record["imports"]:
+            if not (specifier.startswith(("./", "../")) and specifier.endswith(".json")):
+                continue
+            source = os.path.normpath(os.path.join(root, os.path.dirname(name), specifier))
+            target = os.path.normpath(os.path.join(directory, specifier))
+            if os.path.isfile(source) and os.path.commonpath([output, target]) == output:
+                copies[target] = source
+    return copies
+
+
+def unchanged(path, stat, record):
+    """Whether the file at ``path`` (with ``stat``) still has the content ``record`` was made from."""
+    if record["size"] == stat.st_size and record["mtime"] == stat.st_mtime_ns:
+        return True
+    with open(path, "rb") as f:
+        return digest(f.read()) == record["digest"]
+
+
+def write_atomic(path, text):
+    """Write ``text`` (or bytes) to ``path`` through a temporary file renamed into place."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        if type(text) is bytes:
+            f = os.fdopen(fd, "wb")
+        else:
+            f = os.fdopen(fd, "w", encoding="utf-8", errors="surrogatepass")
+        with f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def transpile_file(source, target, level=0, extra=(), options=None, backend=None, cache=False):
+    """Worker: transpile ``source`` into ``target``.
+
+    Returns the digest of the source, its ``depgraph.interface`` and the
+    seconds each pass took.
+    """
+    with open(source, "rb") as f:
+        data = f.read()
+    passes = PassManager(level, extra, options)
+    tree = passes.run_js(parse(data.decode("utf-8", "surrogateescape"), OPTIONS, backend=backend, cache=cache))
+    imports, exports = interface(tree)
+    write_atomic(target, passes.run_source("\n".join(JsVisitor().visit(tree))) + "\n")
+    timings = [(timing.name, timing.seconds) for timing in passes.timings if timing.seconds is not None]
+    return digest(data), imports, exports, timings
+
+
+def _limit_memory(limit):
+    if limit and resource is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+class BuildResult(object):
+    """Outputs written, JSON files copied, failures by source, and the time per pass summed over files.
+
+    ``unchanged`` counts the sources skipped, ``dependents`` those rebuilt
+    only because of what changed in a module they import.
+    """
+
+    def __init__(self):
+        self.built = {}
+        self.copied = {}
+        self.failed = {}
+        self.passes = {}
+        self.unchanged = 0
+        self.dependents = 0
+        self.seconds = 0.0
+
+    def __str__(self):
+        line = f"build: {len(self.built)} files in {self.seconds:.2f}s"
+        if self.unchanged or self.dependents:
+            line += f" ({self.unchanged} unchanged, {self.dependents} rebuilt for their imports)"
+        if self.copied:
+            line += f", {len(self.copied)} JSON files copied"
+        if self.failed:
+            line += f", {len(self.failed)} failed"
+        return line
+
+
+class _Builder(object):
+    """Transpiles batches of sources and records them in ``graph``."""
+
+    def __init__(self, root, output, targets, graph, result, arguments, workers, max_tasks_per_child, memory_limit):
+        self.root = root
+        self.output = output
+        self.targets = targets
+        self.graph = graph
+        self.result = result
+        self.arguments = arguments
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.memory_limit = memory_limit
+        self.names = {os.path.relpath(source, root).replace(os.sep, "/") for source in targets}
+
+    def run(self, sources, stats):
+        sources = sorted(sources, key=lambda source: stats[source].st_size, reverse=True)
+        if not sources:
+            return
+        if len(sources) <= SERIAL_FILES or self.workers == 1:
+            # Not worth starting processes for.
+            for source in sources:
+                try:
+                    done = transpile_file(source, self.targets[source], *self.arguments)
+                except Exception as e:
+                    self.fail(source, f"{type(e).__name__}: {e}")
+                else:
+                    self.record(source, stats[source], done)
+            return
+        workers = min(self.workers or os.cpu_count() or 1, len(sources))
+        # Workers are replaced by starting a pool per batch: the executor's
+        # own max_tasks_per_child can deadlock (CPython issue 115634).
+        batch = workers * self.max_tasks_per_child if self.max_tasks_per_child else len(sources)
+        for start in range(0, len(sources), batch):
+            with ProcessPoolExecutor(workers, initializer=_limit_memory, initargs=(self.memory_limit,)) as executor:
+                futures = {
+                    source: executor.submit(transpile_file, source, self.targets[source], *self.arguments)
+                    for source in sources[start:start + batch]
+                }
+                for source, future in futures.items():
+                    try:
+                        done = future.result()
+                    except BrokenProcessPool:
+                        self.fail(source, "worker died (out of memory?)")
+                    except Exception as e:
+                        self.fail(source, f"{type(e).__name__}: {e}")
+                    else:
+                        self.record(source, stats[source], done)
+
+    def fail(self, source, error):
+        self.result.failed[source] = error
+        # Not recorded, so the next build tries again.
+        self.graph.files.pop(os.path.relpath(source, self.root).replace(os.sep, "/"), None)
+
+    def record(self, source, stat, done):
+        source_digest, imports, exports, timings = done
+        name = os.path.relpath(source, self.root).replace(os.sep, "/")
+        self.graph.files[name] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "digest": source_digest,
+            "target": os.path.relpath(self.targets[source], self.output).replace(os.sep, "/"),
+            "exports": exports,
+            "imports": [[specifier, resolve(name, specifier, self.names), names] for specifier, names in imports],
+        }
+        self.result.built[source] = self.targets[source]
+        for pass_name, seconds in timings:
+            self.result.passes[pass_name] = self.result.passes.get(pass_name, 0.0) + seconds
+
+
+def build(spec, output, workers=None, level=0, extra=(), options=None, backend=None, cache=False,
+          max_tasks_per_child=DEFAULT_MAX_TASKS_PER_CHILD, memory_limit=None, incremental=True):
+    """Transpile the sources ``spec`` names into the package directory ``output``.
+
+    With ``incremental``, sources are skipped when the graph saved by the
+    previous build into ``output`` says nothing they depend on changed.
+    """
+    start = time.perf_counter()
+    result = BuildResult()
+    root, sources = find_sources(spec)
+    output = os.path.abspath(output)
+    targets, packages = plan(root, sources, output)
+
+    seen = {}
+    for source in sources:
+        other = seen.setdefault(targets[source], source)
+        if other is not source:
+            result.failed[source] = f"writes the same module as {os.path.relpath(other, root)}"
+    for package in packages:
+        init = os.path.join(package, "__init__.py")
+        if init not in seen and not os.path.exists(init):
+            write_atomic(init, "")
+    sources = [source for source in sources if source not in result.failed]
+
+    key = digest(json.dumps([__version__, level, sorted(extra), options, backend], sort_keys=True).encode())
+    state = os.path.join(output, STATE_NAME)
+    old = Graph.load(state, key) if incremental else Graph(key)
+    graph = Graph(key)
+    builder = _Builder(root, output, {source: targets[source] for source in sources}, graph, result,
+                       (level, extra, options, backend, cache), workers, max_tasks_per_child, memory_limit)
+
+    stats, dirty = {}, []
+    for source in sources:
+        name = os.path.relpath(source, root).replace(os.sep, "/")
+        stat = stats[source] = os.stat(source)
+        record = old.files.get(name)
+        target = os.path.relpath(targets[source], output).replace(os.sep, "/")
+        if (record is None or record["target"] != target or not os.path.exists(targets[source])
+                or not unchanged(source, stat, record)):
+            dirty.append(source)
+        else:
+            graph.files[name] = dict(record, size=stat.st_size, mtime=stat.st_mtime_ns)
+    builder.run(dirty, stats)
+
+    changed = {os.path.relpath(source, root).replace(os.sep, "/") for source in dirty}
+    changed |= set(old.files) - set(graph.files)
+    stale = graph.stale_dependents(old, changed, builder.names)
+    by_name = {os.path.relpath(source, root).replace(os.sep, "/"): source for source in sources}
+    builder.run([by_name[name] for name in stale], stats)
+    result.dependents = len(stale)
+    result.unchanged = len(sources) - len(dirty) - len(stale)
+
+    for target, source in sorted(data_files(root, output, graph).items()):
+        name = os.path.relpath(target, output).replace(os.sep, "/")
+        relative = os.path.relpath(source, root).replace(os.sep, "/")
+        stat = os.stat(source)
+        record = old.data.get(name)
+        if (record is None or record["source"] != relative or not os.path.exists(target)
+                or not unchanged(source, stat, record)):
+            with open(source, "rb") as f:
+                data = f.read()
+            write_atomic(target, data)
+            record = {"source": relative, "digest": digest(data)}
+            result.copied[source] = target
+        graph.data[name] = dict(record, size=stat.st_size, mtime=stat.st_mtime_ns)
+
+    current = set(targets.values())
+    for name, record in old.files.items():
+        if name not in by_name:
+            target = os.path.join(output, *record["target"].split("/"))
+            if target not in current and os.path.exists(target):
+                os.unlink(target)
+    for name in set(old.data) - set(graph.data):
+        target = os.path.join(output, *name.split("/"))
+        if target not in current and os.path.exists(target):
+            os.unlink(target)
+    write_atomic(state, graph.dumps())
+    result.seconds = time.perf_counter() - start
+    return result
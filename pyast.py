@@ -0,0 +1,966 @@
+"""Python ``ast`` trees built straight from esprima trees.
+
+``JsVisitor`` writes Python source, which CPython then has to tokenize and
+parse all over again before it can run it.  ``AstVisitor`` builds the
+``ast.Module`` instead, so in-process users can hand it to ``compile()``
+directly (see ``compile_js``), and ``ast.unparse`` turns it into text when
+text is wanted.  Nodes rather than text also mean the result is always
+well-formed: a construct with no Python counterpart raises
+``UnsupportedSyntax`` instead of producing source that does not parse.
+
+The translation follows ``JsVisitor``'s, with the same names and the same
+hoisting of function expressions, except where its text would not be
+valid Python or would lose code: ``else if`` chains, ``default:`` and
+fall-through cases (the body of a case that does not end in ``break``,
+``return``, ``throw`` or ``continue`` is followed by a copy of the next
+one's), destructuring, assignments and updates inside expressions, the
+update of a ``for`` loop (also run before each of its ``continue``\\ s),
+relative imports and ``export`` declarations.  A ``break`` out of a switch
+anywhere but at the end of a case has no Python counterpart.
+Identifiers that Python does not accept get ``$`` spelled ``_S_`` and
+keywords suffixed with ``_``.
+"""
+import ast
+import copy
+import keyword
+
+from esprima.visitor import Visited
+
+from frontend import parse
+from main import JsVisitor
+from naming import node_digest
+
+
+OPTIONS = {"tolerant": True}
+
+# Parameters JsVisitor gives every function expression.
+IMPLICIT = ("this", "arguments")
+
+LOAD, STORE, DEL = ast.Load(), ast.Store(), ast.Del()
+
+BINARY = {
+    "+": ast.Add, "-": ast.Sub, "*": ast.Mult, "/": ast.Div, "%": ast.Mod, "**": ast.Pow,
+    "&": ast.BitAnd, "|": ast.BitOr, "^": ast.BitXor, "<<": ast.LShift, ">>": ast.RShift,
+    # Python has no unsigned shift.
+    ">>>": ast.RShift,
+}
+COMPARE = {
+    "==": ast.Eq, "===": ast.Eq, "!=": ast.NotEq, "!==": ast.NotEq,
+    "<": ast.Lt, "<=": ast.LtE, ">": ast.Gt, ">=": ast.GtE, "in": ast.In,
+}
+LOGICAL = {"&&": ast.And, "||": ast.Or}
+UNARY = {"!": ast.Not, "-": ast.USub, "+": ast.UAdd, "~": ast.Invert}
+REGEX_FLAGS = (("i", "IGNORECASE"), ("m", "MULTILINE"), ("s", "DOTALL"))
+
+
+class UnsupportedSyntax(Exception):
+    """The tree holds a construct the ast backend cannot express in Python."""
+
+
+def identifier(name):
+    """The Python name for the JavaScript identifier ``name``."""
+    if name == "global":
+        return "globals"
+    if name == "Error":
+        return "Exception"
+    name = name.replace("$", "_S_")
+    if keyword.iskeyword(name):
+        name += "_"
+    if not name.isidentifier():
+        raise UnsupportedSyntax(f"identifier {name!r}")
+    return name
+
+
+def _name(id, ctx=LOAD):
+    return ast.Name(id=id, ctx=ctx)
+
+
+def _call(func, *args):
+    return ast.Call(func=func, args=list(args), keywords=[])
+
+
+def _context(node, ctx):
+    """A copy of the expression ``node`` to assign to (or delete) with ``ctx``."""
+    kind = type(node)
+    if kind is ast.Name:
+        return ast.Name(id=node.id, ctx=ctx)
+    if kind is ast.Attribute:
+        return ast.Attribute(value=node.value, attr=node.attr, ctx=ctx)
+    if kind is ast.Subscript:
+        return ast.Subscript(value=node.value, slice=node.slice, ctx=ctx)
+    raise UnsupportedSyntax(f"cannot assign to {ast.unparse(node)}")
+
+
+def _module_path(source):
+    """``(dotted module, relative level)`` for an import source, as JsVisitor maps it."""
+    if source.endswith(".js"):
+        source = source[:-3]
+    source = source.replace("@", "__at__").replace("-", "_")
+    level = 0
+    if source.startswith("./"):
+        level, source = 1, source[2:]
+    while source.startswith("../"):
+        level, source = (level or 1) + 1, source[3:]
+    module = source.replace("/", ".")
+    if not all(part.isidentifier() for part in module.split(".")):
+        raise UnsupportedSyntax(f"import from {source!r}")
+    return module, level
+
+
+def _import_from(source, names):
+    module, level = _module_path(source)
+    return ast.ImportFrom(module=module, names=names, level=level)
+
+
+def _alias(name, asname):
+    return ast.alias(name=name, asname=None if asname == name else asname)
+
+
+def _jumps(body, kind, replace):
+    """``body`` with each ``kind`` jump out of it replaced by ``replace()``'s statements.
+
+    ``kind`` is ``ast.Break`` or ``ast.Continue``; those in nested loops
+    and functions are theirs, and left alone.
+    """
+    rewritten = []
+    for statement in body:
+        node_type = type(statement)
+        if node_type is kind:
+            rewritten.extend(replace())
+            continue
+        if node_type in (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try):
+            if node_type in (ast.If, ast.Try):
+                statement.body = _jumps(statement.body, kind, replace)
+            statement.orelse = _jumps(statement.orelse, kind, replace)
+            if node_type is ast.Try:
+                statement.finalbody = _jumps(statement.finalbody, kind, replace)
+                for handler in statement.handlers:
+                    handler.body = _jumps(handler.body, kind, replace)
+        elif node_type is ast.Match:
+            for case in statement.cases:
+                case.body = _jumps(case.body, kind, replace)
+        rewritten.append(statement)
+    return rewritten
+
+
+def _break_in_case():
+    raise UnsupportedSyntax("break out of a switch before the end of a case")
+
+
+class AstVisitor(JsVisitor):
+    """Builds an ``ast.Module`` for an esprima tree.
+
+    Driven by ``JsVisitor``'s ``run`` loop and hoisting scopes.  Expression
+    handlers yield an ``ast.expr``; statement handlers yield a list of
+    ``ast.stmt``, since one JavaScript statement may take several.  Heads
+    are statements too (mostly hoisted ``def``\\ s).
+    """
+
+    def visit(self, node):
+        return self.run(node)
+
+    def nodeName(self, node, prefix="_anonymous_func_", context=""):
+        """Like ``anonymousName``, from ``node`` itself: there is no text to digest."""
+        if self.in_class:
+            context += "\0class"
+        return self.names.name(prefix, node_digest(node, context))
+
+    def temp(self, node, context=""):
+        return self.nodeName(node, "_temp_", context)
+
+    def visit_Object(self, node):
+        raise UnsupportedSyntax(f"{node.type} is not supported")
+        yield
+
+    def visit_Generic(self, node):
+        raise UnsupportedSyntax(f"cannot visit {node!r}")
+        yield
+
+    def statements(self, nodes):
+        body = []
+        for node in nodes:
+            if node.directive != "use strict":
+                body.extend((yield node))
+        yield Visited(body)
+
+    def visit_Script(self, node):
+        body = yield self.statements(node.body)
+        yield Visited(ast.Module(body=self.heads + body, type_ignores=[]))
+
+    visit_Module = visit_Program = visit_Script
+
+    def visit_Identifier(self, node):
+        yield Visited(_name(identifier(node.name)))
+
+    def visit_ThisExpression(self, node):
+        yield Visited(_name("self" if self.in_class else "this"))
+
+    # Functions
+    def arguments(self, params, implicit=()):
+        """``(ast.arguments, statements unpacking destructured parameters)``."""
+        args = [ast.arg(arg=name) for name in implicit]
+        defaults, vararg, after = [], None, []
+        for index, param in enumerate(params):
+            default = None
+            if param.type == "AssignmentPattern" and param.left.type == "Identifier":
+                default = yield param.right
+                param = param.left
+            rest = param.type == "RestElement"
+            target, unpack = yield self.target(param.argument if rest else param)
+            if type(target) is not ast.Name:
+                # Identical patterns may take several parameters.
+                name = self.temp(param, str(index))
+                unpack = [ast.Assign(targets=[target], value=_name(name))] + unpack
+                target = _name(name, STORE)
+            after.extend(unpack)
+            if rest:
+                vararg = ast.arg(arg=target.id)
+                continue
+            args.append(ast.arg(arg=target.id))
+            # Python wants every parameter after a default to have one.
+            if default is not None or defaults:
+                defaults.append(default or ast.Constant(value=None))
+        arguments = ast.arguments(posonlyargs=[], args=args, vararg=vararg, kwonlyargs=[],
+                                  kw_defaults=[], kwarg=None, defaults=defaults)
+        yield Visited((arguments, after))
+
+    def function(self, node, name, implicit=(), decorators=()):
+        args, after = yield self.arguments(node.params, implicit)
+        self.pushHeads()
+        if node.expression:
+            body = [ast.Return(value=(yield node.body))]
+        else:
+            body = yield node.body
+        body = after + self.popHeads() + body
+        kind = ast.AsyncFunctionDef if node.isAsync else ast.FunctionDef
+        yield Visited(kind(name=name, args=args, body=body or [ast.Pass()],
+                           decorator_list=list(decorators), returns=None))
+
+    def visit_FunctionDeclaration(self, node):
+        name = identifier(node.id.name) if node.id else "__anonymous_function__"
+        if node.lazySource is not None:
+            # Body left for lazy.LazyFunction to transpile on first call.
+            stub = _call(_name("__lazy__"), _call(_name("globals")), ast.Constant(value=name),
+                         ast.Constant(value=node.lazySource))
+            yield Visited([ast.Assign(targets=[_name(name, STORE)], value=stub)])
+            return
+        yield Visited([(yield self.function(node, name))])
+
+    visit_AsyncFunctionDeclaration = visit_FunctionDeclaration
+
+    def visit_FunctionExpression(self, node, name=None):
+        if name is None:
+            name = self.nodeName(node)
+        self.heads.append((yield self.function(node, name, IMPLICIT)))
+        yield Visited(_name(name))
+
+    visit_ArrowFunctionExpression = visit_FunctionExpression
+    visit_AsyncFunctionExpression = visit_FunctionExpression
+    visit_AsyncArrowFunctionExpression = visit_FunctionExpression
+
+    def visit_ReturnStatement(self, node):
+        argument = node.argument
+        if argument is None:
+            yield Visited([ast.Return(value=None)])
+            return
+        # Python has no assignment or comma expressions to return; evaluate
+        # them first, as JsVisitor does.
+        before = []
+        if argument.type == "SequenceExpression":
+            for expression in argument.expressions[:-1]:
+                before.extend((yield self.statement(expression)))
+            argument = argument.expressions[-1]
+        if argument.type == "AssignmentExpression" or (argument.type == "UpdateExpression" and argument.prefix):
+            before.extend((yield self.statement(argument)))
+            argument = argument.left if argument.type == "AssignmentExpression" else argument.argument
+        yield Visited(before + [self.returnOf(node, (yield argument))])
+
+    def returnOf(self, node, value):
+        if node.type == "ThrowStatement":
+            return ast.Raise(exc=value, cause=None)
+        return ast.Return(value=value)
+
+    visit_ThrowStatement = visit_ReturnStatement
+
+    def visit_YieldExpression(self, node):
+        value = (yield node.argument) if node.argument else None
+        yield Visited(ast.YieldFrom(value=value) if node.delegate else ast.Yield(value=value))
+
+    def visit_AwaitExpression(self, node):
+        yield Visited(ast.Await(value=(yield node.argument)))
+
+    # Statements
+    def visit_BlockStatement(self, node):
+        return self.statements(node.body)
+
+    def visit_ExpressionStatement(self, node):
+        return self.statement(node.expression)
+
+    visit_Directive = visit_ExpressionStatement
+
+    def statement(self, node):
+        """Statements evaluating the expression ``node`` for its effect."""
+        kind = node.type
+        if kind == "AssignmentExpression":
+            return self.assign(node)
+        if kind == "UpdateExpression":
+            return self.augment(node.argument, ast.Add if node.operator == "++" else ast.Sub,
+                                self.one())
+        if kind == "SequenceExpression":
+            return self.sequence(node)
+        if kind == "UnaryExpression" and node.operator == "delete":
+            return self.delete(node)
+        if kind == "LogicalExpression" or kind == "ConditionalExpression":
+            return self.branch(node)
+        return self.expression(node)
+
+    def one(self):
+        yield Visited(ast.Constant(value=1))
+
+    def expression(self, node):
+        yield Visited([ast.Expr(value=(yield node))])
+
+    def branch(self, node):
+        # ``a && (b.c = d)`` and ``a ? b() : c.d = e``, common in minified
+        # code, are if statements in disguise; written as such, their
+        # branches can hold assignments.
+        test = yield node.test if node.type == "ConditionalExpression" else node.left
+        if node.type == "ConditionalExpression":
+            body = yield self.statement(node.consequent)
+            orelse = yield self.statement(node.alternate)
+        elif node.operator == "&&":
+            body, orelse = (yield self.statement(node.right)), []
+        else:
+            test = ast.UnaryOp(op=ast.Not(), operand=test)
+            body, orelse = (yield self.statement(node.right)), []
+        yield Visited([ast.If(test=test, body=body or [ast.Pass()], orelse=orelse)])
+
+    def sequence(self, node):
+        body = []
+        for expression in node.expressions:
+            body.extend((yield self.statement(expression)))
+        yield Visited(body)
+
+    def delete(self, node):
+        yield Visited([ast.Delete(targets=[_context((yield node.argument), DEL)])])
+
+    def visit_EmptyStatement(self, node):
+        yield Visited([])
+
+    visit_DebuggerStatement = visit_EmptyStatement
+
+    def visit_BreakStatement(self, node):
+        if node.label:
+            raise UnsupportedSyntax("labeled break")
+        yield Visited([ast.Break()])
+
+    def visit_ContinueStatement(self, node):
+        if node.label:
+            raise UnsupportedSyntax("labeled continue")
+        yield Visited([ast.Continue()])
+
+    def visit_LabeledStatement(self, node):
+        return self.statements([node.body])
+
+    def visit_IfStatement(self, node):
+        test = yield node.test
+        self.pushHeads()
+        body = yield node.consequent
+        body = self.popHeads() + body
+        orelse = []
+        if node.alternate:
+            self.pushHeads()
+            orelse = yield node.alternate
+            orelse = self.popHeads() + orelse
+        yield Visited([ast.If(test=test, body=body or [ast.Pass()], orelse=orelse)])
+
+    # Switch Case
+    def visit_SwitchStatement(self, node):
+        subject = yield node.discriminant
+        # Cases without a body fall through to the next one: one match_case
+        # for the lot. ``default`` matches last whatever its position.
+        entries, tests = [], []
+        for case in node.cases:
+            tests.append(case.test)
+            if not case.consequent and case is not node.cases[-1]:
+                continue
+            body = []
+            for statement in case.consequent:
+                body.extend((yield statement))
+            entries.append((tests, body))
+            tests = []
+        # A body that does not leave the switch runs on into the next one,
+        # in source order, default included.
+        groups, default, following = [], None, []
+        for tests, body in reversed(entries):
+            if body and type(body[-1]) is ast.Break:
+                body = _jumps(body[:-1], ast.Break, _break_in_case)
+            else:
+                body = _jumps(body, ast.Break, _break_in_case)
+                if not (body and type(body[-1]) in (ast.Return, ast.Raise, ast.Continue)):
+                    body += copy.deepcopy(following)
+            following = body
+            if None in tests:
+                default = body or [ast.Pass()]
+            else:
+                groups.insert(0, (tests, body or [ast.Pass()]))
+
+        cases = []
+        for tests, body in groups:
+            patterns = []
+            for test in tests:
+                patterns.append((yield self.pattern(test)))
+            if None in patterns:
+                # case _temp_N if _temp_N == a or _temp_N == b:
+                name = self.temp(node)
+                comparisons = []
+                for test in tests:
+                    comparisons.append(ast.Compare(left=_name(name), ops=[ast.Eq()], comparators=[(yield test)]))
+                guard = comparisons[0] if len(comparisons) == 1 else ast.BoolOp(op=ast.Or(), values=comparisons)
+                pattern = ast.MatchAs(pattern=None, name=name)
+            else:
+                guard = None
+                pattern = patterns[0] if len(patterns) == 1 else ast.MatchOr(patterns=patterns)
+            cases.append(ast.match_case(pattern=pattern, guard=guard, body=body))
+        if default is not None:
+            cases.append(ast.match_case(pattern=ast.MatchAs(pattern=None, name=None), guard=None,
+                                        body=default))
+        if not cases:
+            yield Visited([ast.Expr(value=subject)])
+            return
+        yield Visited([ast.Match(subject=subject, cases=cases)])
+
+    def pattern(self, test):
+        """A value pattern for a ``case`` test, or ``None`` if it needs a guard."""
+        if test.type == "Literal" and not test.regex:
+            if test.value is None or type(test.value) is bool:
+                yield Visited(ast.MatchSingleton(value=test.value))
+            else:
+                yield Visited(ast.MatchValue(value=ast.Constant(value=test.value)))
+            return
+        if test.type == "StaticMemberExpression":
+            value = yield test
+            chain = value
+            while type(chain) is ast.Attribute:
+                chain = chain.value
+            if type(chain) is ast.Name:
+                yield Visited(ast.MatchValue(value=value))
+                return
+        yield Visited(None)
+
+    def visit_SwitchCase(self, node):
+        raise UnsupportedSyntax("case outside a switch")
+        yield
+
+    # Variables
+    def visit_VariableDeclaration(self, node):
+        body = []
+        for declarator in node.declarations:
+            body.extend((yield declarator))
+        yield Visited(body)
+
+    def visit_VariableDeclarator(self, node):
+        init = node.init
+        if init is not None and "Function" in init.type and node.id.type == "Identifier":
+            # Hoisted under the variable's own name.
+            yield self.visit_FunctionExpression(init, name=identifier(node.id.name))
+            yield Visited([])
+            return
+        if init is not None and init.type == "AssignmentExpression" and init.operator == "=":
+            yield Visited((yield self.chain(init, [node.id])))
+            return
+        value = (yield init) if init is not None else ast.Constant(value=None)
+        yield Visited((yield self.bind(node.id, value)))
+
+    def bind(self, pattern, value):
+        """Statements assigning ``value`` to the target or pattern ``pattern``."""
+        target, after = yield self.target(pattern)
+        yield Visited([ast.Assign(targets=[target], value=value)] + after)
+
+    def target(self, node):
+        """``(target, statements to run once it is assigned)`` for a pattern.
+
+        Object patterns and defaults go through a ``_temp_N`` name, which
+        those statements unpack and then delete.
+        """
+        kind = node.type
+        if kind == "ArrayPattern":
+            elements, after = [], []
+            for element in node.elements:
+                if element is None:
+                    elements.append(_name("_", STORE))
+                    continue
+                rest = element.type == "RestElement"
+                target, unpack = yield self.target(element.argument if rest else element)
+                elements.append(ast.Starred(value=target, ctx=STORE) if rest else target)
+                after.extend(unpack)
+            yield Visited((ast.Tuple(elts=elements, ctx=STORE), after))
+        elif kind == "ObjectPattern":
+            name = self.temp(node)
+            after = []
+            for prop in node.properties:
+                if prop.type != "Property":
+                    raise UnsupportedSyntax(f"{prop.type} in an object pattern")
+                if prop.computed:
+                    value = ast.Subscript(value=_name(name), slice=(yield prop.key), ctx=LOAD)
+                elif prop.key.type == "Identifier":
+                    value = ast.Attribute(value=_name(name), attr=identifier(prop.key.name), ctx=LOAD)
+                else:
+                    value = ast.Subscript(value=_name(name), slice=ast.Constant(value=prop.key.value), ctx=LOAD)
+                after.extend((yield self.bind(prop.value, value)))
+            after.append(ast.Delete(targets=[_name(name, DEL)]))
+            yield Visited((_name(name, STORE), after))
+        elif kind == "AssignmentPattern":
+            name = self.temp(node)
+            default = yield node.right
+            value = ast.IfExp(test=ast.Compare(left=_name(name), ops=[ast.Is()],
+                                               comparators=[ast.Constant(value=None)]),
+                              body=default, orelse=_name(name))
+            after = (yield self.bind(node.left, value)) + [ast.Delete(targets=[_name(name, DEL)])]
+            yield Visited((_name(name, STORE), after))
+        else:
+            yield Visited((_context((yield node), STORE), []))
+
+    # Expressions
+    def visit_SequenceExpression(self, node):
+        # ``(a, b)[-1]`` evaluates both, in order, and gives the last.
+        elements = []
+        for expression in node.expressions:
+            elements.append((yield expression))
+        yield Visited(ast.Subscript(value=ast.Tuple(elts=elements, ctx=LOAD),
+                                    slice=ast.Constant(value=-1), ctx=LOAD))
+
+    def visit_UpdateExpression(self, node):
+        op = ast.Add if node.operator == "++" else ast.Sub
+        if node.prefix:
+            yield Visited((yield self.walrus(node.argument, op, self.one())))
+            return
+        # a++ gives the old value: (_temp_N := a, a := _temp_N + 1)[0]
+        if node.argument.type in ("ArrayPattern", "ObjectPattern"):
+            raise UnsupportedSyntax("destructuring inside an expression")
+        target = yield node.argument
+        name = self.temp(node)
+        value = ast.BinOp(left=_name(name), op=op(), right=ast.Constant(value=1))
+        if type(target) is ast.Name:
+            store = ast.NamedExpr(target=_context(target, STORE), value=value)
+        elif type(target) is ast.Attribute:
+            store = _call(_name("setattr"), target.value, ast.Constant(value=target.attr), value)
+        elif type(target) is ast.Subscript:
+            store = _call(ast.Attribute(value=target.value, attr="__setitem__", ctx=LOAD), target.slice, value)
+        else:
+            raise UnsupportedSyntax(f"cannot assign to {ast.unparse(target)}")
+        elements = [ast.NamedExpr(target=_name(name, STORE), value=target), store]
+        yield Visited(ast.Subscript(value=ast.Tuple(elts=elements, ctx=LOAD),
+                                    slice=ast.Constant(value=0), ctx=LOAD))
+
+    def visit_AssignmentExpression(self, node):
+        if node.operator == "=":
+            yield Visited((yield self.walrus(node.left, None, node.right)))
+        else:
+            yield Visited((yield self.walrus(node.left, self.operator(node.operator[:-1]), node.right)))
+
+    def walrus(self, target, op, value):
+        """An expression assigning ``value`` (combined with ``op``) to ``target``.
+
+        ``(a := v)`` for a name.  Members have no assignment expression, so
+        ``a.b = v`` becomes ``(_temp_N := v, setattr(a, 'b', _temp_N), _temp_N)[-1]``
+        and subscripts go through ``__setitem__``.
+        """
+        if target.type in ("ArrayPattern", "ObjectPattern"):
+            raise UnsupportedSyntax("destructuring inside an expression")
+        pattern = target
+        target = yield target
+        value = yield value
+        if op is not None:
+            value = ast.BinOp(left=target, op=op(), right=value)
+        if type(target) is ast.Name:
+            yield Visited(ast.NamedExpr(target=_context(target, STORE), value=value))
+            return
+        name = self.temp(pattern)
+        if type(target) is ast.Attribute:
+            store = _call(_name("setattr"), target.value, ast.Constant(value=target.attr), _name(name))
+        elif type(target) is ast.Subscript:
+            store = _call(ast.Attribute(value=target.value, attr="__setitem__", ctx=LOAD), target.slice, _name(name))
+        else:
+            raise UnsupportedSyntax(f"cannot assign to {ast.unparse(target)}")
+        elements = [ast.NamedExpr(target=_name(name, STORE), value=value), store, _name(name)]
+        yield Visited(ast.Subscript(value=ast.Tuple(elts=elements, ctx=LOAD),
+                                    slice=ast.Constant(value=-1), ctx=LOAD))
+
+    def operator(self, operator):
+        op = BINARY.get(operator)
+        if op is None:
+            raise UnsupportedSyntax(f"operator {operator}")
+        return op
+
+    def assign(self, node):
+        if node.operator != "=":
+            return self.augment(node.left, self.operator(node.operator[:-1]), node.right)
+        return self.chain(node)
+
+    def chain(self, node, patterns=()):
+        # a = b = c assigns c to both.
+        patterns = list(patterns)
+        while node.type == "AssignmentExpression" and node.operator == "=":
+            patterns.append(node.left)
+            node = node.right
+        value = yield node
+        targets, after = [], []
+        for pattern in patterns:
+            target, unpack = yield self.target(pattern)
+            targets.append(target)
+            after.extend(unpack)
+        yield Visited([ast.Assign(targets=targets, value=value)] + after)
+
+    def augment(self, target, op, value):
+        target = _context((yield target), STORE)
+        yield Visited([ast.AugAssign(target=target, op=op(), value=(yield value))])
+
+    def visit_AssignmentPattern(self, node):
+        raise UnsupportedSyntax("default value outside a pattern")
+        yield
+
+    def visit_UnaryExpression(self, node):
+        operator = node.operator
+        argument = yield node.argument
+        if operator == "typeof":
+            lookup = _call(ast.Attribute(value=_call(_name("globals")), attr="get", ctx=LOAD),
+                           ast.Constant(value=ast.unparse(argument)))
+            yield Visited(_call(_name("type"), lookup))
+        elif operator == "void":
+            yield Visited(argument)
+        elif operator in UNARY:
+            yield Visited(ast.UnaryOp(op=UNARY[operator](), operand=argument))
+        elif operator == "delete" and type(argument) in (ast.Attribute, ast.Subscript):
+            # (delattr(a, 'b'), True)[-1]
+            if type(argument) is ast.Attribute:
+                remove = _call(_name("delattr"), argument.value, ast.Constant(value=argument.attr))
+            else:
+                remove = _call(ast.Attribute(value=argument.value, attr="__delitem__", ctx=LOAD), argument.slice)
+            yield Visited(ast.Subscript(value=ast.Tuple(elts=[remove, ast.Constant(value=True)], ctx=LOAD),
+                                        slice=ast.Constant(value=-1), ctx=LOAD))
+        else:
+            raise UnsupportedSyntax(f"operator {operator} inside an expression")
+
+    def visit_BinaryExpression(self, node):
+        operator = node.operator
+        left = yield node.left
+        right = yield node.right
+        if operator in LOGICAL:
+            yield Visited(ast.BoolOp(op=LOGICAL[operator](), values=[left, right]))
+        elif operator in COMPARE:
+            yield Visited(ast.Compare(left=left, ops=[COMPARE[operator]()], comparators=[right]))
+        elif operator == "instanceof":
+            yield Visited(_call(_name("isinstance"), left, right))
+        else:
+            yield Visited(ast.BinOp(left=left, op=self.operator(operator)(), right=right))
+
+    visit_LogicalExpression = visit_BinaryExpression
+
+    def visit_ConditionalExpression(self, node):
+        test = yield node.test
+        yield Visited(ast.IfExp(test=test, body=(yield node.consequent), orelse=(yield node.alternate)))
+
+    def visit_CallExpression(self, node):
+        if node.callee.type == "Super":
+            callee = ast.Attribute(value=_call(_name("super")), attr="__init__", ctx=LOAD)
+        else:
+            callee = yield node.callee
+        args = []
+        for argument in node.arguments:
+            args.append((yield argument))
+        yield Visited(ast.Call(func=callee, args=args, keywords=[]))
+
+    visit_NewExpression = visit_CallExpression
+
+    def visit_Super(self, node):
+        yield Visited(_call(_name("super")))
+
+    def visit_SpreadElement(self, node):
+        yield Visited(ast.Starred(value=(yield node.argument), ctx=LOAD))
+
+    def visit_RestElement(self, node):
+        raise UnsupportedSyntax("rest element outside a pattern")
+        yield
+
+    def visit_ArrayExpression(self, node):
+        elements = []
+        for element in node.elements:
+            elements.append((yield element) if element else ast.Constant(value=None))
+        yield Visited(_call(_name("Js"), ast.List(elts=elements, ctx=LOAD)))
+
+    def visit_ArrayPattern(self, node):
+        raise UnsupportedSyntax("array pattern outside an assignment")
+        yield
+
+    def visit_ObjectExpression(self, node):
+        keys, values = [], []
+        for prop in node.properties:
+            if prop.type == "SpreadElement":
+                keys.append(None)
+                values.append((yield prop.argument))
+                continue
+            if prop.computed:
+                key = yield prop.key
+                label = ""
+            elif prop.key.type == "Identifier":
+                label = identifier(prop.key.name)
+                key = ast.Constant(value=label)
+            else:
+                key = ast.Constant(value=prop.key.value)
+                label = ""
+            keys.append(key)
+            if prop.value.type == "FunctionExpression":
+                name = self.nodeName(prop.value, f"_anonymous_func_{label}_" if label else "_anonymous_func_")
+                values.append((yield self.visit_FunctionExpression(prop.value, name=name)))
+            else:
+                values.append((yield prop.value))
+        yield Visited(ast.Dict(keys=keys, values=values))
+
+    def visit_ObjectPattern(self, node):
+        raise UnsupportedSyntax("object pattern outside an assignment")
+        yield
+
+    def visit_Property(self, node):
+        raise UnsupportedSyntax("property outside an object")
+        yield
+
+    def visit_StaticMemberExpression(self, node):
+        value = yield node.object
+        yield Visited(ast.Attribute(value=value, attr=identifier(node.property.name), ctx=LOAD))
+
+    def visit_ComputedMemberExpression(self, node):
+        value = yield node.object
+        yield Visited(ast.Subscript(value=value, slice=(yield node.property), ctx=LOAD))
+
+    # Literals
+    def visit_Literal(self, node):
+        if node.regex:
+            yield Visited(self.regex(node))
+        else:
+            yield Visited(ast.Constant(value=node.value))
+
+    def regex(self, node):
+        # re.compile(pattern, flags), as repr() of the compiled pattern reads.
+        pattern = getattr(node.value, "pattern", node.regex.pattern)
+        args = [ast.Constant(value=pattern)]
+        flags = None
+        for letter, flag in REGEX_FLAGS:
+            if letter in node.regex.flags:
+                flag = ast.Attribute(value=_name("re"), attr=flag, ctx=LOAD)
+                flags = flag if flags is None else ast.BinOp(left=flags, op=ast.BitOr(), right=flag)
+        if flags is not None:
+            args.append(flags)
+        return _call(ast.Attribute(value=_name("re"), attr="compile", ctx=LOAD), *args)
+
+    visit_RegexLiteral = visit_Literal
+
+    def visit_TemplateLiteral(self, node):
+        values = []
+        for i, quasi in enumerate(node.quasis):
+            if quasi.value.cooked:
+                values.append(ast.Constant(value=quasi.value.cooked))
+            if i < len(node.expressions):
+                values.append(ast.FormattedValue(value=(yield node.expressions[i]),
+                                                 conversion=-1, format_spec=None))
+        yield Visited(ast.JoinedStr(values=values))
+
+    def visit_TemplateElement(self, node):
+        yield Visited(ast.Constant(value=node.value.cooked))
+
+    # Classes
+    def classDef(self, node, name):
+        bases = [(yield node.superClass) if node.superClass else _name("object")]
+        in_class, self.in_class = self.in_class, True
+        body = yield node.body
+        self.in_class = in_class
+        yield Visited(ast.ClassDef(name=name, bases=bases, keywords=[], body=body or [ast.Pass()],
+                                   decorator_list=[]))
+
+    def visit_ClassDeclaration(self, node):
+        yield Visited([(yield self.classDef(node, identifier(node.id.name)))])
+
+    def visit_ClassExpression(self, node):
+        name = identifier(node.id.name) if node.id else self.nodeName(node, "_anonymous_class_")
+        self.heads.append((yield self.classDef(node, name)))
+        yield Visited(_name(name))
+
+    def visit_ClassBody(self, node):
+        return self.statements(node.body)
+
+    def visit_MethodDefinition(self, node):
+        if node.computed or node.key.type != "Identifier":
+            raise UnsupportedSyntax("computed method name")
+        name = "__init__" if node.kind == "constructor" else identifier(node.key.name)
+        if node.static:
+            method = yield self.function(node.value, name, decorators=[_name("staticmethod")])
+        else:
+            method = yield self.function(node.value, name, ("self",))
+        yield Visited([method])
+
+    # Loops
+    def visit_ForInStatement(self, node):
+        left = node.left
+        if left.type == "VariableDeclaration":
+            left = left.declarations[0].id
+        target, after = yield self.target(left)
+        iterable = yield node.right
+        body = after + (yield node.body)
+        yield Visited([ast.For(target=target, iter=iterable, body=body or [ast.Pass()], orelse=[])])
+
+    visit_ForOfStatement = visit_ForInStatement
+
+    def visit_ForStatement(self, node):
+        body = []
+        if node.init:
+            if node.init.type == "VariableDeclaration":
+                body.extend((yield node.init))
+            else:
+                body.extend((yield self.statement(node.init)))
+        test = (yield node.test) if node.test else ast.Constant(value=True)
+        loop = yield node.body
+        if node.update:
+            update = yield self.statement(node.update)
+            # ``continue`` goes on with the update, not straight to the test.
+            loop = _jumps(loop, ast.Continue, lambda: copy.deepcopy(update) + [ast.Continue()])
+            loop.extend(update)
+        body.append(ast.While(test=test, body=loop or [ast.Pass()], orelse=[]))
+        yield Visited(body)
+
+    def visit_WhileStatement(self, node):
+        test = yield node.test
+        body = yield node.body
+        yield Visited([ast.While(test=test, body=body or [ast.Pass()], orelse=[])])
+
+    visit_DoWhileStatement = visit_WhileStatement
+
+    def visit_TryStatement(self, node):
+        body = yield node.block
+        handlers = [(yield node.handler)] if node.handler else []
+        finalbody = []
+        if node.finalizer:
+            finalbody = (yield node.finalizer) or [ast.Pass()]
+        yield Visited([ast.Try(body=body or [ast.Pass()], handlers=handlers, orelse=[],
+                               finalbody=finalbody)])
+
+    def visit_CatchClause(self, node):
+        name, body = None, []
+        if node.param:
+            target, body = yield self.target(node.param)
+            if type(target) is not ast.Name:
+                name = self.temp(node.param)
+                body = [ast.Assign(targets=[target], value=_name(name))] + body
+            else:
+                name = target.id
+        body += yield node.body
+        yield Visited(ast.ExceptHandler(type=_name("Exception"), name=name, body=body or [ast.Pass()]))
+
+    # Import and export
+    def visit_ImportDeclaration(self, node):
+        source = node.source.value
+        if source.endswith(".json"):
+            yield Visited(self.jsonImport(node))
+            return
+        names, body = [], []
+        for specifier in node.specifiers:
+            local = identifier(specifier.local.name)
+            if specifier.type == "ImportNamespaceSpecifier":
+                module, level = _module_path(source)
+                if level:
+                    parent, _, module = module.rpartition(".")
+                    body.append(ast.ImportFrom(module=parent or None, names=[_alias(module, local)], level=level))
+                else:
+                    body.append(ast.Import(names=[_alias(module, local)]))
+            elif specifier.type == "ImportDefaultSpecifier":
+                names.append(_alias("__default__", local))
+            else:
+                names.append(_alias(identifier(specifier.imported.name), local))
+        if names:
+            body.insert(0, _import_from(source, names))
+        elif not body:
+            module, level = _module_path(source)
+            if level:
+                parent, _, module = module.rpartition(".")
+                body.append(ast.ImportFrom(module=parent or None, names=[_alias(module, None)], level=level))
+            else:
+                body.append(ast.Import(names=[_alias(module, None)]))
+        yield Visited(body)
+
+    def jsonImport(self, node):
+        source = node.source.value
+        body = [ast.ImportFrom(module="jsondata", names=[_alias("JsonModule", "__json__")], level=0)]
+        for specifier in node.specifiers:
+            load = _call(_name("__json__"), _call(_name("globals")), ast.Constant(value=source))
+            if specifier.type == "ImportSpecifier":
+                load = ast.Subscript(value=load, slice=ast.Constant(value=specifier.imported.name), ctx=LOAD)
+            body.append(ast.Assign(targets=[_name(identifier(specifier.local.name), STORE)], value=load))
+        return body
+
+    def visit_ExportDefaultDeclaration(self, node):
+        declaration = node.declaration
+        if declaration.type in ("FunctionDeclaration", "AsyncFunctionDeclaration", "ClassDeclaration"):
+            body = yield declaration
+            value = _name(body[-1].name if type(body[-1]) is not ast.Assign else body[-1].targets[0].id)
+        else:
+            body, value = [], (yield declaration)
+        yield Visited(body + [ast.Assign(targets=[_name("__default__", STORE)], value=value)])
+
+    def visit_ExportNamedDeclaration(self, node):
+        if node.declaration:
+            yield Visited((yield node.declaration))
+            return
+        if node.source:
+            names = [_alias("__default__" if specifier.local.name == "default" else identifier(specifier.local.name),
+                            identifier(specifier.exported.name))
+                     for specifier in node.specifiers]
+            yield Visited([_import_from(node.source.value, names)] if names else [])
+            return
+        body = []
+        for specifier in node.specifiers:
+            local, exported = identifier(specifier.local.name), identifier(specifier.exported.name)
+            if local != exported:
+                body.append(ast.Assign(targets=[_name(exported, STORE)], value=_name(local)))
+        yield Visited(body)
+
+    def visit_ExportAllDeclaration(self, node):
+        yield Visited([_import_from(node.source.value, [ast.alias(name="*", asname=None)])])
+
+
+def locate(module):
+    """Give every node of ``module`` position 1:0, as ``compile()`` requires.
+
+    ``ast.fix_missing_locations`` does the same, copying each parent's
+    position down, at about twice the cost; the built nodes have none to
+    copy.
+    """
+    todo = [module]
+    push = todo.append
+    for node in todo:
+        if node is None:
+            # The key of a ``**spread`` in a dict.
+            continue
+        fields = node.__dict__
+        if node._attributes:
+            fields["lineno"] = fields["end_lineno"] = 1
+            fields["col_offset"] = fields["end_col_offset"] = 0
+        for value in fields.values():
+            if type(value) is list:
+                todo.extend(value)
+            elif isinstance(value, ast.AST):
+                push(value)
+    return module
+
+
+def build_module(tree):
+    """``ast.Module`` for the esprima ``tree``, ready for ``compile()``."""
+    return locate(AstVisitor().visit(tree))
+
+
+def transpile_ast(code, options=None, backend=None, cache=None):
+    """Parse ``code`` and return the Python module for it as an ``ast.Module``."""
+    return build_module(parse(code, OPTIONS if options is None else options, backend=backend, cache=cache))
+
+
+def compile_js(code, filename="<js>", options=None, backend=None, cache=None):
+    """A code object for ``code``, compiled without going through Python source."""
+    return compile(transpile_ast(code, options, backend, cache), filename, "exec")
@@ -0,0 +1,299 @@
+"""Splitting oversized generated functions into helpers.
+
+A bundle wraps all of its modules in one function expression, so the
+``def`` hoisted for it holds the whole program: every callback in it
+becomes a nested ``def`` reading the bundle's variables.  CPython's symbol
+table hands each nested function the names bound around it, so compiling
+such a function takes time in the product of the two; 20000 callbacks
+over 20000 variables take most of a minute.  ``split`` cuts the body of
+every function with more than ``max_statements`` statements of its own
+(not counting nested functions and classes) into runs of top-level
+statements, each moved into a nested helper::
+
+    def big(a):                         def big(a):
+        x = f(a)                            if False:
+        y = 1                                   x = None
+        ...                                 def __part0__():
+        return g(x)                             nonlocal x
+                                                x = f(a)
+                                                y = 1
+                                                ...
+                                            __part0__()
+                                            def __part1__():
+                                                ...
+                                                return (g(x),)
+                                            __result__ = __part1__()
+                                            if __result__ is not None:
+                                                return __result__[0]
+
+A name only one part mentions becomes a local of that part, like ``y``.
+The others are shared through closure cells: each part declares
+``nonlocal`` for the ones it binds, and the never-run ``if False:`` block
+makes them locals of the original function without assigning them, so
+reading one before it is set still raises ``NameError``.  ``return`` is
+wrapped in a tuple to tell "returned ``None``" from "fell off the end".
+Generators, and functions that use ``super()``, ``locals()``, ``vars()``,
+``eval`` or ``exec``, depend on their own frame and are left whole.
+
+The budget is a statement count rather than a bytecode size: statements
+are what can be moved, and counting them needs no compiling.
+"""
+import ast
+
+
+DEFAULT_MAX_STATEMENTS = 2000
+
+PART = "__part{}__"
+RESULT = "__result__"
+
+FRAME_NAMES = frozenset(("super", "locals", "vars", "eval", "exec"))
+SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+
+
+def _own(node):
+    """The nodes in the scope of the function ``node``, not in nested ones.
+
+    Nested functions and classes are included but not entered, except for
+    what is evaluated in the enclosing scope: decorators, defaults, bases.
+    """
+    stack = list(reversed(node.body))
+    while stack:
+        node = stack.pop()
+        yield node
+        if isinstance(node, SCOPES):
+            if type(node) is ast.ClassDef:
+                outer = node.decorator_list + node.bases + node.keywords
+            else:
+                outer = getattr(node, "decorator_list", []) + node.args.defaults + node.args.kw_defaults
+            stack.extend(child for child in reversed(outer) if child is not None)
+        elif type(node) is ast.comprehension:
+            # The loop variables are the comprehension's own; ``:=`` in one
+            # still binds in the enclosing scope.
+            stack.extend(reversed([node.iter] + node.ifs))
+        else:
+            stack.extend(reversed(list(ast.iter_child_nodes(node))))
+
+
+def _statements(node):
+    return sum(isinstance(child, ast.stmt) for child in _own(node))
+
+
+class _Survey(object):
+    """What splitting needs to know about one top-level statement."""
+
+    __slots__ = ("statement", "statements", "bindings", "names", "returns", "declarations", "whole")
+
+    def __init__(self, statement):
+        self.statement = statement
+        self.statements = 0
+        self.bindings = set()
+        self.returns = []
+        self.declarations = []
+        # Generators and functions that look at their own frame stay whole.
+        self.whole = False
+        bindings = self.bindings
+        for node in _own(ast.Module(body=[statement], type_ignores=[])):
+            kind = type(node)
+            if kind is ast.Name:
+                if type(node.ctx) is not ast.Load:
+                    bindings.add(node.id)
+                elif node.id in FRAME_NAMES:
+                    self.whole = True
+            elif isinstance(node, ast.stmt):
+                self.statements += 1
+                if kind in (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef):
+                    bindings.add(node.name)
+                elif kind in (ast.Import, ast.ImportFrom):
+                    bindings.update((alias.asname or alias.name).partition(".")[0] for alias in node.names)
+                elif kind is ast.Return:
+                    self.returns.append(node)
+                elif kind in (ast.Global, ast.Nonlocal):
+                    self.declarations.append(node)
+            elif kind in (ast.ExceptHandler, ast.MatchAs, ast.MatchStar):
+                if node.name:
+                    bindings.add(node.name)
+            elif kind is ast.MatchMapping:
+                if node.rest:
+                    bindings.add(node.rest)
+            elif kind in (ast.Yield, ast.YieldFrom):
+                self.whole = True
+        # Every name mentioned, nested functions included.
+        self.names = {node.id for node in ast.walk(statement) if type(node) is ast.Name}
+
+
+def _plain(statement):
+    """Whether ``statement`` is a ``def`` that evaluates nothing when it runs."""
+    if type(statement) not in (ast.FunctionDef, ast.AsyncFunctionDef):
+        return False
+    arguments = statement.args
+    every = arguments.posonlyargs + arguments.args + arguments.kwonlyargs + [arguments.vararg, arguments.kwarg]
+    return not (statement.decorator_list or statement.returns or arguments.defaults
+                or any(arguments.kw_defaults) or any(arg.annotation for arg in every if arg is not None))
+
+
+def _sink(surveys):
+    """Move each plain ``def`` down to the first statement that mentions it.
+
+    The visitors hoist nested functions to the top of the body, away from
+    the code using them; moved next to it, they end up in the same part
+    and the locals they read need not be shared.  A ``def`` only moves if
+    nothing else binds its name and nothing before it mentions the name.
+    """
+    binders, mentions = {}, {}
+    for index, survey in enumerate(surveys):
+        for name in survey.bindings:
+            binders[name] = binders.get(name, 0) + 1
+        for name in survey.names:
+            mentions.setdefault(name, []).append(index)
+
+    targets, moved = {}, {}
+    for index in range(len(surveys) - 1, -1, -1):
+        statement = surveys[index].statement
+        if not (_plain(statement) and binders[statement.name] == 1):
+            continue
+        positions = [position for position in mentions.get(statement.name, ()) if position != index]
+        if not positions or positions[0] < index:
+            continue
+        target = positions[0]
+        while target in targets:
+            target = targets[target]
+        targets[index] = target
+        moved.setdefault(target, []).insert(0, surveys[index])
+
+    out = []
+    for index, survey in enumerate(surveys):
+        out.extend(moved.get(index, ()))
+        if index not in targets:
+            out.append(survey)
+    return out
+
+
+def _chunks(surveys, budget):
+    chunk, size = [], 0
+    for survey in surveys:
+        if chunk and size + survey.statements > budget:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(survey)
+        size += survey.statements
+    if chunk:
+        yield chunk
+
+
+def _parameters(arguments):
+    every = arguments.posonlyargs + arguments.args + arguments.kwonlyargs
+    every += [arg for arg in (arguments.vararg, arguments.kwarg) if arg is not None]
+    return {arg.arg for arg in every}
+
+
+class Splitter(object):
+    """Splits every function over ``max_statements``, innermost first."""
+
+    def __init__(self, max_statements=DEFAULT_MAX_STATEMENTS):
+        self.max_statements = max_statements
+        self.functions = 0
+        self.parts = 0
+
+    def __str__(self):
+        return f"split: {self.functions} functions into {self.parts} parts"
+
+    def visit(self, tree):
+        functions = [node for node in ast.walk(tree) if type(node) in (ast.FunctionDef, ast.AsyncFunctionDef)]
+        # ``walk`` lists a function before the ones in it.
+        for node in reversed(functions):
+            if _statements(node) > self.max_statements:
+                self.split(node)
+        return tree
+
+    def split(self, node):
+        body = node.body
+        head = []
+        if body and type(body[0]) is ast.Expr and type(body[0].value) is ast.Constant \
+                and type(body[0].value.value) is str:
+            head.append(body.pop(0))
+        surveys = [_Survey(statement) for statement in body]
+        if any(survey.whole for survey in surveys):
+            node.body = head + body
+            return
+        declared = [declaration for survey in surveys for declaration in survey.declarations]
+        head.extend(survey.statement for survey in surveys if survey.statement in declared)
+        surveys = [survey for survey in surveys if survey.statement not in declared]
+        outer = {name for declaration in declared for name in declaration.names}
+        parameters = _parameters(node.args)
+        is_async = type(node) is ast.AsyncFunctionDef
+
+        chunks = list(_chunks(_sink(surveys), self.max_statements))
+        # A name no other part mentions, even in a nested function, can be
+        # a local of its part; only the rest is shared.
+        seen, shared = set(), set(parameters)
+        for chunk in chunks:
+            names = set().union(*(survey.names for survey in chunk))
+            shared |= seen & names
+            seen |= names
+        shared -= outer
+
+        out, prebound = [], set()
+        for index, chunk in enumerate(chunks):
+            name = PART.format(index)
+            bound = set().union(*(survey.bindings for survey in chunk)) & shared
+            prebound |= bound
+            returns = [node for survey in chunk for node in survey.returns]
+            for statement in returns:
+                value = statement.value if statement.value is not None else ast.Constant(value=None)
+                statement.value = ast.Tuple(elts=[value], ctx=ast.Load())
+            declarations = [type(declaration)(names=list(declaration.names)) for declaration in declared]
+            if bound:
+                declarations.append(ast.Nonlocal(names=sorted(bound)))
+            helper = ast.parse(f"{'async ' if is_async else ''}def {name}(): pass").body[0]
+            helper.body = declarations + [survey.statement for survey in chunk]
+            call = ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=[], keywords=[])
+            if is_async:
+                call = ast.Await(value=call)
+            out.append(helper)
+            if returns:
+                result = ast.Name(id=RESULT, ctx=ast.Load())
+                out.append(ast.Assign(targets=[ast.Name(id=RESULT, ctx=ast.Store())], value=call))
+                out.append(ast.If(
+                    test=ast.Compare(left=result, ops=[ast.IsNot()], comparators=[ast.Constant(value=None)]),
+                    body=[ast.Return(value=ast.Subscript(value=result, slice=ast.Constant(value=0), ctx=ast.Load()))],
+                    orelse=[],
+                ))
+            else:
+                out.append(ast.Expr(value=call))
+            self.parts += 1
+
+        prebound -= parameters
+        if prebound:
+            # Never runs; it only makes the names locals the helpers can
+            # declare nonlocal.
+            head.append(ast.If(
+                test=ast.Constant(value=False),
+                body=[ast.Assign(targets=[ast.Name(id=name, ctx=ast.Store())], value=ast.Constant(value=None))
+                      for name in sorted(prebound)],
+                orelse=[],
+            ))
+        node.body = head + out
+        self.functions += 1
+
+
+def split(module, max_statements=DEFAULT_MAX_STATEMENTS):
+    """Split the oversized functions of ``module`` in place; returns the splitter."""
+    splitter = Splitter(max_statements)
+    splitter.visit(module)
+    ast.fix_missing_locations(module)
+    return splitter
+
+
+def split_source(source, max_statements=DEFAULT_MAX_STATEMENTS):
+    """``(text, splitter)`` for the Python ``source``; the text is untouched
+    if it does not parse or nothing needed splitting."""
+    splitter = Splitter(max_statements)
+    try:
+        module = ast.parse(source)
+    except SyntaxError:
+        return source, splitter
+    splitter.visit(module)
+    if not splitter.functions:
+        return source, splitter
+    ast.fix_missing_locations(module)
+    return ast.unparse(module), splitter
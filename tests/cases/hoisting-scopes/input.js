@@ -0,0 +1,19 @@
+function outer(items) {
+    for (var i = 0; i < items.length; i++) {
+        items[i].then(function (x) { return x + i; });
+    }
+    if (items) {
+        var first = items.map(function (x) { return x; });
+        var second = items.map(function (x) { return x * 2; });
+    } else {
+        items = [].map(function (y) { return y; });
+    }
+    function inner(o) {
+        var {a, b} = o;
+        if (a) {
+            return b.map(function (z) { return z - a; });
+        }
+        return a;
+    }
+    return inner;
+}
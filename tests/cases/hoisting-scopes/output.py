@@ -0,0 +1,49 @@
+def outer(items):
+    def _anonymous_func_c732f1d2b3dd(this, arguments, x):
+
+        return x + i
+
+    
+
+    i = 0
+    while i < items.length:
+        
+        items[i].then(_anonymous_func_c732f1d2b3dd)
+        i+=1
+    if items:
+        def _anonymous_func_79a1ce1ec069(this, arguments, x):
+
+            return x
+        def _anonymous_func_5a08c8b564d6(this, arguments, x):
+
+            return x * 2
+
+        
+
+        first = items.map(_anonymous_func_79a1ce1ec069)
+        
+
+        second = items.map(_anonymous_func_5a08c8b564d6)
+    else:
+        def _anonymous_func_46cf1675c7a5(this, arguments, y):
+
+            return y
+
+        items = Js([]).map(_anonymous_func_46cf1675c7a5)
+    def inner(o):
+        _temp_ab7d87d200ee = o
+        a = _temp_ab7d87d200ee.a
+        b = _temp_ab7d87d200ee.b
+        del _temp_ab7d87d200ee
+
+        
+
+        
+        if a:
+            def _anonymous_func_84a4b39e9f66(this, arguments, z):
+
+                return z - a
+
+            return b.map(_anonymous_func_84a4b39e9f66)
+        return a
+    return inner
@@ -0,0 +1,25 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+import bench
+
+CASE = pathlib.Path(__file__).parent / "cases" / "class-with-method-and-constructor" / "input.js"
+
+
+def test_bench_file_has_what_the_report_prints(capsys):
+    result = bench.bench_file(str(CASE), repeat=1)
+    assert set(result) == {"file", "bytes", "parse", "compact", "tree_mem", "compact_mem", "visit",
+                           "compact_visit", "nodes"}
+    assert result["nodes"] > 0 and result["visit"] > 0
+    bench.report(result)
+    assert "visit rate" in capsys.readouterr().out
+
+
+def test_bench_nesting_reports_each_depth(capsys):
+    for kind in bench.NESTED:
+        results = bench.bench_nesting(kind, depths=(100, 200), repeat=1)
+        assert [depth for depth, _ in results] == [100, 200]
+        bench.report_nesting(kind, results)
+    out = capsys.readouterr().out
+    assert out.count("levels") == 2 * len(bench.NESTED)
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import pathlib
+import sys
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+import fastparser
+from cache import SUFFIX, ASTCache
+from frontend import backend_digest, parse
+
+CODE = "var a = [1, 'two', /3/g];\nfunction f(x) { return x + a.length; }\n"
+
+
+def entries(directory):
+    return sorted(name for name in os.listdir(directory) if name != ".lock")
+
+
+def test_round_trip(tmp_path):
+    cache = ASTCache(tmp_path)
+    tree = parse(CODE, {"range": True}, cache=cache)
+    assert cache.misses == 1 and len(entries(tmp_path)) == 1
+    again = parse(CODE, {"range": True}, cache=cache)
+    assert cache.hits == 1 and again is not tree
+    assert again.toDict() == tree.toDict()
+
+
+def test_entries_are_replaced_atomically(tmp_path, monkeypatch):
+    cache = ASTCache(tmp_path)
+    key = cache.key(CODE)
+    cache.put(key, parse(CODE, cache=False))
+    cache.put(key, parse(CODE, cache=False))
+    assert entries(tmp_path) == [key + SUFFIX]
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        cache.put(key, parse("var b;", cache=False))
+    monkeypatch.undo()
+    # The failed write left no temporary file and the old entry intact.
+    assert entries(tmp_path) == [key + SUFFIX]
+    assert cache.get(key).toDict() == parse(CODE, cache=False).toDict()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ASTCache(tmp_path)
+    keys = [cache.key(f"var v{i};") for i in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, parse(f"var v{age};", cache=False))
+        os.utime(cache.path(key), (1000 + age, 1000 + age))
+    size = os.path.getsize(cache.path(keys[0]))
+    cache.get(keys[0])  # now the most recently used
+    cache.max_bytes = 3 * size + size // 2
+    cache.put(cache.key("var w;"), parse("var w;", cache=False))
+    assert not os.path.exists(cache.path(keys[1]))
+    assert os.path.exists(cache.path(keys[0])) and os.path.exists(cache.path(keys[2]))
+    assert cache.size() <= cache.max_bytes
+
+
+def test_key_changes_with_backend_options_and_parser_source(tmp_path):
+    cache = ASTCache(tmp_path)
+    parse(CODE, {"range": True}, backend="fast", cache=cache)
+    parse(CODE, {"range": True}, backend="esprima", cache=cache)
+    parse(CODE, {"loc": True}, backend="fast", cache=cache)
+    parse(CODE, {"range": True}, backend="fast", cache=cache)
+    assert (cache.misses, cache.hits) == (3, 1)
+
+    with open(fastparser.__file__, "rb") as f:
+        assert backend_digest("fast") == hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    assert cache.key(CODE, None, "fast", backend_digest("fast")) != cache.key(CODE, None, "fast", "edited")
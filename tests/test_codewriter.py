@@ -0,0 +1,64 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from codewriter import INLINE_LIMIT, CodeWriter, _hash, digest, render
+from main import JsVisitor
+from frontend import parse
+
+
+def test_write_and_join():
+    code = CodeWriter("f(")
+    assert code.join(", ", ["a", CodeWriter("b"), 3]).write(")") is code
+    assert code.getvalue() == str(code) == "f(a, b, 3)"
+    assert CodeWriter().join(", ", []).getvalue() == ""
+    assert f"[{code:>12}]" == "[  f(a, b, 3)]"
+
+
+def test_value_inlines_short_text_only():
+    assert CodeWriter("a", ".", "b").value() == "a.b"
+    long = CodeWriter("x" * INLINE_LIMIT, "y")
+    assert long.value() is long and long.parts == ["x" * INLINE_LIMIT + "y"]
+    nested = CodeWriter("a", CodeWriter("b"))
+    assert nested.value() is nested
+
+
+def test_indented_blocks():
+    body = CodeWriter()
+    for n, line in enumerate(["x = 1", CodeWriter("if x:\n", "        ", "y = 2")]):
+        body.write("\n" if n else "", "    ", line)
+    code = CodeWriter("def f():\n", body)
+    assert render(code) == "def f():\n    x = 1\n    if x:\n        y = 2"
+    assert render(["a", [code], 1]) == ["a", [render(code)], 1]
+
+
+def test_visitor_indentation():
+    tree = parse("function f(a) { if (a) { while (a) { a--; } } else { return 1; } }", {"tolerant": True})
+    lines = JsVisitor().visit(tree)[0].split("\n")
+    indents = [len(line) - len(line.lstrip(" ")) for line in lines if line.strip()]
+    assert indents == [0, 4, 8, 12, 4, 8]
+
+
+def test_digest_depends_on_the_text_only():
+    code = CodeWriter("a", CodeWriter("b", 1))
+    assert code.digest() == CodeWriter("ab", "1").digest() == digest("ab1") == _hash("ab1")
+    assert code.digest() != CodeWriter("a", "b", "2").digest()
+
+
+def test_same_text_gets_the_same_name_however_assembled():
+    text = "(this, arguments):\n    return [1, 2]"
+    pieces = CodeWriter("(this, ", CodeWriter("arguments"), "):\n", "    return ", CodeWriter("[1, ", 2, "]"))
+    assert str(pieces) == text
+    assert JsVisitor().anonymousName(pieces) == JsVisitor().anonymousName(text)
+
+
+def test_deep_nesting_renders_without_recursion():
+    depth = sys.getrecursionlimit() * 10
+    code = inner = CodeWriter()
+    for _ in range(depth):
+        child = CodeWriter("(")
+        inner.write(child, ")")
+        inner = child
+    text = render(code)
+    assert text == "(" * depth + ")" * depth
+    assert len(code.digest()) == 32
@@ -0,0 +1,22 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from compact import CompactNode, compact
+from frontend import parse
+from main import JsVisitor
+
+CASES = pathlib.Path(__file__).parent / "cases"
+
+
+@pytest.mark.parametrize("options", [{"comment": True}, {"comment": True, "range": True, "loc": True}])
+def test_compact_trees_transpile_identically(options):
+    for path in sorted(CASES.glob("*/input.js")):
+        code = path.read_text()
+        # Visiting annotates the tree, so each side gets its own parse.
+        expected = JsVisitor().visit(parse(code, options, backend="esprima", cache=False))
+        tree = compact(parse(code, options, backend="esprima", cache=False))
+        assert isinstance(tree, CompactNode)
+        assert JsVisitor().visit(tree) == expected, path.parent.name
@@ -0,0 +1,57 @@
+import pathlib
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from main import JsVisitor
+from frontend import parse
+from parallel import transpile_concurrently, transpile_serial
+
+CASES = pathlib.Path(__file__).parent / "cases"
+
+
+def load_sources():
+    sources = [path.read_text() for path in sorted(CASES.glob("*/input.js"))]
+    # Callbacks in callbacks exercise the hoisting scopes and the naming.
+    sources.append("".join(
+        f"on{i}(function (a) {{ if (a) {{ b(function () {{ return {i}; }}); }} var {{x, y}} = a; }});\n"
+        for i in range(200)
+    ))
+    return sources
+
+
+def test_visitors_do_not_share_state():
+    sources = load_sources()
+    first = "\n".join(JsVisitor().visit(parse(sources[-1], {"comment": True}, cache=False)))
+    for code in sources:
+        JsVisitor().visit(parse(code, {"comment": True}, cache=False))
+    again = "\n".join(JsVisitor().visit(parse(sources[-1], {"comment": True}, cache=False)))
+    assert first == again
+
+
+def test_transpile_concurrently_matches_serial():
+    sources = load_sources()
+    expected = [transpile_serial(code, cache=False) for code in sources]
+
+    rng = random.Random(0)
+    order = [rng.randrange(len(sources)) for _ in range(20 * len(sources))]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            outputs = transpile_concurrently([sources[i] for i in order], executor=executor)
+    finally:
+        sys.setswitchinterval(interval)
+
+    for index, output in zip(order, outputs):
+        assert output == expected[index]
+
+
+def test_transpile_concurrently_raises_parse_errors():
+    try:
+        transpile_concurrently(["var a = 1;", "var = ;"], workers=2)
+    except Exception as e:
+        assert "Unexpected" in str(e)
+    else:
+        raise AssertionError("expected a parse error")
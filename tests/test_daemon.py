@@ -0,0 +1,51 @@
+import pathlib
+import subprocess
+import sys
+import time
+
+import pytest
+
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+from client import Client, DaemonError
+from parallel import transpile_serial
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    path = str(tmp_path / "daemon.sock")
+    process = subprocess.Popen([sys.executable, str(ROOT / "daemon.py"), "--socket", path, "-j", "1"],
+                               stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            client = Client(path)
+            break
+        except (FileNotFoundError, ConnectionRefusedError):
+            assert process.poll() is None and time.monotonic() < deadline
+            time.sleep(0.05)
+    try:
+        yield client
+    finally:
+        client.close()
+        process.terminate()
+        process.wait(10)
+
+
+def test_transpiles_like_the_cli(daemon):
+    source = "var a = !0;\nfunction f(x) { return x + 'a' + 'b'; }\n"
+    assert daemon.transpile(source) == transpile_serial(source)
+    response = daemon.request({"op": "transpile", "source": source, "level": 1})
+    assert not response["cached"] and set(response["passes"]) == {"fold", "peephole"}
+    assert "a = True" in response["python"]
+    assert daemon.request({"op": "transpile", "source": source, "level": 1})["cached"]
+
+
+def test_errors_keep_the_connection(daemon):
+    with pytest.raises(DaemonError, match="Unexpected token"):
+        daemon.transpile("var = ;")
+    with pytest.raises(DaemonError, match="unknown op"):
+        daemon.request({"op": "nope"})
+    stats = daemon.request({"op": "stats"})
+    assert stats["failed"] == 2 and stats["requests"] == 3
+    daemon.request({"op": "shutdown"})
@@ -0,0 +1,75 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from depgraph import Graph, interface, resolve
+from frontend import parse
+from project import build
+
+MODULE = """
+import a, {b as c, d} from "./m.js";
+import * as ns from "../n";
+export var x = 1, {y, z: [w]} = q;
+export function f() {}
+export {c as e};
+export {g} from "./o";
+export * from "./p";
+export default 3;
+"""
+
+
+def test_interface():
+    imports, exports = interface(parse(MODULE, {"tolerant": True}, cache=False))
+    assert imports == [("./m.js", ["default", "b", "d"]), ("../n", ["*"]), ("./o", ["g"]), ("./p", ["*"])]
+    assert exports == ["*./p", "default", "e", "f", "g", "w", "x", "y"]
+
+
+def test_resolve():
+    sources = {"lib/m.js", "lib/p/index.js", "n.js"}
+    assert resolve("lib/a.js", "./m", sources) == "lib/m.js"
+    assert resolve("lib/a.js", "./p", sources) == "lib/p/index.js"
+    assert resolve("lib/a.js", "../n.js", sources) == "n.js"
+    assert resolve("lib/a.js", "lodash", sources) is None
+
+
+def test_rebuilds_changed_files_and_affected_dependents(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    (src / "m.js").write_text("export var a = 1, b = 2;\n")
+    (src / "uses_a.js").write_text('import {a} from "./m.js";\n')
+    (src / "uses_b.js").write_text('import {b} from "./m.js";\n')
+    (src / "again.js").write_text('export {b} from "./m.js";\n')
+    (src / "other.js").write_text("var o = 1;\n")
+
+    assert len(build(str(src), str(out)).built) == 5
+    assert len(build(str(src), str(out)).built) == 0
+
+    (src / "m.js").write_text("export var a = 1, b = 3;\n")
+    assert sorted(pathlib.Path(p).name for p in build(str(src), str(out)).built) == ["m.js"]
+
+    (src / "m.js").write_text("export var a = 1;\n")
+    result = build(str(src), str(out))
+    assert sorted(pathlib.Path(p).name for p in result.built) == ["again.js", "m.js", "uses_b.js"]
+    assert result.dependents == 2
+
+    (src / "other.js").unlink()
+    result = build(str(src), str(out))
+    assert len(result.built) == 0 and not (out / "other.py").exists()
+    assert len(build(str(src), str(out), incremental=False).built) == 4
+
+
+def record(exports, imports=()):
+    return {"exports": exports, "imports": [list(entry) for entry in imports]}
+
+
+def test_changes_propagate_through_star_exports():
+    sources = ["m.js", "star.js", "via_star.js", "via_m.js"]
+    files = {
+        "star.js": record(["*./m.js"], [("./m.js", "m.js", ["*"])]),
+        "via_star.js": record([], [("./star.js", "star.js", ["b"])]),
+        "via_m.js": record([], [("./m.js", "m.js", ["a"])]),
+    }
+    old = Graph(files=dict(files, **{"m.js": record(["a", "b"])}))
+    new = Graph(files=dict(files, **{"m.js": record(["a"])}))
+    assert old.exports("star.js") == {"a", "b"} and new.exports("star.js") == {"a"}
+    assert new.stale_dependents(old, {"m.js"}, sources) == {"star.js", "via_star.js"}
@@ -0,0 +1,81 @@
+import itertools
+import pathlib
+import sys
+
+import esprima
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+import fastparser
+
+CASES = pathlib.Path(__file__).parent / "cases"
+OPTIONS = ("comment", "range", "loc", "tokens")
+
+# What the regex scanner handles itself, and what it hands to esprima's.
+LEXICAL = r"""
+<!-- html comment
+x = 1
+y = 2 <!-- mid-line html comment
+z = 3
+--> at the start of one
+/* block
+   comment */ --> after a multi-line comment
+var s = ["\x41B\u{43}\n\t\v", '\'\"', "\0", "a\
+b", `t${1 + `n${2}`}A`, String.raw`\d`];
+var n = [0, 1.5, .5, 5., 1e3, 2E-3, 0x1F, 0o17, 0b101, 017, 08];
+var r = [/[/]\//g, /a\/b/i, a / b / c, (1) / 2, x++ / 2];
+var abc = $ + _ + ƒ + \u{62};
+label: for (;;) { if (a) break label; else continue label; }
+async function g() { await h(i); }
+function* k() { yield* j; }
+"""
+
+
+def bundle():
+    """A webpack-style bundle of every case."""
+    modules = []
+    for index, path in enumerate(sorted(CASES.glob("*/input.js"))):
+        code = path.read_text().replace("export ", "").replace("import ", "// import ")
+        modules.append(f"/* {path.parent.name} */ function (module, exports, __require__) {{\n{code}\n}}")
+    return "(function (modules) {\n  return modules;\n})([\n" + ",\n".join(modules) + "\n]);\n"
+
+
+def sources():
+    for path in sorted(CASES.glob("*/input.js")):
+        yield path.parent.name, path.read_text()
+    yield "bundle", bundle()
+    yield "lexical", LEXICAL
+
+
+def parse(parse, code, options):
+    try:
+        return parse(code, options).toDict()
+    except esprima.Error as e:
+        return f"{type(e).__name__}: {e}"
+
+
+@pytest.mark.parametrize("name, code", list(sources()))
+def test_fast_backend_builds_esprima_trees(name, code):
+    for flags in itertools.product((False, True), repeat=len(OPTIONS)):
+        options = dict(zip(OPTIONS, flags), tolerant=True)
+        expected = parse(esprima.parse, code, options)
+        assert isinstance(expected, dict), expected
+        assert parse(fastparser.parse, code, options) == expected, (name, options)
+
+
+@pytest.mark.parametrize("code", [
+    "<!-- html\n--> also",
+    "var a = 1; <!-- html\n--> end",
+    "<!-- a\n<!-- b\n--> c",
+    "a <!-- b\r\n\n--> c",
+    "x = 1 /*\n*/ --> c\ny",
+    "var = ;",
+    "'unterminated",
+    "/* unterminated",
+    "`${",
+    "a = 09.5",
+    "'\\u{110000}'",
+])
+def test_fast_backend_fails_like_esprima(code):
+    for options in ({}, {"tolerant": True}, {"sourceType": "module"}):
+        assert parse(fastparser.parse, code, options) == parse(esprima.parse, code, options), options
@@ -0,0 +1,70 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from frontend import parse
+from incremental import DEFAULT_OPTIONS, IncrementalTranspiler, transpile_incremental
+from main import JsVisitor
+
+SOURCE = """var items = [1, 2, 3];
+function total(values) {
+    var sum = 0;
+    values.forEach(function (value) { sum += value; });
+    return sum;
+}
+function scale(values, factor) {
+    return values.map((value) => value * factor);
+}
+class Box { constructor(x) { this.x = x; } get() { return this.x; } }
+console.log(total(scale(items, 2)));
+"""
+
+EDITS = {
+    "inside a function": ("var sum = 0;", "var sum = 10;"),
+    "across a function boundary": ("return sum;\n}\nfunction scale(values, factor) {",
+                                   "return sum * 2;\n}\nfunction rescale(values, factor) {"),
+    "top-level structure": ("class Box", "if (items) {\n}\n/* opened"),
+}
+
+
+def full(code):
+    return "\n".join(JsVisitor().visit(parse(code, DEFAULT_OPTIONS, cache=False)))
+
+
+def test_edits_match_a_full_transpile():
+    for name, (old, new) in EDITS.items():
+        transpiler = IncrementalTranspiler()
+        assert transpiler.transpile(SOURCE) == full(SOURCE)
+        code = SOURCE.replace(old, new)
+        if name == "top-level structure":
+            code += "*/ var after = 1;\n"
+        assert transpiler.transpile(code) == full(code), name
+        if name == "inside a function":
+            assert (transpiler.reused, transpiler.reparsed) == (2, 3)
+
+
+def test_state_survives_between_runs(tmp_path):
+    state = str(tmp_path / "state.json")
+    assert transpile_incremental(SOURCE, state) == full(SOURCE)
+    code = SOURCE.replace("* factor", "* factor + 1")
+    transpiler = IncrementalTranspiler()
+    transpiler.load(state)
+    assert transpiler.transpile(code) == full(code) and transpiler.reused
+    assert transpile_incremental(code, state) == full(code)
+
+
+def test_directive_prologue_is_dropped():
+    code = '"use strict";\n' + SOURCE
+    transpiler = IncrementalTranspiler()
+    assert transpiler.transpile(code) == full(code)
+    assert "use strict" not in transpiler.output()
+    for old, new in (EDITS["inside a function"], ('"use strict";', '"use strict"; var early = 0;')):
+        edited = code.replace(old, new)
+        assert transpiler.transpile(edited) == full(edited)
+        code = edited
+    # A string statement after the prologue is kept, even when a re-parsed
+    # slice starts with it.
+    code = SOURCE + '"use strict";\nvar z = 1;\n'
+    transpiler.transpile(code)
+    edited = code.replace("z = 1", "z = 2")
+    assert transpiler.transpile(edited) == full(edited) and transpiler.reused
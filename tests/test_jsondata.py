@@ -0,0 +1,49 @@
+import ast
+import json
+import pathlib
+import sys
+import tempfile
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+import jsondata
+from main import JsVisitor
+from frontend import parse
+from pyast import transpile_ast
+
+PROGRAM = """
+import data from './data.json';
+import * as all from './data.json';
+import {name} from './data.json';
+"""
+
+
+def run(python, directory):
+    namespace = {"__file__": str(pathlib.Path(directory) / "module.py")}
+    exec(python, namespace)
+    return namespace
+
+
+def test_json_import_decodes_on_first_use():
+    with tempfile.TemporaryDirectory() as directory:
+        path = pathlib.Path(directory) / "data.json"
+        path.write_text(json.dumps({"name": "x", "items": [1, 2]}))
+        python = "\n".join(JsVisitor().visit(parse(PROGRAM, {"tolerant": True}, cache=False)))
+        namespace = run(python, directory)
+        data = namespace["data"]
+        assert namespace["name"] == "x"
+        assert data.items == [1, 2] and data["name"] == "x" and "items" in data
+        assert data == namespace["all"]
+        assert jsondata.load(path) is data.value is namespace["all"].value
+
+
+def test_json_import_is_lazy():
+    with tempfile.TemporaryDirectory() as directory:
+        code = "import data from './missing.json';"
+        namespace = run("\n".join(JsVisitor().visit(parse(code, {"tolerant": True}, cache=False))), directory)
+        assert "not loaded" in repr(namespace["data"])
+
+
+def test_ast_backend_matches():
+    module = transpile_ast(PROGRAM, {"tolerant": True})
+    expected = "\n".join(JsVisitor().visit(parse(PROGRAM, {"tolerant": True}, cache=False)))
+    assert ast.dump(module) == ast.dump(ast.parse(expected))
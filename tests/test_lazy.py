@@ -0,0 +1,64 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+import lazy
+from main import JsVisitor
+from frontend import parse
+from lazy import LazyFunction, transpile_lazy
+
+PROGRAM = """
+function add(a, b) { return a + b; }
+function scale(xs, k = 3) {
+    function twice(x) { return x * k * 2; }
+    return xs.map(twice);
+}
+function unused() { return missing_name; }
+function tagged() { return tagged.tag; }
+tagged.tag = 'x';
+var early = add;
+var total = add(1, 2) + add(3, 4);
+var tag = tagged();
+"""
+
+
+class Js(list):
+    def map(self, f):
+        return [f(x) for x in self]
+
+
+def run(python):
+    namespace = {"Js": Js}
+    exec(python, namespace)
+    return namespace
+
+
+def test_stubs_return_what_eager_functions_do():
+    eager = run("\n".join(JsVisitor().visit(parse(PROGRAM, {"tolerant": True}, cache=False))))
+    lazily = run(transpile_lazy(PROGRAM))
+    assert lazily["total"] == eager["total"] == 10
+    assert lazily["scale"](Js([1, 2])) == eager["scale"](Js([1, 2])) == [6, 12]
+    # Taken before the first call, so still the stub.
+    assert lazily["early"](5, 6) == 11
+    assert lazily["tag"] == eager["tag"] == "x"
+    assert lazily["tagged"].tag == "x" and not isinstance(lazily["tagged"], LazyFunction)
+
+
+def test_bodies_are_transpiled_on_first_call():
+    # Renamed so the sources differ from those compiled by the test above.
+    code = PROGRAM.replace("scale", "scale2").replace("unused", "unused2")
+    namespace = run(transpile_lazy(code))
+    stub = namespace["scale2"]
+    assert isinstance(stub, LazyFunction) and stub.function is None
+    assert stub.source not in lazy._codes
+    assert not any("unused2" in source for source in lazy._codes)
+    assert stub(Js([1])) == [6]
+    assert stub.source in lazy._codes
+    function = namespace["scale2"]
+    assert function is stub.function and not isinstance(function, LazyFunction)
+    assert stub(Js([2])) == [12] and stub.function is function
+    # Properties set through a stale reference reach the real function.
+    stub.unit = "cm"
+    assert function.unit == stub.unit == "cm"
+    # Never called, never transpiled.
+    assert isinstance(namespace["unused2"], LazyFunction) and namespace["unused2"].function is None
@@ -0,0 +1,36 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from main import JsVisitor
+from frontend import parse
+
+PROGRAM = """
+var table = [1, -2, +3, 1.5, "a'b", null, true, , [4, [5]], {a: 1, "b c": [-0.5], 3: {e: 2}}];
+var mixed = [1, f(2), [3], {x: [4]}, {y: g}];
+var keys = {[k]: 1, global: 2, Error: 4, get z() { return 3; }};
+function f() { return {a: [1, 2], b: this}; }
+"""
+
+
+class HandlerVisitor(JsVisitor):
+    @staticmethod
+    def literalText(node):
+        return None
+
+
+def transpile(visitor):
+    return visitor.visit(parse(PROGRAM, {"tolerant": True}, cache=False))
+
+
+def test_literal_text_matches_handlers():
+    assert transpile(JsVisitor()) == transpile(HandlerVisitor())
+
+
+def test_only_literals_take_the_fast_path():
+    tree = parse(PROGRAM, {"tolerant": True}, cache=False)
+    table, mixed, keys = (statement.declarations[0].init for statement in tree.body[:3])
+    assert JsVisitor.literalText(table) is not None
+    assert JsVisitor.literalText(mixed) is None
+    assert JsVisitor.literalText(mixed.elements[2]) == "Js([3])"
+    assert JsVisitor.literalText(keys) is None
@@ -0,0 +1,56 @@
+import pathlib
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+from main import JsVisitor
+from frontend import parse
+from memo import OutputMemo
+
+HELPER = "function _classCallCheck(a, C) { if (!(a instanceof C)) { throw new TypeError('no'); } }\n"
+BUNDLE = "".join(
+    f"m[{i}] = function (module) {{\n{HELPER}module.exports = function () {{ return {i}; }};\n}};\n"
+    for i in range(5)
+) + "class A { f(x) { return function () { return this.x; }; } }\n"
+
+
+def transpile(memo=None, ranges=False):
+    tree = parse(BUNDLE, {"tolerant": True, "range": ranges}, cache=False)
+    return JsVisitor(memo, BUNDLE if ranges else None).visit(tree)
+
+
+def test_memo_does_not_change_output():
+    expected = transpile()
+    for ranges in (False, True):
+        memo = OutputMemo()
+        assert transpile(memo, ranges) == expected
+        # The helper, once per module after the first.
+        assert memo.hits == 4
+        assert memo.misses == memo.stats()["entries"]
+
+
+def test_memo_shared_between_visitors():
+    memo = OutputMemo()
+    first = transpile(memo, True)
+    hits = memo.hits
+    assert transpile(memo, True) == first
+    assert memo.hits > hits
+
+
+def test_oldest_entries_dropped():
+    memo = OutputMemo(max_entries=2)
+    for key in "abc":
+        memo.put(key, key)
+    assert list(memo.entries) == ["b", "c"]
+
+
+def test_memo_flag_does_not_change_cli_output(tmp_path):
+    # super() has no handler, so its node is printed into the output.
+    path = tmp_path / "bundle.js"
+    path.write_text(BUNDLE + "class B extends A { constructor() { super(); } }\n")
+    outputs = [subprocess.run([sys.executable, str(ROOT / "main.py"), *flags, str(path)], check=True,
+                              capture_output=True, text=True).stdout
+               for flags in ((), ("--memo",))]
+    assert 'type: "Super"' in outputs[0]
+    assert outputs[1] == outputs[0]
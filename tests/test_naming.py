@@ -0,0 +1,31 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from main import JsVisitor
+from frontend import parse
+from naming import Names
+
+PROGRAM = """
+a.on("x", function (e) { return e.x; });
+b.then(function () { var {p, q} = c; return [1].map(function (v) { return v + p; }); });
+"""
+
+
+def transpile(code):
+    return JsVisitor().visit(parse(code, {"comment": True}, cache=False))
+
+
+def test_names_do_not_depend_on_what_comes_before():
+    lines = transpile(PROGRAM)
+    moved = transpile("z(function () { return 0; });\n" + PROGRAM)
+    assert set(lines) <= set(moved)
+
+
+def test_colliding_names_are_lengthened():
+    names = Names()
+    first = names.name("_f_", "ab" * 16)
+    second = names.name("_f_", "ab" * 6 + "cd" * 10)
+    assert first == "_f_" + "ab" * 6
+    assert second == "_f_" + "ab" * 6 + "cd" * 6
+    assert names.name("_f_", "ab" * 16) == first
@@ -0,0 +1,26 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from frontend import parse
+from main import JsVisitor
+
+# Chains esprima parses without recursing, so only the visitor could run
+# out of stack on them.
+CHAINS = {
+    "binary": (lambda n: "x = " + " + ".join(f"a{i}" for i in range(n)) + ";", " + "),
+    "logical": (lambda n: "x = " + " && ".join(f"a{i}" for i in range(n)) + ";", " and "),
+    "members": (lambda n: "x = a" + ".b" * n + ";", ".b"),
+    "calls": (lambda n: "x = f" + "()" * n + ";", "()"),
+}
+
+
+@pytest.mark.parametrize("kind", sorted(CHAINS))
+def test_nesting_deeper_than_the_recursion_limit(kind):
+    make, operator = CHAINS[kind]
+    depth = sys.getrecursionlimit() * 5
+    tree = parse(make(depth), {"tolerant": True}, cache=False)
+    python = "\n".join(JsVisitor().visit(tree))
+    assert python.count(operator) == depth - (kind in ("binary", "logical"))
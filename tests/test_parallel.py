@@ -0,0 +1,30 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from parallel import split_chunks, transpile_parallel, transpile_serial
+
+
+def functions(name):
+    return "".join(
+        f"function {name}{i}(a, b) {{\n    return [a, b].map(function (x) {{ return x * {i}; }});\n}}\n"
+        f"var v{i} = {name}{i}(1, 2);\n"
+        for i in range(40)
+    )
+
+
+FUNCTIONS = functions("f")
+
+
+def test_parallel_output_matches_serial():
+    for code in (FUNCTIONS, '"use strict";\n' + FUNCTIONS):
+        assert len(split_chunks(code, 500)) > 4
+        assert transpile_parallel(code, workers=2, chunk_size=500) == transpile_serial(code, cache=False)
+
+
+def test_falls_back_when_a_cut_lands_inside_a_statement():
+    # The line after "x;" looks like a statement boundary but is inside the template.
+    code = FUNCTIONS + "var t = `\nx;\nnot_code(\n`;\n" + functions("g")
+    spans = split_chunks(code, 10)
+    assert any(code[start:end].count("`") % 2 for start, end in spans)
+    assert transpile_parallel(code, workers=2, chunk_size=10) == transpile_serial(code, cache=False)
@@ -0,0 +1,79 @@
+import ast
+import pathlib
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+from main import JsVisitor
+from frontend import parse
+from fold import fold
+from passes import PassManager
+
+PROGRAM = """
+var flags = [!0, !1, !!"", !x];
+var text = "a" + "b" + "c" + d;
+function pick(o) { var {a} = o; return a; }
+"""
+
+
+def transpile(code, passes):
+    tree = passes.run_js(parse(code, {"tolerant": True}, cache=False))
+    return passes.run_source("\n".join(JsVisitor().visit(tree)))
+
+
+def test_fold():
+    tree = parse(PROGRAM, {"tolerant": True}, cache=False)
+    assert fold(tree) == 6
+    text = "\n".join(JsVisitor().visit(tree))
+    assert "Js([True, False, False, not x])" in text
+    assert "'abc' + d" in text
+
+
+def test_levels_select_passes():
+    assert [p.name for p in PassManager(0).passes] == []
+    assert [p.name for p in PassManager(1).passes] == ["fold", "peephole"]
+    assert [p.name for p in PassManager(2).passes] == ["fold", "peephole", "split"]
+    assert [p.name for p in PassManager(0, ["split"]).passes] == ["split"]
+
+
+def test_o0_output_is_unchanged():
+    passes = PassManager(0)
+    assert transpile(PROGRAM, passes) == "\n".join(JsVisitor().visit(parse(PROGRAM, {"tolerant": True}, cache=False)))
+    assert passes.report() == []
+
+
+def test_timings_report_every_pass():
+    passes = PassManager(2, options={"split": {"max_statements": 1}})
+    text = transpile(PROGRAM, passes)
+    ast.parse(text)
+    assert "__part0__" in text and "_temp_" not in text
+    assert [(t.name, t.stage) for t in passes.timings] == [("fold", "js"), ("peephole", "python"), ("split", "python")]
+    fold_timing = passes.timings[0]
+    assert fold_timing.nodes_after < fold_timing.nodes_before and fold_timing.detail == "6 folded"
+    assert all(t.seconds >= 0 for t in passes.timings)
+    assert passes.report()[2].startswith("split (python): ")
+
+
+def test_python_passes_skip_invalid_python():
+    passes = PassManager(1)
+    assert passes.run_source("if x\n") == "if x\n"
+    [line] = passes.report()
+    assert line.startswith("peephole (python): skipped (not valid Python: ")
+
+
+def test_cli_rejects_passes_a_mode_cannot_run(tmp_path):
+    path = tmp_path / "a.js"
+    path.write_text(PROGRAM)
+
+    def cli(*flags):
+        return subprocess.run([sys.executable, str(ROOT / "main.py"), *flags, str(path)], capture_output=True,
+                              text=True)
+
+    for flags in (("-O1", "--stream"), ("-O1", "--pipeline"), ("-O1", "--lazy"), ("-O2", "-j", "2"),
+                  ("-O1", "--incremental", str(tmp_path / "state")), ("--peephole", "--stream"),
+                  ("--memo", "--lazy"), ("--compact", "--ast")):
+        result = cli(*flags)
+        assert result.returncode == 2 and "work with" in result.stderr, flags
+    for flags in (("-O1",), ("-O1", "--ast"), ("--peephole", "--lazy"), ("--memo", "--compact")):
+        assert cli(*flags).returncode == 0, flags
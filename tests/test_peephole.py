@@ -0,0 +1,48 @@
+import ast
+import pathlib
+import sys
+from types import SimpleNamespace
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from main import JsVisitor
+from frontend import parse
+from peephole import optimize, optimize_source
+from pyast import compile_js, transpile_ast
+
+PROGRAM = """
+function pick(o) { var {a, b} = o; var {c} = o; return a + b + c; }
+function swap(a) { var {a, b} = a; return [a, b]; }
+var x = x;
+if (x) { } else { x = 1; }
+var r = [pick(p), swap(q)];
+"""
+
+
+def test_removes_temporaries_placeholders_and_self_assignments():
+    text = "\n".join(JsVisitor().visit(parse(PROGRAM, {"tolerant": True}, cache=False)))
+    out, report = optimize_source(text)
+    assert "x = x" not in out
+    assert out.count("_temp_") == 4
+    assert "a = o.a" in out and "c = o.c" in out
+    assert report.removed == {"self-assignments": 1, "temporaries": 4}
+    assert report.statements_before - report.statements_after == 5
+    assert report.bytes_after < report.bytes_before
+
+
+def namespace():
+    return {"Js": list, "x": 0, "p": SimpleNamespace(a=1, b=2, c=3), "q": SimpleNamespace(a=4, b=5)}
+
+
+def test_behaviour_is_unchanged():
+    expected = namespace()
+    exec(compile_js(PROGRAM), expected)
+    module, _ = optimize(transpile_ast(PROGRAM))
+    optimized = namespace()
+    exec(compile(module, "<js>", "exec"), optimized)
+    assert optimized["r"] == expected["r"] == [6, [4, 5]]
+    assert optimized["x"] == expected["x"] == 1
+
+
+def test_invalid_python_is_left_alone():
+    out, report = optimize_source("x = = 1")
+    assert out == "x = = 1" and report.skipped
@@ -0,0 +1,79 @@
+import collections
+import pathlib
+import sys
+import threading
+
+import esprima
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from frontend import parse
+from main import JsVisitor
+from pipeline import iter_statements, make_parser, stream_transpile, transpile_pipelined
+
+CASES = pathlib.Path(__file__).parent / "cases"
+OPTIONS = {"tolerant": True}
+
+
+def batch(code, backend):
+    """``(heads, bodies)`` of a whole-tree transpile."""
+    visitor = JsVisitor()
+    output = visitor.visit(parse(code, OPTIONS, backend=backend, cache=False))
+    return output[:len(visitor.heads)], output[len(visitor.heads):]
+
+
+def cases():
+    for path in sorted(CASES.glob("*/input.js")):
+        code = path.read_text()
+        yield code
+        yield '"use strict";\n' + code
+
+
+def same_as_batch(chunks, code, backend):
+    # Heads come before their own statement rather than all first.
+    heads, bodies = batch(code, backend)
+    head_set = set(heads)
+    assert collections.Counter(chunks) == collections.Counter(heads + bodies)
+    assert [chunk for chunk in chunks if chunk not in head_set] == bodies
+
+
+@pytest.mark.parametrize("backend", ["esprima", "fast"])
+def test_pipelined_output_matches_batch(backend):
+    for code in cases():
+        same_as_batch(list(transpile_pipelined(code, OPTIONS, backend, maxsize=2)), code, backend)
+
+
+def test_parse_errors_come_after_the_statements_before_them():
+    statements = iter_statements("var a = 1;\nvar b = 2;\nvar = ;\n")
+    assert [statement.type for statement in (next(statements), next(statements))] == ["VariableDeclaration"] * 2
+    with pytest.raises(esprima.Error):
+        next(statements)
+
+
+def test_closing_early_stops_the_parser():
+    statements = iter_statements("var a;\n" * 1000, maxsize=1)
+    next(statements)
+    statements.close()
+    assert not [thread for thread in threading.enumerate() if thread.name == "es62py-parser"]
+
+
+@pytest.mark.parametrize("backend", ["esprima", "fast"])
+def test_streamed_output_matches_batch(backend):
+    for code in cases():
+        written = []
+        count = stream_transpile(code, written.append, OPTIONS, backend)
+        text = "".join(written)
+        assert text == "".join(chunk + "\n" for chunk in transpile_pipelined(code, OPTIONS, backend))
+        assert count == len(batch(code, backend)[1])
+
+
+def test_statement_hook_drops_the_statements():
+    seen = []
+    parser = make_parser("var a = 1;\nfunction f() {}\n", OPTIONS, onStatement=seen.append, keepStatements=False)
+    assert parser.parseScript().body == []
+    assert [statement.type for statement in seen] == ["VariableDeclaration", "FunctionDeclaration"]
+
+    written = []
+    with pytest.raises(esprima.Error):
+        stream_transpile("var a = 1;\nvar = ;\n", written.append)
+    assert "".join(written) == "".join(chunk + "\n" for chunk in transpile_pipelined("var a = 1;\n"))
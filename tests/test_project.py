@@ -0,0 +1,82 @@
+import os
+import pathlib
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+from project import build, module_parts, plan
+
+SOURCES = {
+    "index.js": 'import b from "./lib/a-b.js";\nvar x = b;\n',
+    "lib/a-b.js": "var v = !0;\n",
+    "lib/a.js": "var q = 1;\n",
+    "lib/a/c.js": "var z = 2;\n",
+    "lib/@scope/d.e.js": "var w = 3;\n",
+    "lib/bad.js": "var = ;\n",
+    "node_modules/x/n.js": "var n = 1;\n",
+}
+
+
+def write_project(root):
+    for name, code in SOURCES.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(code)
+
+
+def test_outputs_mirror_the_import_mapping():
+    assert module_parts(os.path.join("lib", "a-b.js")) == ["lib", "a_b"]
+    assert module_parts(os.path.join("lib", "@scope", "d.e.js")) == ["lib", "__at__scope", "d", "e"]
+    targets, packages = plan("/src", ["/src/lib/a.js", "/src/lib/a/c.js", "/src/x.js"], "/out")
+    assert targets == {
+        "/src/lib/a.js": "/out/lib/a/__init__.py",
+        "/src/lib/a/c.js": "/out/lib/a/c.py",
+        "/src/x.js": "/out/x.py",
+    }
+    assert packages == ["/out", "/out/lib", "/out/lib/a"]
+
+
+def test_build(tmp_path):
+    write_project(tmp_path / "src")
+    result = build(str(tmp_path / "src"), str(tmp_path / "out"), workers=2, level=1)
+    out = tmp_path / "out"
+    assert sorted(str(path.relative_to(out)) for path in out.rglob("*.py")) == [
+        "__init__.py", "index.py", "lib/__at__scope/__init__.py", "lib/__at__scope/d/__init__.py",
+        "lib/__at__scope/d/e.py", "lib/__init__.py", "lib/a/__init__.py", "lib/a/c.py", "lib/a_b.py",
+    ]
+    assert (out / "lib" / "a_b.py").read_text() == "v = True\n"
+    assert (out / "lib" / "a" / "__init__.py").read_text() == "q = 1\n"
+    assert list(result.failed) == [str(tmp_path / "src" / "lib" / "bad.js")]
+    assert len(result.built) == 5 and set(result.passes) == {"fold", "peephole"}
+    assert not [path for path in out.rglob(".tmp-*")]
+
+
+def test_imported_json_is_copied_next_to_its_importers(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "pkg"
+    (src / "lib" / "@s").mkdir(parents=True)
+    (src / "lib" / "util.js").write_text('import data from "./data.json";\nvar n = data.count;\n')
+    (src / "lib" / "@s" / "v.js").write_text('import {count} from "../data.json";\n')
+    (src / "lib" / "data.json").write_text('{"count": 3}')
+    (src / "unused.json").write_text("{}")
+
+    def run():
+        script = "import pkg.lib.util as u, pkg.lib.__at__s.v as v; print(u.n, v.count)"
+        return subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=dict(os.environ, PYTHONPATH=str(ROOT)), check=True,
+                              capture_output=True, text=True).stdout
+
+    result = build(str(src), str(out))
+    assert result.copied == {str(src / "lib" / "data.json"): str(out / "lib" / "data.json")}
+    assert run() == "3 3\n"
+    assert not (out / "unused.json").exists()
+    assert not build(str(src), str(out)).copied
+
+    (src / "lib" / "data.json").write_text('{"count": 42}')
+    assert build(str(src), str(out)).copied and run() == "42 42\n"
+
+    (src / "lib" / "@s" / "v.js").write_text("var v = 1;\n")
+    build(str(src), str(out))
+    assert (out / "lib" / "data.json").exists()
+    (src / "lib" / "util.js").write_text("var n = 0;\n")
+    build(str(src), str(out))
+    assert not (out / "lib" / "data.json").exists()
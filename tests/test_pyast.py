@@ -0,0 +1,116 @@
+import ast
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from main import JsVisitor
+from pyast import AstVisitor, UnsupportedSyntax, compile_js, transpile_ast
+
+CASES = pathlib.Path(__file__).parent / "cases"
+
+PROGRAM = """
+function fib(n) { return n < 2 ? n : fib(n - 1) + fib(n - 2); }
+var out = [];
+for (var i = 0; i < 8; i++) { out.append(fib(i)); }
+var [a, , b] = [1, 2, 3];
+function kind(x) {
+    switch (x) { case 1: case 2: return "small"; default: return "other"; case "x": return "ex"; }
+}
+var kinds = [kind(1), kind(2), kind("x"), kind(9)];
+var c = 0; c += 5; c++;
+if (c > 10) { r = 1 } else if (c > 3) { r = 2 } else { r = 3 }
+var d = {}; d.get("z") || (d["z"] = 4);
+var s = `c is ${c}`;
+"""
+
+
+def test_handles_every_node_type_itself():
+    # An inherited JsVisitor handler would put text in the tree.
+    own = AstVisitor.dispatchTable()
+    for name, handler in JsVisitor.dispatchTable().items():
+        if handler.__qualname__.startswith("JsVisitor."):
+            assert own[name] is not handler, name
+
+
+def test_cases_compile():
+    for path in sorted(CASES.glob("*/input.js")):
+        try:
+            module = transpile_ast(path.read_text())
+        except UnsupportedSyntax:
+            continue
+        compile(module, str(path), "exec")
+        ast.parse(ast.unparse(module))
+
+
+def test_runs():
+    namespace = {"Js": list}
+    exec(compile_js(PROGRAM), namespace)
+    assert namespace["out"] == [0, 1, 1, 2, 3, 5, 8, 13]
+    assert (namespace["a"], namespace["b"]) == (1, 3)
+    assert namespace["kinds"] == ["small", "small", "ex", "other"]
+    assert (namespace["c"], namespace["r"]) == (6, 2)
+    assert namespace["d"] == {"z": 4}
+    assert namespace["s"] == "c is 6"
+
+
+def test_unsupported_syntax_raises():
+    try:
+        transpile_ast("outer: for (;;) { for (;;) { continue outer; } }")
+    except UnsupportedSyntax as e:
+        assert "labeled continue" in str(e)
+    else:
+        raise AssertionError("expected UnsupportedSyntax")
+
+
+def run(code):
+    namespace = {"Js": list}
+    exec(compile_js(code), namespace)
+    return namespace
+
+
+def test_updates_inside_expressions():
+    namespace = run("var a = 0; var b = a++; var c = ++a; var o = [5]; var d = o[0]--; var e = --o[0];")
+    assert (namespace["a"], namespace["b"], namespace["c"]) == (2, 0, 2)
+    assert (namespace["o"], namespace["d"], namespace["e"]) == ([3], 5, 3)
+    assert run("function f(x) { return x++; } var r = f(7);")["r"] == 7
+
+
+def test_for_continue_runs_the_update():
+    namespace = run("""
+    var o = 0;
+    for (var i = 0; i < 5; i++) {
+        if (i == 2) continue;
+        for (var j = 0; j < 2; j++) { if (j == 0) continue; o += 100; }
+        o += i;
+    }""")
+    assert namespace["o"] == 408
+
+
+def test_switch_falls_through():
+    namespace = run("""
+    function sw(x) {
+        var r = [];
+        switch (x) {
+            case 1: r.append(1);
+            case 2: r.append(2); break;
+            default: r.append(0);
+            case 3: r.append(3);
+            case 4: case 5: r.append(5);
+        }
+        return r;
+    }
+    var rs = [sw(1), sw(2), sw(3), sw(4), sw(9)];""")
+    assert namespace["rs"] == [[1, 2], [2], [3, 5], [5], [0, 3, 5]]
+
+
+def test_break_inside_a_case_raises():
+    for code in ("switch (x) { case 1: if (y) break; z(); }",
+                 "for (;;) { switch (x) { case 1: if (y) break; z(); break; } }"):
+        try:
+            transpile_ast(code)
+        except UnsupportedSyntax as e:
+            assert "break out of a switch" in str(e)
+        else:
+            raise AssertionError("expected UnsupportedSyntax")
+    # Breaks of loops inside a case are theirs.
+    compile_js("switch (x) { case 1: for (;;) { break; } z(); break; }")
@@ -0,0 +1,94 @@
+import ast
+import asyncio
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from main import JsVisitor
+from frontend import parse
+from split import split_source
+
+PROGRAM = '''
+def f(a, b=2):
+    """doc"""
+    x = a + 1
+    for i in range(3):
+        x += i
+    if x > 100:
+        return "big"
+    def g():
+        return x * b
+    y = g()
+    try:
+        z = 1 / a
+    except ZeroDivisionError as e:
+        z = str(e)
+    del y
+    w = [q for q in range(2) if (t := q)]
+    if a == 7:
+        return
+    return x, z, t, g()
+
+async def h(n):
+    total = 0
+    for i in range(n):
+        total += i
+    total *= 2
+    return total
+
+def unset(a):
+    if a:
+        v = 1
+    k = 2
+    k = 3
+    return v
+
+def counter():
+    n = 0
+    n += 1
+    yield n
+'''
+
+
+def run(source):
+    namespace = {}
+    exec(source, namespace)
+    return namespace
+
+
+def test_split_functions_behave_the_same():
+    before = run(PROGRAM)
+    for budget in (1, 2, 3):
+        text, splitter = split_source(PROGRAM, budget)
+        assert splitter.functions == 3
+        after = run(text)
+        for a in (1, 0, 7, 200):
+            assert after["f"](a) == before["f"](a)
+        assert asyncio.run(after["h"](5)) == asyncio.run(before["h"](5))
+        assert after["unset"](1) == 1
+        try:
+            after["unset"](0)
+        except NameError:
+            pass
+        else:
+            raise AssertionError("expected a NameError")
+        assert list(after["counter"]()) == [1]
+
+
+def test_small_functions_are_untouched():
+    text, splitter = split_source(PROGRAM, 100)
+    assert text == PROGRAM
+    assert splitter.functions == 0
+
+
+def test_hoisted_callbacks_move_next_to_their_use():
+    js = "(function () { var total = 0;\n" + "".join(
+        f"var m{i} = {{id: {i}}}; on(function (e) {{ return m{i}.id + e; }}); total += m{i}.id;\n"
+        for i in range(40)
+    ) + "return total; })();\n"
+    text, splitter = split_source("\n".join(JsVisitor().visit(parse(js, {"comment": True}, cache=False))), 30)
+    assert splitter.parts > 1
+    function = ast.parse(text).body[0]
+    # Only the names used across parts are shared.
+    shared = {assign.targets[0].id for assign in function.body[0].body}
+    assert "total" in shared and len(shared) < 10
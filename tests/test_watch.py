@@ -0,0 +1,50 @@
+import pathlib
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from watch import InotifyWatcher, PollingWatcher, watch
+
+
+def changes(watcher, root):
+    (root / "a.js").write_text("var a = 1;\n")
+    (root / "notes.txt").write_text("not a source\n")
+    (root / "node_modules").mkdir(exist_ok=True)
+    (root / "node_modules" / "n.js").write_text("var n;\n")
+    seen = set()
+    deadline = time.monotonic() + 5
+    while str(root / "a.js") not in seen and time.monotonic() < deadline:
+        seen |= watcher.wait(0.5)
+    return {pathlib.Path(path).name for path in seen}
+
+
+def test_polling_watcher(tmp_path):
+    watcher = PollingWatcher([str(tmp_path)], interval=0.01)
+    assert watcher.wait(0) == set()
+    assert changes(watcher, tmp_path) == {"a.js"}
+
+
+@pytest.mark.skipif(not InotifyWatcher.available(), reason="no inotify")
+def test_inotify_watcher(tmp_path):
+    watcher = InotifyWatcher([str(tmp_path)])
+    try:
+        assert watcher.wait(0) == set()
+        assert changes(watcher, tmp_path) == {"a.js"}
+    finally:
+        watcher.close()
+
+
+def test_watch_coalesces_bursts(tmp_path):
+    def edit():
+        time.sleep(0.2)
+        for name in "abc":
+            (tmp_path / f"{name}.js").write_text("var x;\n")
+            time.sleep(0.01)
+
+    calls = []
+    threading.Thread(target=edit).start()
+    watch([str(tmp_path)], calls.append, debounce=0.3, poll=True, interval=0.02, runs=1)
+    assert [{pathlib.Path(path).name for path in changed} for changed in calls] == [{"a.js", "b.js", "c.js"}]
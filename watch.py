@@ -0,0 +1,217 @@
+"""Transpiling again whenever sources change.
+
+``watch`` waits for changes to ``.js`` files under some directories (or
+to single files), lets a burst of them settle for ``debounce`` seconds,
+since editors and ``git checkout`` write several files or the same file
+several times in a row, and then hands every path that changed to
+``rebuild`` in one call.  What to transpile again is up to ``rebuild``:
+the CLI runs the incremental ``project.build`` in the same process, which
+keeps the modules imported, the parser warm and an ``OutputMemo`` filled.
+
+Changes come from inotify where there is one (Linux, through ``ctypes``,
+so there is nothing to install), and otherwise, or with ``poll=True``,
+from comparing the size and modification time of every watched file
+every ``interval`` seconds.  Like ``project.find_sources``, the watchers
+skip hidden directories and ``node_modules``.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+from project import SKIP_DIRECTORIES
+
+
+DEFAULT_DEBOUNCE = 0.1
+DEFAULT_INTERVAL = 0.5
+SUFFIX = ".js"
+
+
+def _skipped(name):
+    return name.startswith(".") or name in SKIP_DIRECTORIES
+
+
+class PollingWatcher(object):
+    """Finds changes by comparing the files' stat results between calls."""
+
+    def __init__(self, paths, interval=DEFAULT_INTERVAL):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def files(self):
+        for path in self.paths:
+            if not os.path.isdir(path):
+                yield path
+                continue
+            for directory, directories, files in os.walk(path):
+                directories[:] = [d for d in directories if not _skipped(d)]
+                for name in files:
+                    if name.endswith(SUFFIX):
+                        yield os.path.join(directory, name)
+
+    def scan(self):
+        snapshot = {}
+        for path in self.files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout=None):
+        """Paths changed since the last call, waiting up to ``timeout`` seconds for one."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self.scan()
+            old, self.snapshot = self.snapshot, snapshot
+            changed = {path for path in old.keys() | snapshot.keys() if old.get(path) != snapshot.get(path)}
+            if changed:
+                return changed
+            if deadline is None:
+                time.sleep(self.interval)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return changed
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """Changes from the Linux inotify API, one watch per directory."""
+
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_ISDIR = 0x40000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    _EVENT = struct.Struct("iIII")
+    _libc = None
+
+    @classmethod
+    def available(cls):
+        if not sys.platform.startswith("linux"):
+            return False
+        if cls._libc is None:
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+                libc.inotify_init1, libc.inotify_add_watch
+            except (OSError, AttributeError):
+                return False
+            cls._libc = libc
+        return True
+
+    def __init__(self, paths):
+        if not self.available():
+            raise OSError("inotify is not available")
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+        self.files = set()
+        self.trees = set()
+        for path in paths:
+            path = os.path.abspath(path)
+            if os.path.isdir(path):
+                self.add_tree(path)
+            else:
+                # Editors often save by renaming over the file, so watch
+                # its directory.
+                self.files.add(path)
+                self.add(os.path.dirname(path))
+
+    def add(self, directory):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd >= 0:
+            self.directories[wd] = directory
+
+    def add_tree(self, root):
+        for directory, directories, _ in os.walk(root):
+            directories[:] = [d for d in directories if not _skipped(d)]
+            self.add(directory)
+            self.trees.add(directory)
+
+    def relevant(self, path):
+        return path in self.files or (path.endswith(SUFFIX) and os.path.dirname(path) in self.trees)
+
+    def wait(self, timeout=None):
+        """Paths changed since the last call, waiting up to ``timeout`` seconds for one."""
+        changed = set()
+        while not changed:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return changed
+            data = os.read(self.fd, 64 * 1024)
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & self.IN_Q_OVERFLOW:
+                    # Events were lost; report everything watched.
+                    changed.update(self.files | self.trees)
+                    continue
+                directory = self.directories.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                if mask & self.IN_ISDIR:
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO) and not _skipped(os.path.basename(path)):
+                        # Files written into it before the watch was added
+                        # have no events; report the directory.
+                        self.add_tree(path)
+                        changed.add(path)
+                elif self.relevant(path):
+                    changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def watcher(paths, poll=False, interval=DEFAULT_INTERVAL):
+    """An inotify watcher for ``paths`` if there can be one and not ``poll``, else a polling one."""
+    if not poll and InotifyWatcher.available():
+        try:
+            return InotifyWatcher(paths)
+        except OSError:
+            pass
+    return PollingWatcher(paths, interval)
+
+
+def watch(paths, rebuild, debounce=DEFAULT_DEBOUNCE, poll=False, interval=DEFAULT_INTERVAL, runs=None):
+    """Call ``rebuild(changed)`` after every burst of changes to ``paths``.
+
+    Runs until interrupted, or for ``runs`` rebuilds.  An exception from
+    ``rebuild`` is reported on stderr and the watching goes on.
+    """
+    source = watcher(paths, poll, interval)
+    try:
+        while runs is None or runs > 0:
+            changed = source.wait()
+            while True:
+                more = source.wait(debounce)
+                if not more:
+                    break
+                changed |= more
+            try:
+                rebuild(changed)
+            except Exception as e:
+                print(f"{type(e).__name__}: {e}", file=sys.stderr)
+            if runs is not None:
+                runs -= 1
+    finally:
+        source.close()